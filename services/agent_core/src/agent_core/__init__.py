@@ -0,0 +1 @@
+# Python package for "agent_core" module.
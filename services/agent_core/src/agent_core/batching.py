@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import re
+from collections.abc import AsyncIterator, Mapping
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Appended to the task instructions; the model answers every item at once.
+BATCH_FORMAT = (
+    "You are given a JSON list of items, each with an `id` and a `text`. "
+    "Handle each item on its own, as instructed above. Reply with only a JSON "
+    "object that maps every item's `id` to its result as a string, e.g. "
+    '{"0": "...", "1": "..."}.'
+)
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+class BatchItemError(Exception):
+    """A batched item got no usable result."""
+
+
+@dataclass(frozen=True)
+class ProviderLimit:
+    # Batches sent to the provider at the same time.
+    max_concurrency: int = 4
+    # Batches started per second; None for no limit.
+    requests_per_second: float | None = None
+
+
+class ProviderLimiter:
+    """
+    Limits the calls to each provider, e.g. "ollama" or "openai-chat", as
+    its chat models name themselves. Share one limiter between schedulers,
+    so the limits hold for all of them together.
+
+        limiter = ProviderLimiter({"ollama": ProviderLimit(max_concurrency=1)})
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, ProviderLimit] | None = None,
+        default: ProviderLimit = ProviderLimit(),
+    ):
+        """
+        Args:
+            limits: The limits by provider.
+            default: The limit for providers not in `limits`.
+        """
+        self._limits = dict(limits or {})
+        self._default = default
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._rate_limiters: dict[str, InMemoryRateLimiter | None] = {}
+
+    @asynccontextmanager
+    async def acquire(self, provider: str) -> AsyncIterator[None]:
+        """Waits until a call to `provider` is allowed, then holds a slot."""
+        if provider not in self._semaphores:
+            limit = self._limits.get(provider, self._default)
+            self._semaphores[provider] = asyncio.Semaphore(limit.max_concurrency)
+            self._rate_limiters[provider] = (
+                InMemoryRateLimiter(requests_per_second=limit.requests_per_second)
+                if limit.requests_per_second
+                else None
+            )
+        async with self._semaphores[provider]:
+            rate_limiter = self._rate_limiters[provider]
+            if rate_limiter is not None:
+                await rate_limiter.aacquire()
+            yield
+
+
+@dataclass
+class _Item:
+    text: str
+    future: asyncio.Future[str]
+    attempts: int = 0
+
+
+@dataclass
+class _Batch:
+    items: list[_Item] = field(default_factory=list)
+    chars: int = 0
+
+
+class BatchScheduler:
+    """
+    Runs one task, e.g. classifying or summarizing, over many emails with
+    few model calls. Items submitted close together are packed into one
+    prompt, and each caller gets the result for its own item.
+
+    A batch is sent once it has `max_batch_size` items or `max_batch_chars`
+    characters, or `max_wait` seconds after its first item arrived,
+    whichever comes first.
+
+        async with BatchScheduler(model, "Summarize the email in one line.") as s:
+            summaries = await asyncio.gather(*(s.submit(m.body) for m in emails))
+
+    An item missing from the model's answer is retried in a later batch,
+    up to `max_attempts` times in all.
+    """
+
+    def __init__(
+        self,
+        model: BaseChatModel,
+        instructions: str,
+        max_batch_size: int = 20,
+        max_batch_chars: int = 32_000,
+        max_wait: float = 0.5,
+        max_attempts: int = 2,
+        limiter: ProviderLimiter | None = None,
+    ):
+        """
+        Args:
+            model: Any chat model. Prompt it for plain JSON output, e.g. with
+                   `format="json"` for ollama.
+            instructions: What to do with each item.
+            max_batch_size: The most items in one prompt.
+            max_batch_chars: The most item characters in one prompt. An item
+                             longer than this goes in a batch of its own.
+            max_wait: The most seconds an item waits for others to join its
+                      batch.
+            max_attempts: How often an item is sent before it fails.
+            limiter: Limits the calls per provider. Defaults to one used by
+                     this scheduler only.
+        """
+        self.model = model
+        self.instructions = instructions
+        self.max_batch_size = max_batch_size
+        self.max_batch_chars = max_batch_chars
+        self.max_wait = max_wait
+        self.max_attempts = max_attempts
+        self.limiter = limiter or ProviderLimiter()
+        self.provider = model._llm_type
+        # None stops the collector.
+        self._queue: asyncio.Queue[_Item | None] = asyncio.Queue()
+        self._collector: asyncio.Task[None] | None = None
+        self._running: set[asyncio.Task[None]] = set()
+
+    async def __aenter__(self) -> "BatchScheduler":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def submit(self, text: str) -> str:
+        """
+        Returns the model's result for one item.
+
+        Raises:
+            BatchItemError: If the model left the item out of every answer.
+            Exception: Whatever the model call raised.
+        """
+        if self._collector is None:
+            self._collector = asyncio.create_task(self._collect())
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Item(text, future))
+        return await future
+
+    async def aclose(self) -> None:
+        """Sends what is waiting, and waits for every batch to finish."""
+        if self._collector is not None:
+            self._queue.put_nowait(None)
+            await self._collector
+            self._collector = None
+        while self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        pending: _Item | None = None
+        while True:
+            first = pending or await self._queue.get()
+            pending = None
+            if first is None:
+                return
+            batch = _Batch([first], len(first.text))
+            deadline = loop.time() + self.max_wait
+            stop = False
+            while len(batch.items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                if batch.chars + len(item.text) > self.max_batch_chars:
+                    # Starts the next batch instead.
+                    pending = item
+                    break
+                batch.items.append(item)
+                batch.chars += len(item.text)
+            self._start(batch.items)
+            if stop:
+                return
+
+    def _start(self, items: list[_Item]) -> None:
+        # Callers that gave up need no result.
+        items = [item for item in items if not item.future.done()]
+        if not items:
+            return
+        task = asyncio.create_task(self._run(items))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, items: list[_Item]) -> None:
+        for item in items:
+            item.attempts += 1
+        try:
+            async with self.limiter.acquire(self.provider):
+                response = await self.model.ainvoke(self._prompt(items))
+            results = _parse_results(response.text)
+        except Exception as e:
+            logger.warning(
+                "A batch of %d items for %s failed: %s", len(items), self.provider, e
+            )
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        missing = []
+        for i, item in enumerate(items):
+            result = results.get(str(i))
+            if item.future.done():
+                continue
+            if result is not None:
+                item.future.set_result(_as_text(result))
+            elif item.attempts < self.max_attempts:
+                missing.append(item)
+            else:
+                item.future.set_exception(
+                    BatchItemError(
+                        f"No result after {item.attempts} attempts from {self.provider}"
+                    )
+                )
+        if missing:
+            logger.info("Retrying %d items left out of a batch", len(missing))
+            if self._collector is None or self._collector.done():
+                # Closing; the collector will not pick them up.
+                self._start(missing)
+            else:
+                for item in missing:
+                    self._queue.put_nowait(item)
+
+    def _prompt(self, items: list[_Item]) -> list[Any]:
+        payload = [{"id": str(i), "text": item.text} for i, item in enumerate(items)]
+        return [
+            SystemMessage(f"{self.instructions}\n\n{BATCH_FORMAT}"),
+            HumanMessage(json.dumps(payload, ensure_ascii=False)),
+        ]
+
+
+def _parse_results(text: str) -> dict[str, Any]:
+    """
+    Reads the JSON object from a model's answer, which may be wrapped in
+    prose or a code block.
+
+    Raises:
+        ValueError: If the answer has no JSON object.
+    """
+    match = _JSON_OBJECT.search(text)
+    if match is None:
+        raise ValueError(f"The model answered without a JSON object: {text[:200]!r}")
+    results = json.loads(match.group())
+    if not isinstance(results, dict):
+        raise ValueError("The model's answer is not a JSON object")
+    return {str(k): v for k, v in results.items()}
+
+
+def _as_text(result: Any) -> str:
+    return result if isinstance(result, str) else json.dumps(result)
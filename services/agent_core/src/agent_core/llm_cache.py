@@ -0,0 +1,394 @@
+import ast
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Invocation parameters that name the model, by provider convention.
+_MODEL_PARAMS = ("model", "model_name", "model_id", "deployment_name")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    provider TEXT,
+    model TEXT,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS llm_cache_by_last_used ON llm_cache (last_used_at);
+"""
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    """What a cached response was produced from."""
+
+    # The hash the response is stored under.
+    digest: str
+    # E.g. "openai-chat" or "anthropic-chat"; None if the model does not say.
+    provider: str | None
+    model: str | None
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    # Entries dropped to stay within the size limits; expired entries are
+    # not counted.
+    evictions: int
+    # Tokens the cached responses cost when they were first generated, as
+    # reported by the provider, summed over every hit.
+    saved_input_tokens: int
+    saved_output_tokens: int
+    entries: int
+    size_bytes: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.saved_input_tokens + self.saved_output_tokens
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def cache_key(prompt: str, llm_string: str) -> CacheKey:
+    """
+    Hashes a model call as LangChain describes it to caches, after
+    normalizing what does not change the response: message ids, key order
+    and parameters left unset.
+
+    Args:
+        prompt: The serialized messages (or the prompt, for plain LLMs).
+        llm_string: The serialized model and its invocation parameters.
+    """
+    model_config, params = _parse_llm_string(llm_string)
+    provider = params.get("_type") if isinstance(params, dict) else None
+    model = _model_name(model_config, params)
+    if provider is None and isinstance(model_config, dict):
+        # The class, e.g. ["langchain", "chat_models", "openai", "ChatOpenAI"].
+        provider = ".".join(model_config.get("id", [])) or None
+    payload = {
+        "provider": provider,
+        "model": model,
+        "config": model_config,
+        "params": params,
+        "messages": _normalize_prompt(prompt),
+    }
+    canonical = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    digest = hashlib.sha256(canonical.encode()).hexdigest()
+    return CacheKey(digest, provider, model)
+
+
+class SqliteLLMCache(BaseCache):
+    """
+    Keeps model responses in a local SQLite database, so the same prompt to
+    the same model with the same parameters is only paid for once, also
+    across restarts.
+
+    Works in front of any LangChain chat model or LLM, either for one model
+    or for all of them:
+
+        cache = SqliteLLMCache("llm_cache.db")
+        model = init_chat_model("gpt-4o-mini", cache=cache)
+        # or: langchain_core.globals.set_llm_cache(cache)
+
+    Entries expire `ttl` seconds after they are stored. Beyond `max_entries`
+    or `max_bytes`, the least recently used entries are dropped first.
+    Streaming calls bypass caches in LangChain, so only `invoke`, `batch`
+    and their async forms are cached.
+    """
+
+    def __init__(
+        self,
+        path: str = "llm_cache.db",
+        ttl: float | None = DEFAULT_TTL,
+        max_entries: int | None = DEFAULT_MAX_ENTRIES,
+        max_bytes: int | None = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Opens (and if needed creates) the cache.
+
+        Args:
+            path: The SQLite database file, or ":memory:".
+            ttl: How long responses are kept, in seconds. None keeps them
+                 until they are evicted.
+            max_entries: The most responses kept. None for no limit.
+            max_bytes: The most bytes of responses kept. None for no limit.
+            clock: Returns the current time in seconds. For tests.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._saved_input_tokens = 0
+        self._saved_output_tokens = 0
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        key = cache_key(prompt, llm_string)
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, input_tokens, output_tokens "
+                "FROM llm_cache WHERE key = ?",
+                (key.digest,),
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key.digest,))
+                row = None
+            if row is None:
+                self._misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_used_at = ?, hits = hits + 1 "
+                "WHERE key = ?",
+                (now, key.digest),
+            )
+            self._hits += 1
+            self._saved_input_tokens += row[2]
+            self._saved_output_tokens += row[3]
+        try:
+            return _loads(row[0])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Dropping unreadable cached response for %s", key.model)
+            self.invalidate(prompt, llm_string)
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        value = _dumps(return_val)
+        size = len(value.encode())
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.info("Not caching a %d byte response from %s", size, key.model)
+            return
+        input_tokens, output_tokens = _token_usage(return_val)
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, provider, model, value, "
+                    "size, input_tokens, output_tokens, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key.digest,
+                        key.provider,
+                        key.model,
+                        value,
+                        size,
+                        input_tokens,
+                        output_tokens,
+                        now,
+                        now,
+                    ),
+                )
+                self._evict(now)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def invalidate(self, prompt: str, llm_string: str) -> None:
+        """Drops the response to one call, e.g. one found to be wrong."""
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key.digest,))
+
+    def clear(self, **kwargs: Any) -> None:
+        """Drops every cached response. The statistics are kept."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> CacheStats:
+        """
+        Returns the hits, misses and saved tokens since this cache was
+        opened, and the current size of the whole database.
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                saved_input_tokens=self._saved_input_tokens,
+                saved_output_tokens=self._saved_output_tokens,
+                entries=entries,
+                size_bytes=size,
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and created_at + self.ttl <= now
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries, then the least recently used over a limit."""
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,)
+            )
+        entries, size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        excess_entries = (
+            entries - self.max_entries if self.max_entries is not None else 0
+        )
+        excess_bytes = size - self.max_bytes if self.max_bytes is not None else 0
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return
+        victims = []
+        rows = self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY last_used_at, rowid"
+        )
+        for key, entry_size in rows:
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            victims.append((key,))
+            excess_entries -= 1
+            excess_bytes -= entry_size
+        rows.close()
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+        self._evictions += len(victims)
+
+
+def _parse_llm_string(llm_string: str) -> tuple[Any, Any]:
+    """
+    Splits an llm_string into the serialized model and its parameters.
+
+    LangChain writes `<model JSON>---<sorted params repr>` for models that
+    can be serialized, and only the params repr otherwise.
+    """
+    model_config: Any = None
+    params_repr = llm_string
+    try:
+        model_config, end = json.JSONDecoder().raw_decode(llm_string)
+    except ValueError:
+        pass
+    else:
+        if llm_string.startswith("---", end):
+            params_repr = llm_string[end + 3 :]
+        else:
+            model_config, params_repr = None, llm_string
+    try:
+        params: Any = dict(ast.literal_eval(params_repr))
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        # Parameters that are not plain literals are hashed as written.
+        return model_config, params_repr
+    return model_config, {k: v for k, v in params.items() if v is not None}
+
+
+def _model_name(model_config: Any, params: Any) -> str | None:
+    sources = [params]
+    if isinstance(model_config, dict):
+        sources.append(model_config.get("kwargs"))
+    for source in sources:
+        if isinstance(source, dict):
+            for name in _MODEL_PARAMS:
+                if isinstance(source.get(name), str):
+                    return source[name]
+    return None
+
+
+def _normalize_prompt(prompt: str) -> Any:
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        # A plain LLM prompt.
+        return prompt
+    return _drop_ids(messages)
+
+
+def _drop_ids(messages: Any) -> Any:
+    """Drops message ids, which are random and never change a response."""
+    if not isinstance(messages, list):
+        return messages
+    normalized = []
+    for message in messages:
+        if isinstance(message, dict) and isinstance(message.get("kwargs"), dict):
+            kwargs = {k: v for k, v in message["kwargs"].items() if k != "id"}
+            message = {**message, "kwargs": kwargs}
+        normalized.append(message)
+    return normalized
+
+
+def _dumps(generations: Sequence[Generation]) -> str:
+    items = []
+    for generation in generations:
+        if isinstance(generation, ChatGeneration):
+            items.append(
+                {
+                    "message": message_to_dict(generation.message),
+                    "generation_info": generation.generation_info,
+                }
+            )
+        else:
+            items.append(
+                {"text": generation.text, "generation_info": generation.generation_info}
+            )
+    return json.dumps(items, default=str)
+
+
+def _loads(value: str) -> list[Generation]:
+    generations: list[Generation] = []
+    for item in json.loads(value):
+        if "message" in item:
+            (message,) = messages_from_dict([item["message"]])
+            generations.append(
+                ChatGeneration(message=message, generation_info=item["generation_info"])
+            )
+        else:
+            generations.append(
+                Generation(text=item["text"], generation_info=item["generation_info"])
+            )
+    return generations
+
+
+def _token_usage(generations: Sequence[Generation]) -> tuple[int, int]:
+    """The input and output tokens a response cost, where reported."""
+    input_tokens = output_tokens = 0
+    for generation in generations:
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+    return input_tokens, output_tokens
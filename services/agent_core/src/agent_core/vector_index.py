@@ -0,0 +1,364 @@
+import json
+import logging
+import os
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from common.client_utils import atomic_write, file_lock
+
+logger = logging.getLogger(__name__)
+
+# Little-endian, so the files read the same on every machine.
+_FLOAT = np.dtype("<f4")
+_ROW = np.dtype("<i8")
+
+# The files of each generation, by name and suffix.
+_FILES = (("vectors", "f32"), ("ids", "txt"), ("deleted", "i64"))
+
+# Rows scored at a time, which bounds the scratch memory of a search.
+DEFAULT_BLOCK_ROWS = 65536
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    id: str
+    # Cosine similarity, from -1 to 1.
+    score: float
+
+
+class VectorIndex:
+    """
+    Finds the embeddings most similar to a query by cosine similarity, by
+    scoring every stored vector. Fast enough for a family's email history
+    without a vector database.
+
+    The index is a directory of plain files:
+
+    - `vectors-<generation>.f32`: the unit-length vectors, one float32 row
+      each, memory-mapped read-only. Opening is near instant, and worker
+      processes share the pages through the OS page cache.
+    - `ids-<generation>.txt`: the id of each row, one per line.
+    - `deleted-<generation>.i64`: the rows deleted since the last compaction.
+    - `meta.json`: the dimension, generation and how much of each file is
+      committed. Written last, so a crashed write is ignored and cut off by
+      the next one.
+
+    Adds and deletes append to the files. `compact()` rewrites them without
+    the deleted rows, as a new generation, so readers still holding the old
+    files are not disturbed.
+
+        index = VectorIndex("embeddings", dim=768)
+        index.add(["msg-1", "msg-2"], vectors)
+        hits = index.search(query, k=5)
+
+    Writes from several processes are serialized by a file lock. Readers
+    see other processes' writes after `refresh()`.
+    """
+
+    def __init__(self, path: str, dim: int | None = None):
+        """
+        Opens the index, creating it if `dim` is given.
+
+        Args:
+            path: The index directory.
+            dim: The vector dimension. Optional for an existing index.
+
+        Raises:
+            FileNotFoundError: If there is no index and `dim` is not given.
+            ValueError: If `dim` differs from the existing index's.
+        """
+        self.path = path
+        self._meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(self._meta_path):
+            if dim is None:
+                raise FileNotFoundError(f"No vector index at {path}")
+            os.makedirs(path, exist_ok=True)
+            with file_lock(self._meta_path):
+                if not os.path.exists(self._meta_path):
+                    meta = {
+                        "dim": dim,
+                        "generation": 0,
+                        "rows": 0,
+                        "ids_bytes": 0,
+                        "deleted": 0,
+                    }
+                    for name, suffix in _FILES:
+                        open(self._file(name, suffix, meta), "wb").close()
+                    self._write_meta(meta)
+        self._load()
+        if dim is not None and dim != self.dim:
+            raise ValueError(f"The index at {path} has dimension {self.dim}, not {dim}")
+
+    # --- Reads ---
+
+    @property
+    def dim(self) -> int:
+        return self._meta["dim"]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._rows
+
+    @property
+    def deleted_rows(self) -> int:
+        """Rows that `compact()` would drop."""
+        return self._meta["rows"] - len(self._rows)
+
+    def vector(self, id: str) -> np.ndarray:
+        """
+        Returns the stored, unit-length vector of `id`.
+
+        Raises:
+            KeyError: If the index has no such id.
+        """
+        return np.array(self._vectors[self._rows[id]])
+
+    def search(
+        self, query: Sequence[float] | np.ndarray, k: int = 10
+    ) -> list[SearchHit]:
+        """Returns the `k` ids most similar to `query`, best first."""
+        return self.search_batch(np.asarray(query, dtype=np.float32)[None, :], k)[0]
+
+    def search_batch(
+        self,
+        queries: Sequence[Sequence[float]] | np.ndarray,
+        k: int = 10,
+        block_rows: int = DEFAULT_BLOCK_ROWS,
+    ) -> list[list[SearchHit]]:
+        """
+        Searches for many queries at once, which shares each pass over the
+        vectors between them.
+
+        Args:
+            queries: A (number of queries, dim) matrix.
+            k: The most hits per query.
+            block_rows: Rows scored at a time.
+
+        Returns:
+            The hits for each query, best first.
+
+        Raises:
+            ValueError: If the queries do not have the index's dimension,
+                        or one is all zeros.
+        """
+        queries = _unit_rows(np.asarray(queries, dtype=np.float32), self.dim)
+        if k <= 0 or not self._rows:
+            return [[] for _ in queries]
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, self._meta["rows"], block_rows):
+            block = self._vectors[start : start + block_rows]
+            scores = queries @ block.T
+            deleted = self._deleted[start : start + len(block)]
+            if deleted.any():
+                scores[:, deleted] = -np.inf
+            rows = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            best_scores, best_rows = _top_k(
+                np.hstack([best_scores, scores]), np.hstack([best_rows, rows]), k
+            )
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        results = []
+        for scores, rows, ranks in zip(best_scores, best_rows, order):
+            results.append(
+                [
+                    SearchHit(self._ids[rows[i]], float(scores[i]))
+                    for i in ranks
+                    if scores[i] != -np.inf
+                ]
+            )
+        return results
+
+    def refresh(self) -> bool:
+        """
+        Picks up writes made through other instances or processes.
+
+        Returns:
+            Whether anything changed.
+        """
+        if self._read_meta() == self._meta:
+            return False
+        self._load()
+        return True
+
+    # --- Writes ---
+
+    def add(
+        self, ids: Sequence[str], vectors: Sequence[Sequence[float]] | np.ndarray
+    ) -> None:
+        """
+        Appends vectors. An id already in the index is replaced.
+
+        Args:
+            ids: One unique id per vector, without line breaks.
+            vectors: A (len(ids), dim) matrix. Stored at unit length.
+
+        Raises:
+            ValueError: If the ids or vectors are invalid.
+        """
+        if not len(ids) and not len(vectors):
+            return
+        vectors = _unit_rows(np.asarray(vectors, dtype=np.float32), self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError(f"Got {len(ids)} ids for {len(vectors)} vectors")
+        if len(set(ids)) != len(ids):
+            raise ValueError("The ids are not unique")
+        if any("\n" in id or "\r" in id for id in ids):
+            raise ValueError("Ids cannot contain line breaks")
+        with file_lock(self._meta_path):
+            self.refresh()
+            meta = dict(self._meta)
+            replaced = [self._rows[id] for id in ids if id in self._rows]
+            encoded = "".join(f"{id}\n" for id in ids).encode()
+            self._append("vectors", "f32", meta["rows"] * self._row_bytes, vectors)
+            self._append("ids", "txt", meta["ids_bytes"], encoded)
+            self._append_deleted(meta, replaced)
+            meta["rows"] += len(ids)
+            meta["ids_bytes"] += len(encoded)
+            self._write_meta(meta)
+            self._load()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """
+        Deletes vectors by id. Unknown ids are ignored.
+
+        Returns:
+            How many vectors were deleted.
+        """
+        with file_lock(self._meta_path):
+            self.refresh()
+            rows = sorted({self._rows[id] for id in ids if id in self._rows})
+            if not rows:
+                return 0
+            meta = dict(self._meta)
+            self._append_deleted(meta, rows)
+            self._write_meta(meta)
+            self._load()
+        return len(rows)
+
+    def compact(self) -> int:
+        """
+        Rewrites the index without deleted rows.
+
+        Returns:
+            How many rows were dropped.
+        """
+        with file_lock(self._meta_path):
+            self.refresh()
+            dropped = self.deleted_rows
+            if not dropped:
+                return 0
+            old = self._meta
+            meta = {"dim": self.dim, "generation": old["generation"] + 1, "deleted": 0}
+            live = np.flatnonzero(~self._deleted)
+            with open(self._file("vectors", "f32", meta), "wb") as f:
+                for start in range(0, len(live), DEFAULT_BLOCK_ROWS):
+                    rows = live[start : start + DEFAULT_BLOCK_ROWS]
+                    f.write(np.ascontiguousarray(self._vectors[rows]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            encoded = "".join(f"{self._ids[row]}\n" for row in live).encode()
+            with open(self._file("ids", "txt", meta), "wb") as f:
+                f.write(encoded)
+                f.flush()
+                os.fsync(f.fileno())
+            open(self._file("deleted", "i64", meta), "wb").close()
+            meta |= {"rows": len(live), "ids_bytes": len(encoded)}
+            self._write_meta(meta)
+            self._load()
+            for name, suffix in _FILES:
+                # Open memory maps of the old files stay valid.
+                os.remove(self._file(name, suffix, old))
+        logger.info("Compacted %s, dropping %d rows", self.path, dropped)
+        return dropped
+
+    # --- Internals ---
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dim * _FLOAT.itemsize
+
+    def _file(self, name: str, suffix: str, meta: dict[str, Any]) -> str:
+        return os.path.join(self.path, f"{name}-{meta['generation']}.{suffix}")
+
+    def _append(
+        self, name: str, suffix: str, committed: int, data: np.ndarray | bytes
+    ) -> None:
+        """Appends to a file after its committed bytes, dropping the rest."""
+        path = self._file(name, suffix, self._meta)
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            f.truncate(committed)
+            f.seek(committed)
+            f.write(data if isinstance(data, bytes) else data.astype(_FLOAT).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append_deleted(self, meta: dict[str, Any], rows: Sequence[int]) -> None:
+        if rows:
+            data = np.asarray(rows, dtype=_ROW).tobytes()
+            self._append("deleted", "i64", meta["deleted"] * _ROW.itemsize, data)
+            meta["deleted"] += len(rows)
+
+    def _read_meta(self) -> dict[str, Any]:
+        with open(self._meta_path) as f:
+            return json.load(f)
+
+    def _write_meta(self, meta: dict[str, Any]) -> None:
+        atomic_write(self._meta_path, json.dumps(meta), mode=0o644)
+
+    def _load(self) -> None:
+        meta = self._read_meta()
+        rows = meta["rows"]
+        if rows:
+            self._vectors: np.ndarray = np.memmap(
+                self._file("vectors", "f32", meta),
+                dtype=_FLOAT,
+                mode="r",
+                shape=(rows, meta["dim"]),
+            )
+        else:
+            self._vectors = np.empty((0, meta["dim"]), dtype=_FLOAT)
+        with open(self._file("ids", "txt", meta), "rb") as f:
+            ids = f.read(meta["ids_bytes"]).decode().split("\n")[:rows]
+        deleted = np.zeros(rows, dtype=bool)
+        if meta["deleted"]:
+            deleted[
+                np.fromfile(
+                    self._file("deleted", "i64", meta),
+                    dtype=_ROW,
+                    count=meta["deleted"],
+                )
+            ] = True
+        self._meta = meta
+        self._ids = ids
+        self._deleted = deleted
+        self._rows = {ids[row]: row for row in np.flatnonzero(~deleted).tolist()}
+
+
+def _unit_rows(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """
+    Raises:
+        ValueError: If `vectors` is not a (n, dim) matrix of non-zero rows.
+    """
+    if vectors.ndim != 2 or vectors.shape[1] != dim:
+        raise ValueError(f"Expected vectors of dimension {dim}, got {vectors.shape}")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    if not np.all(norms > 0):
+        raise ValueError("Cannot index or search with all-zero vectors")
+    return vectors / norms
+
+
+def _top_k(
+    scores: np.ndarray, rows: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Keeps the `k` best scores of each row, unordered."""
+    if scores.shape[1] <= k:
+        return scores, rows
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return (
+        np.take_along_axis(scores, best, axis=1),
+        np.take_along_axis(rows, best, axis=1),
+    )
@@ -0,0 +1,159 @@
+import asyncio
+import json
+
+import pytest
+from agent_core.batching import (
+    BatchItemError,
+    BatchScheduler,
+    ProviderLimit,
+    ProviderLimiter,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class FakeBatchModel(BaseChatModel):
+    """Upper-cases every item of a batch, like a model following the format."""
+
+    delay: float = 0.0
+    skip: set[str] = set()
+    fail: bool = False
+    calls: list[list[str]] = []
+    running: int = 0
+    max_running: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-batch"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        items = json.loads(messages[-1].content)
+        self.calls.append([item["text"] for item in items])
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        if self.fail:
+            raise ConnectionError("model unavailable")
+        results = {
+            item["id"]: item["text"].upper()
+            for item in items
+            if item["text"] not in self.skip
+        }
+        content = f"Here you go:\n```json\n{json.dumps(results)}\n```"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content))])
+
+
+def fake_model(**kwargs):
+    return FakeBatchModel(calls=[], skip=set(), **kwargs)
+
+
+def test_results_map_back_to_callers():
+    model = fake_model()
+
+    async def main():
+        async with BatchScheduler(model, "Shout", max_batch_size=4) as scheduler:
+            texts = [f"email {i}" for i in range(10)]
+            return await asyncio.gather(*(scheduler.submit(t) for t in texts))
+
+    assert asyncio.run(main()) == [f"EMAIL {i}" for i in range(10)]
+    assert [len(call) for call in model.calls] == [4, 4, 2]
+
+
+def test_batch_is_sent_after_max_wait():
+    model = fake_model()
+
+    async def main():
+        scheduler = BatchScheduler(model, "Shout", max_wait=0.05)
+        result = await asyncio.wait_for(scheduler.submit("alone"), 1)
+        await scheduler.aclose()
+        return result
+
+    assert asyncio.run(main()) == "ALONE"
+    assert model.calls == [["alone"]]
+
+
+def test_batches_are_bounded_by_characters():
+    model = fake_model()
+
+    async def main():
+        async with BatchScheduler(model, "Shout", max_batch_chars=10) as scheduler:
+            texts = ["aaaa", "bbbb", "cccc", "d" * 20, "e"]
+            return await asyncio.gather(*(scheduler.submit(t) for t in texts))
+
+    assert asyncio.run(main()) == ["AAAA", "BBBB", "CCCC", "D" * 20, "E"]
+    assert model.calls == [["aaaa", "bbbb"], ["cccc"], ["d" * 20], ["e"]]
+
+
+def test_concurrency_is_limited_per_provider():
+    model = fake_model(delay=0.02)
+    limiter = ProviderLimiter({"fake-batch": ProviderLimit(max_concurrency=2)})
+
+    async def main():
+        schedulers = [
+            BatchScheduler(model, "Shout", max_batch_size=1, limiter=limiter)
+            for _ in range(2)
+        ]
+        await asyncio.gather(
+            *(s.submit(f"email {i}") for s in schedulers for i in range(4))
+        )
+        for s in schedulers:
+            await s.aclose()
+
+    asyncio.run(main())
+    assert len(model.calls) == 8
+    assert model.max_running == 2
+
+
+def test_missing_items_are_retried_then_fail():
+    model = fake_model()
+    model.skip.add("ignored")
+
+    async def main():
+        async with BatchScheduler(model, "Shout") as scheduler:
+            return await asyncio.gather(
+                scheduler.submit("ok"),
+                scheduler.submit("ignored"),
+                return_exceptions=True,
+            )
+
+    ok, ignored = asyncio.run(main())
+    assert ok == "OK"
+    assert isinstance(ignored, BatchItemError)
+    assert model.calls == [["ok", "ignored"], ["ignored"]]
+
+
+def test_model_errors_reach_every_caller():
+    model = fake_model(fail=True)
+
+    async def main():
+        async with BatchScheduler(model, "Shout") as scheduler:
+            return await asyncio.gather(
+                scheduler.submit("a"), scheduler.submit("b"), return_exceptions=True
+            )
+
+    assert [type(e) for e in asyncio.run(main())] == [ConnectionError] * 2
+    assert len(model.calls) == 1
+
+
+def test_cancelled_callers_are_left_out():
+    model = fake_model()
+
+    async def main():
+        async with BatchScheduler(model, "Shout", max_wait=0.05) as scheduler:
+            gone = asyncio.create_task(scheduler.submit("gone"))
+            kept = asyncio.create_task(scheduler.submit("kept"))
+            await asyncio.sleep(0)
+            gone.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await gone
+            return await kept
+
+    assert asyncio.run(main()) == "KEPT"
+    assert model.calls == [["kept"]]
@@ -0,0 +1,193 @@
+import asyncio
+
+from agent_core.llm_cache import SqliteLLMCache, cache_key
+from langchain_core.language_models.fake_chat_models import (
+    FakeListChatModel,
+    GenericFakeChatModel,
+)
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def model_with_usage(responses, cache):
+    return GenericFakeChatModel(
+        messages=iter(
+            AIMessage(
+                content=text,
+                usage_metadata={
+                    "input_tokens": 100,
+                    "output_tokens": 10,
+                    "total_tokens": 110,
+                },
+            )
+            for text in responses
+        ),
+        cache=cache,
+    )
+
+
+def chat(text):
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def test_chat_model_calls_are_cached(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SqliteLLMCache(path)
+    model = FakeListChatModel(responses=["school", "other"], cache=cache)
+
+    assert model.invoke("Classify: picture day").content == "school"
+    assert model.invoke("Classify: picture day").content == "school"
+    assert model.invoke("Classify: soccer practice").content == "other"
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 2, 2)
+    cache.close()
+
+    # The responses outlive the process.
+    reopened = SqliteLLMCache(path)
+    model = FakeListChatModel(responses=["school", "other"], cache=reopened)
+    assert model.invoke("Classify: soccer practice").content == "other"
+    assert reopened.stats().hits == 1
+    reopened.close()
+
+
+def test_async_calls_are_cached():
+    cache = SqliteLLMCache(":memory:")
+    model = FakeListChatModel(responses=["one", "two"], cache=cache)
+
+    async def main():
+        return [(await model.ainvoke("hi")).content for _ in range(2)]
+
+    assert asyncio.run(main()) == ["one", "one"]
+
+
+def test_saved_tokens_are_counted():
+    cache = SqliteLLMCache(":memory:")
+    model = model_with_usage(["Summary"], cache)
+
+    for _ in range(3):
+        response = model.invoke([HumanMessage("Summarize this email")])
+
+    assert response.content == "Summary"
+    assert response.usage_metadata["output_tokens"] == 10
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (2, 1)
+    assert (stats.saved_input_tokens, stats.saved_output_tokens) == (200, 20)
+    assert stats.saved_tokens == 220
+    assert stats.hit_rate == 2 / 3
+
+
+def test_key_ignores_message_ids_and_param_order():
+    prompt = (
+        '[{"lc": 1, "type": "constructor", "id": ["langchain", "schema", '
+        '"messages", "HumanMessage"], "kwargs": {"content": "hi", "id": "%s"}}]'
+    )
+    llm_string = (
+        '{"lc": 1, "type": "constructor", "id": ["langchain", "chat_models", '
+        '"openai", "ChatOpenAI"], "kwargs": {"model_name": "gpt-4o-mini"}}---'
+        "[('_type', 'openai-chat'), ('model_name', 'gpt-4o-mini'), "
+        "('stop', None), ('temperature', 0.0)]"
+    )
+    reordered = (
+        '{"kwargs": {"model_name": "gpt-4o-mini"}, "id": ["langchain", '
+        '"chat_models", "openai", "ChatOpenAI"], "type": "constructor", "lc": 1}---'
+        "[('_type', 'openai-chat'), ('model_name', 'gpt-4o-mini'), "
+        "('temperature', 0.0)]"
+    )
+
+    key = cache_key(prompt % "run-1", llm_string)
+
+    assert (key.provider, key.model) == ("openai-chat", "gpt-4o-mini")
+    assert cache_key(prompt % "run-2", reordered) == key
+    assert cache_key(prompt % "run-1", llm_string.replace("0.0", "0.7")) != key
+    assert (
+        cache_key(prompt % "run-1", llm_string.replace("4o-mini", "4o")).digest
+        != key.digest
+    )
+
+
+def test_key_for_models_that_are_not_serializable():
+    key = cache_key("prompt", "[('_type', 'fake'), ('model', 'm1')]")
+
+    assert (key.provider, key.model) == ("fake", "m1")
+    assert cache_key("prompt", "[('_type', 'fake'), ('model', 'm2')]") != key
+    # Parameters that are not literals are hashed as written.
+    assert cache_key("prompt", "[('client', <object>)]").provider is None
+
+
+def test_plain_llm_generations_round_trip():
+    cache = SqliteLLMCache(":memory:")
+    cache.update("p", "llm", [Generation(text="hi", generation_info={"x": 1})])
+
+    assert cache.lookup("p", "llm") == [Generation(text="hi", generation_info={"x": 1})]
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = SqliteLLMCache(":memory:", ttl=60, clock=clock)
+    cache.update("p", "llm", chat("hi"))
+
+    clock.now += 59
+    assert cache.lookup("p", "llm") == chat("hi")
+    clock.now += 1
+    assert cache.lookup("p", "llm") is None
+    assert cache.stats().entries == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    clock = FakeClock()
+    cache = SqliteLLMCache(":memory:", max_entries=2, clock=clock)
+    for prompt in ["a", "b"]:
+        clock.now += 1
+        cache.update(prompt, "llm", chat(prompt))
+    clock.now += 1
+    cache.lookup("a", "llm")
+
+    clock.now += 1
+    cache.update("c", "llm", chat("c"))
+
+    assert cache.lookup("b", "llm") is None
+    assert cache.lookup("a", "llm") == chat("a")
+    assert cache.lookup("c", "llm") == chat("c")
+    assert cache.stats().evictions == 1
+
+
+def test_size_limit():
+    clock = FakeClock()
+    probe = SqliteLLMCache(":memory:")
+    probe.update("a", "llm", chat("a" * 100))
+    entry_size = probe.stats().size_bytes
+    cache = SqliteLLMCache(":memory:", max_bytes=2 * entry_size, clock=clock)
+    for prompt in ["a", "b", "c"]:
+        clock.now += 1
+        cache.update(prompt, "llm", chat(prompt * 100))
+
+    stats = cache.stats()
+    assert (stats.entries, stats.evictions) == (2, 1)
+    assert stats.size_bytes <= 2 * entry_size
+    assert cache.lookup("a", "llm") is None
+
+    # Too large to ever fit.
+    cache.update("d", "llm", chat("d" * 1000))
+    assert cache.lookup("d", "llm") is None
+    assert cache.stats().entries == 2
+
+
+def test_clear_and_invalidate():
+    cache = SqliteLLMCache(":memory:")
+    cache.update("p1", "llm", chat("1"))
+    cache.update("p2", "llm", chat("2"))
+
+    cache.invalidate("p1", "llm")
+    assert cache.lookup("p1", "llm") is None
+    assert cache.lookup("p2", "llm") == chat("2")
+
+    cache.clear()
+    assert cache.stats().entries == 0
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pytest
+from agent_core.vector_index import VectorIndex
+
+
+def random_vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def brute_force(vectors, query, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)[:k])
+
+
+def test_search_finds_most_similar(tmp_path):
+    vectors = random_vectors(200)
+    index = VectorIndex(str(tmp_path), dim=8)
+    index.add([f"m{i}" for i in range(200)], vectors)
+    queries = random_vectors(5, seed=1)
+
+    results = index.search_batch(queries, k=7, block_rows=32)
+
+    for query, hits in zip(queries, results):
+        assert [hit.id for hit in hits] == [
+            f"m{i}" for i in brute_force(vectors, query, 7)
+        ]
+        assert hits[0].score >= hits[-1].score
+    assert index.search(vectors[3], k=1)[0].id == "m3"
+    assert index.search(vectors[3], k=1)[0].score == pytest.approx(1.0)
+
+
+def test_adds_are_incremental_and_persist(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=8)
+    index.add(["a", "b"], random_vectors(2))
+    index.add(["c"], random_vectors(1, seed=1))
+
+    reopened = VectorIndex(str(tmp_path))
+
+    assert len(reopened) == 3
+    assert reopened.dim == 8
+    np.testing.assert_allclose(reopened.vector("c"), index.vector("c"))
+
+
+def test_adding_an_existing_id_replaces_it(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=8)
+    old, new = random_vectors(2)
+    index.add(["a"], [old])
+
+    index.add(["a"], [new])
+
+    assert len(index) == 1
+    assert index.deleted_rows == 1
+    assert [hit.id for hit in index.search(old, k=5)] == ["a"]
+    assert index.search(new, k=1)[0].score == pytest.approx(1.0)
+
+
+def test_deletes_and_compaction(tmp_path):
+    vectors = random_vectors(50)
+    index = VectorIndex(str(tmp_path), dim=8)
+    index.add([f"m{i}" for i in range(50)], vectors)
+
+    assert index.delete(["m0", "m1", "unknown"]) == 2
+    assert index.delete(["m0"]) == 0
+    assert "m0" not in index
+    assert all(hit.id not in ("m0", "m1") for hit in index.search(vectors[0], k=50))
+    before = index.search(vectors[10], k=5)
+
+    assert index.compact() == 2
+    assert index.compact() == 0
+
+    assert len(index) == 48
+    assert index.deleted_rows == 0
+    assert index.search(vectors[10], k=5) == before
+    assert sorted(os.listdir(tmp_path)) == [
+        "deleted-1.i64",
+        "ids-1.txt",
+        "meta.json",
+        "meta.json.lock",
+        "vectors-1.f32",
+    ]
+    assert VectorIndex(str(tmp_path)).search(vectors[10], k=5) == before
+
+
+def test_readers_refresh_to_see_other_writers(tmp_path):
+    writer = VectorIndex(str(tmp_path), dim=8)
+    reader = VectorIndex(str(tmp_path))
+    vectors = random_vectors(3)
+
+    writer.add(["a", "b", "c"], vectors)
+    assert reader.search(vectors[0]) == []
+    assert reader.refresh()
+    assert reader.search(vectors[0], k=1)[0].id == "a"
+
+    # Compaction leaves the reader's memory map usable until it refreshes.
+    writer.delete(["b"])
+    writer.compact()
+    assert reader.search(vectors[0], k=1)[0].id == "a"
+    assert reader.refresh()
+    assert "b" not in reader
+    assert not reader.refresh()
+
+
+def test_writers_on_stale_instances_do_not_clobber(tmp_path):
+    first = VectorIndex(str(tmp_path), dim=8)
+    second = VectorIndex(str(tmp_path))
+
+    first.add(["a"], random_vectors(1))
+    second.add(["b"], random_vectors(1, seed=1))
+
+    assert len(VectorIndex(str(tmp_path))) == 2
+
+
+def test_uncommitted_writes_are_ignored(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=8)
+    index.add(["a"], random_vectors(1))
+    # A writer that crashed before updating meta.json.
+    with open(tmp_path / "vectors-0.f32", "ab") as f:
+        f.write(b"\x01" * 13)
+    with open(tmp_path / "ids-0.txt", "ab") as f:
+        f.write(b"half")
+
+    index.add(["b"], random_vectors(1, seed=1))
+
+    reopened = VectorIndex(str(tmp_path))
+    assert len(reopened) == 2
+    np.testing.assert_allclose(reopened.vector("b"), index.vector("b"))
+
+
+def test_invalid_input(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=8)
+
+    with pytest.raises(ValueError, match="dimension"):
+        index.add(["a"], random_vectors(1, dim=4))
+    with pytest.raises(ValueError, match="not unique"):
+        index.add(["a", "a"], random_vectors(2))
+    with pytest.raises(ValueError, match="line breaks"):
+        index.add(["a\nb"], random_vectors(1))
+    with pytest.raises(ValueError, match="all-zero"):
+        index.add(["a"], np.zeros((1, 8)))
+    with pytest.raises(ValueError, match="dimension 8"):
+        VectorIndex(str(tmp_path), dim=4)
+    with pytest.raises(FileNotFoundError):
+        VectorIndex(str(tmp_path / "missing"))
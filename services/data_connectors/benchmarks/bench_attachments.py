@@ -0,0 +1,76 @@
+"""
+Benchmark for AttachmentDownloader: throughput and peak memory by size.
+
+Downloads attachments of growing size from a local fake Gmail server,
+then one of the largest size through the Gmail API client, which holds
+the whole response in memory. Streamed downloads should leave the
+process's peak RSS flat; the client should not.
+
+Run from services/data_connectors:
+
+    PYTHONPATH=src:../../shared/infisical/src python benchmarks/bench_attachments.py
+"""
+
+import argparse
+import resource
+import sys
+import tempfile
+import time
+from unittest.mock import MagicMock
+
+from fake_gmail_server import fake_gmail_server
+from gmail.attachments import AttachmentDownloader, AttachmentRef, AttachmentStore
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere.
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--parallel", type=int, default=4)
+    args = parser.parse_args()
+
+    with fake_gmail_server(latency=0) as server, tempfile.TemporaryDirectory() as root:
+        downloader = AttachmentDownloader(
+            MagicMock(),
+            AttachmentStore(root),
+            max_parallel=args.parallel,
+            root_url=server.root_url,
+        )
+        print(f"peak RSS before: {peak_rss_mb():6.1f} MB")
+        for size_mb in args.sizes_mb:
+            size = size_mb * 1024 * 1024
+            refs = [
+                AttachmentRef(f"m{i}", "1", f"size-{size + i}", "a.pdf", "x", size)
+                for i in range(args.parallel)
+            ]
+            start = time.perf_counter()
+            for _, result in downloader.download_all(refs):
+                if isinstance(result, Exception):
+                    raise result
+            elapsed = time.perf_counter() - start
+            print(
+                f"  streamed  {args.parallel} x {size_mb:4d} MB  "
+                f"{args.parallel * size_mb / elapsed:7.1f} MB/s  "
+                f"peak RSS {peak_rss_mb():6.1f} MB"
+            )
+
+        size = args.sizes_mb[-1] * 1024 * 1024
+        service = server.build_service()
+        start = time.perf_counter()
+        service.users().messages().attachments().get(
+            userId="me", messageId="m", id=f"size-{size}"
+        ).execute()
+        elapsed = time.perf_counter() - start
+        print(
+            f"  client    1 x {args.sizes_mb[-1]:4d} MB  "
+            f"{args.sizes_mb[-1] / elapsed:7.1f} MB/s  peak RSS {peak_rss_mb():6.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark for BatchMessageFetcher against one messages.get per message.
+
+Both fetch the same messages from a local fake Gmail server that adds a
+fixed latency to every HTTP request.
+
+Run from services/data_connectors:
+
+    PYTHONPATH=src:../../shared/infisical/src python benchmarks/bench_batch_fetch.py
+"""
+
+import argparse
+import time
+from unittest.mock import MagicMock
+
+from fake_gmail_server import fake_gmail_server
+from gmail.batch_fetch import BatchMessageFetcher
+
+FORMATS = {
+    "full": {"format": "full"},
+    "metadata": {
+        "format": "metadata",
+        "metadata_headers": ["From", "Subject"],
+        "fields": "id,threadId,labelIds,payload/headers",
+    },
+}
+
+
+def fetch_one_by_one(service, message_ids, **kwargs):
+    messages = service.users().messages()
+    get_kwargs = {"format": kwargs["format"]}
+    if "fields" in kwargs:
+        get_kwargs["fields"] = kwargs["fields"]
+    if "metadata_headers" in kwargs:
+        get_kwargs["metadataHeaders"] = kwargs["metadata_headers"]
+    for message_id in message_ids:
+        yield messages.get(userId="me", id=message_id, **get_kwargs).execute()
+
+
+def fetch_batched(service, message_ids, **kwargs):
+    fetcher = BatchMessageFetcher(MagicMock(), service=service, **kwargs)
+    return fetcher.fetch(message_ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--format", choices=FORMATS, default="metadata")
+    args = parser.parse_args()
+
+    message_ids = [f"msg{i:06d}" for i in range(args.messages)]
+    kwargs = FORMATS[args.format]
+    print(
+        f"{args.messages} messages, format={args.format}, "
+        f"{args.latency_ms:.0f} ms per HTTP request"
+    )
+
+    for name, fetch in [
+        ("one by one", fetch_one_by_one),
+        ("batched", fetch_batched),
+    ]:
+        with fake_gmail_server(latency=args.latency_ms / 1000) as server:
+            service = server.build_service()
+            start = time.perf_counter()
+            count = sum(1 for _ in fetch(service, message_ids, **kwargs))
+            elapsed = time.perf_counter() - start
+            assert count == args.messages
+            print(
+                f"  {name:<12} {elapsed:7.2f} s  {count / elapsed:9.1f} msg/s  "
+                f"{server.requests:5d} HTTP requests"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+"""
+Offline benchmark suite for secret reads, credential retrieval, message sync
+and MCP tool calls.
+
+Every scenario runs against local stand-ins for the Infisical API, Google's
+OAuth token endpoint and the Gmail REST and batch endpoints, which add a
+fixed latency to every HTTP request, and reports throughput and p50/p99
+latency per operation. MCP tool calls read the local message index and make
+no HTTP requests.
+
+Results are written as JSON. Pass an earlier run as `--baseline` to list
+the scenarios that got slower; the exit status is 1 if any did.
+
+Run from services/data_connectors:
+
+    PYTHONPATH=src:../../shared/infisical/src:../mcp_server \\
+        python benchmarks/bench_suite.py --output before.json
+    PYTHONPATH=src:../../shared/infisical/src:../mcp_server \\
+        python benchmarks/bench_suite.py --output after.json --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+from common.infisical_client import (
+    ApiSettings,
+    AsyncInfisicalClient,
+    ClientSettings,
+    InfisicalClient,
+    SecretCache,
+)
+from fake_gmail_server import fake_gmail_server
+from fake_infisical_server import FakeInfisicalServer, fake_infisical_server
+from fake_oauth_server import FakeOAuthServer, fake_oauth_server
+from gmail.batch_fetch import BatchMessageFetcher
+from gmail.message_index import INDEX_FETCH_FIELDS, MessageIndex, sync_index
+from gmail.oauth_credentials_factory import OAuthCredentialsFactory
+from gmail.sync import GmailSyncEngine, SyncResult
+from pydantic import SecretStr
+
+SEARCH_WORDS = ["picture", "recess", "soccer", "dentist", "invoice", "field trip"]
+
+
+@dataclass
+class Result:
+    latencies: list[float]
+    seconds: float
+    http_requests: int = 0
+
+    def summary(self) -> dict[str, float]:
+        latencies = sorted(self.latencies)
+        return {
+            "ops": len(latencies),
+            "seconds": round(self.seconds, 4),
+            "throughput": round(len(latencies) / self.seconds, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+            "http_requests": self.http_requests,
+        }
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """The nearest-rank percentile of an ascending list."""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def measure(op: Callable[[int], Any], ops: int, concurrency: int) -> Result:
+    """Runs `op(0)` to `op(ops - 1)` on `concurrency` threads."""
+
+    def timed(i: int) -> float:
+        start = time.perf_counter()
+        op(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(timed, range(ops)))
+    return Result(latencies, time.perf_counter() - start)
+
+
+async def measure_async(
+    op: Callable[[int], Awaitable[Any]], ops: int, concurrency: int
+) -> Result:
+    """Runs `op(0)` to `op(ops - 1)`, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i: int) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            await op(i)
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(timed(i) for i in range(ops)))
+    return Result(list(latencies), time.perf_counter() - start)
+
+
+# --- Secret reads ---
+
+
+def infisical_settings(
+    server: FakeInfisicalServer,
+) -> tuple[ClientSettings, ApiSettings]:
+    return (
+        ClientSettings(
+            project_id="bench-project", environment_slug="prod", secret_path="/"
+        ),
+        ApiSettings(
+            INFISICAL_HOST=server.host,
+            INFISICAL_CLIENT_ID="bench",
+            INFISICAL_CLIENT_SECRET=SecretStr("bench"),
+        ),
+    )
+
+
+def bench_secret_reads(args: argparse.Namespace) -> dict[str, Result]:
+    results = {}
+    with fake_infisical_server(args.latency_ms / 1000, args.secrets) as server:
+        settings, api_settings = infisical_settings(server)
+
+        async def uncached() -> Result:
+            async with AsyncInfisicalClient(
+                settings, api_settings, max_concurrency=args.concurrency
+            ) as client:
+
+                async def read(i: int) -> None:
+                    await client.secrets.get_secret_by_name(
+                        secret_name=f"SECRET_{i % args.secrets}"
+                    )
+
+                await read(0)
+                before = server.requests
+                result = await measure_async(read, args.ops, args.concurrency)
+                result.http_requests = server.requests - before
+                return result
+
+        results["secret_read.uncached"] = asyncio.run(uncached())
+
+        for name, kwargs in [
+            ("secret_read.cached", {"cache": SecretCache(max_entries=args.secrets)}),
+            (
+                "secret_read.prefetched",
+                {"settings": settings.model_copy(update={"prefetch": True})},
+            ),
+        ]:
+            client = InfisicalClient(
+                **{"settings": settings, "api_settings": api_settings, **kwargs}
+            )
+            try:
+
+                def read(i: int) -> None:
+                    client.secrets.get_secret_by_name(
+                        secret_name=f"SECRET_{i % args.secrets}"
+                    )
+
+                for i in range(args.secrets):
+                    read(i)
+                before = server.requests
+                result = measure(read, args.ops, args.concurrency)
+                result.http_requests = server.requests - before
+                results[name] = result
+            finally:
+                client.close()
+    return results
+
+
+# --- Credential retrieval ---
+
+
+def credentials_factory(server: FakeOAuthServer) -> OAuthCredentialsFactory:
+    return OAuthCredentialsFactory(
+        token_store=server.token_store(),
+        interactive=False,
+    )
+
+
+def bench_credentials(args: argparse.Namespace) -> dict[str, Result]:
+    results = {}
+    with fake_oauth_server(args.latency_ms / 1000) as server:
+        factory = credentials_factory(server)
+        factory.get_credentials()
+        before = server.requests
+        result = measure(
+            lambda _: factory.get_credentials(), args.ops, args.concurrency
+        )
+        result.http_requests = server.requests - before
+        results["credentials.cached"] = result
+
+        # A new factory per call, each holding an expired token.
+        before = server.requests
+        result = measure(
+            lambda _: credentials_factory(server).get_credentials(),
+            args.ops,
+            args.concurrency,
+        )
+        result.http_requests = server.requests - before
+        results["credentials.refresh"] = result
+    return results
+
+
+# --- Message sync ---
+
+
+def bench_message_sync(args: argparse.Namespace) -> dict[str, Result]:
+    results = {}
+    with (
+        fake_oauth_server(args.latency_ms / 1000) as oauth,
+        fake_gmail_server(
+            args.latency_ms / 1000, args.mailbox, args.history_changes
+        ) as gmail,
+    ):
+        factory = credentials_factory(oauth)
+        factory.get_credentials()
+        # The Gmail client is not thread-safe, and an account syncs one
+        # sync at a time anyway.
+        service = gmail.build_service()
+        fetcher = BatchMessageFetcher(
+            factory, format="full", fields=INDEX_FETCH_FIELDS, service=service
+        )
+
+        def full_sync(_: int) -> SyncResult:
+            engine = GmailSyncEngine(factory, service=service)
+            index = MessageIndex()
+            try:
+                return sync_index(engine, fetcher, index)
+            finally:
+                index.close()
+
+        before = gmail.requests
+        result = measure(full_sync, args.sync_ops, 1)
+        result.http_requests = gmail.requests - before
+        results["message_sync.full"] = result
+
+        engine = GmailSyncEngine(factory, service=service)
+        index = MessageIndex()
+        try:
+            sync_index(engine, fetcher, index)
+            before = gmail.requests
+            result = measure(
+                lambda _: sync_index(engine, fetcher, index), args.sync_ops, 1
+            )
+            result.http_requests = gmail.requests - before
+            results["message_sync.incremental"] = result
+        finally:
+            index.close()
+    return results
+
+
+# --- MCP tool calls ---
+
+
+def index_messages(path: str, count: int) -> None:
+    messages = [
+        {
+            "id": f"m{i:06d}",
+            "labelIds": ["INBOX", "UNREAD"] if i % 3 else ["INBOX"],
+            "internalDate": str(1_700_000_000_000 + i * 60_000),
+            "snippet": f"About the {SEARCH_WORDS[i % len(SEARCH_WORDS)]} on Friday",
+            "payload": {
+                "headers": [
+                    {"name": "From", "value": f"sender{i % 40}@school.example"},
+                    {
+                        "name": "Subject",
+                        "value": f"{SEARCH_WORDS[i % len(SEARCH_WORDS)]} #{i}",
+                    },
+                ]
+            },
+        }
+        for i in range(count)
+    ]
+    index = MessageIndex(path)
+    try:
+        index.apply_sync(
+            SyncResult("me", "1", full_sync=True, added={m["id"] for m in messages}),
+            messages,
+        )
+    finally:
+        index.close()
+
+
+def bench_mcp_tools(args: argparse.Namespace) -> dict[str, Result]:
+    # The MCP server is a flat module, see the PYTHONPATH in the docstring.
+    import main as mcp_server
+    from fastmcp import Client
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "index.db")
+        index_messages(path, args.index_messages)
+        os.environ["GMAIL_INDEX_DB"] = path
+        for name, ttl in [
+            ("mcp_tool.search_emails", "0"),
+            ("mcp_tool.search_emails_cached", "30"),
+        ]:
+            os.environ["MCP_CACHE_TTL"] = ttl
+            mcp_server._settings.cache_clear()
+            mcp_server._index.cache_clear()
+            mcp_server._runner.cache_clear()
+
+            async def run() -> Result:
+                async with Client(mcp_server.mcp) as client:
+
+                    async def search(i: int) -> None:
+                        word = SEARCH_WORDS[i % len(SEARCH_WORDS)]
+                        await client.call_tool("search_emails", {"text": word})
+
+                    await search(0)
+                    return await measure_async(search, args.ops, args.concurrency)
+
+            results[name] = asyncio.run(run())
+    return results
+
+
+SCENARIOS: dict[str, Callable[[argparse.Namespace], dict[str, Result]]] = {
+    "secret_read": bench_secret_reads,
+    "credentials": bench_credentials,
+    "message_sync": bench_message_sync,
+    "mcp_tool": bench_mcp_tools,
+}
+
+
+# --- Reporting ---
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    tolerance: float,
+    min_delta_ms: float,
+) -> list[str]:
+    """
+    Prints how each scenario changed since `baseline`.
+
+    Returns:
+        The scenarios whose p50, p99 or time per call (the inverse of
+        throughput) grew by more than `tolerance`, as a fraction, and by
+        more than `min_delta_ms`, so noise in sub-millisecond scenarios
+        does not count.
+    """
+    if baseline["config"] != current["config"]:
+        print("Warning: the baseline was run with other settings")
+    print(f"\nCompared with {baseline.get('commit') or 'the baseline'}:")
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        times = {
+            "p50": (before["p50_ms"], now["p50_ms"]),
+            "p99": (before["p99_ms"], now["p99_ms"]),
+            "throughput": (1000 / before["throughput"], 1000 / now["throughput"]),
+        }
+        worse = [
+            metric
+            for metric, (old, new) in times.items()
+            if new > old * (1 + tolerance) and new - old > min_delta_ms
+        ]
+        print(
+            f"  {name:<32} p50 {_change(*times['p50']):+7.1%}  "
+            f"p99 {_change(*times['p99']):+7.1%}  "
+            f"throughput {_change(before['throughput'], now['throughput']):+7.1%}"
+            + (f"  REGRESSED ({', '.join(worse)})" if worse else "")
+        )
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def _change(before: float, after: float) -> float:
+    """How much larger `after` is, as a fraction of `before`."""
+    return after / before - 1 if before else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--ops", type=int, default=200, help="Calls per scenario")
+    parser.add_argument(
+        "--sync-ops", type=int, default=5, help="Syncs per message sync scenario"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--secrets", type=int, default=50)
+    parser.add_argument("--mailbox", type=int, default=500)
+    parser.add_argument("--history-changes", type=int, default=20)
+    parser.add_argument("--index-messages", type=int, default=5000)
+    parser.add_argument(
+        "--only", action="append", choices=SCENARIOS, help="Scenario groups to run"
+    )
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="An earlier --output to compare with")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="How much worse a metric may get before it counts as a regression",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=0.5,
+        help="How many ms worse a metric must get to count as a regression",
+    )
+    args = parser.parse_args()
+
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("only", "output", "baseline", "tolerance", "min_delta_ms")
+    }
+    print(
+        f"{args.latency_ms:.0f} ms per HTTP request, "
+        f"{args.ops} calls, {args.concurrency} at a time"
+    )
+    summaries = {}
+    for group in args.only or SCENARIOS:
+        for name, result in SCENARIOS[group](args).items():
+            summary = summaries[name] = result.summary()
+            print(
+                f"  {name:<32} {summary['throughput']:9.1f} ops/s  "
+                f"p50 {summary['p50_ms']:8.2f} ms  p99 {summary['p99_ms']:8.2f} ms  "
+                f"{summary['http_requests']:5d} HTTP requests"
+            )
+
+    report = {
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": summaries,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(
+                json.load(f), report, args.tolerance, args.min_delta_ms
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+A local stand-in for the Gmail REST and batch endpoints, for benchmarks.
+
+Every HTTP request (a single `messages.get`, a whole batch, a list page or
+an `attachments.get`) waits `latency` seconds before it is answered,
+approximating the round trip to Google. Sub-requests inside a batch add no
+extra latency.
+
+The mailbox holds `mailbox` messages to list, and every `history.list`
+call reports `history_changes` newly added ones.
+"""
+
+import base64
+import json
+import re
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from email.parser import Parser
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from fake_http import FakeHandler, FakeServer, serve
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+USER_PATH = re.compile(r"^/gmail/v1/users/[^/]+/(profile|messages|history)$")
+MESSAGE_PATH = re.compile(r"^/gmail/v1/users/[^/]+/messages/([^/?]+)")
+# Attachment ids are "size-<bytes>"; the content is generated on the fly.
+ATTACHMENT_PATH = re.compile(
+    r"^/gmail/v1/users/[^/]+/messages/[^/]+/attachments/size-(\d+)"
+)
+# Divisible by 3, so blocks encode to base64 without padding.
+ATTACHMENT_BLOCK = bytes(range(256)) * 192
+REQUEST_LINE = re.compile(r"^\w+ (\S+) HTTP/1\.1", re.MULTILINE)
+BOUNDARY = "fake-gmail-boundary"
+
+
+def fake_message(message_id: str) -> dict[str, Any]:
+    return {
+        "id": message_id,
+        "threadId": f"thread-{message_id}",
+        "labelIds": ["INBOX", "UNREAD"],
+        "snippet": "Reminder: school picture day is on Friday",
+        "internalDate": "1700000000000",
+        "payload": {
+            "headers": [
+                {"name": "From", "value": "office@school.example"},
+                {"name": "Subject", "value": f"Newsletter {message_id}"},
+            ]
+        },
+    }
+
+
+class FakeGmailHandler(FakeHandler):
+    server: "FakeGmailServer"
+
+    def do_GET(self) -> None:
+        self.wait()
+        url = urlparse(self.path)
+        listing = USER_PATH.match(url.path)
+        if listing is not None:
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            self.send_json(200, self.server.answer(listing.group(1), query))
+            return
+        attachment = ATTACHMENT_PATH.match(self.path)
+        if attachment is not None:
+            self._send_attachment(int(attachment.group(1)))
+            return
+        match = MESSAGE_PATH.match(self.path)
+        if match is None:
+            self.send_json(404, {})
+            return
+        self.send_json(200, fake_message(match.group(1)))
+
+    def do_POST(self) -> None:
+        self.wait()
+        body = self.read_body().decode()
+        batch = Parser().parsestr(
+            f"content-type: {self.headers['Content-Type']}\n\n{body}"
+        )
+        parts = []
+        for part in batch.get_payload():
+            path = REQUEST_LINE.search(part.get_payload()).group(1)
+            message_id = MESSAGE_PATH.match(urlparse(path).path).group(1)
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(
+                f"--{BOUNDARY}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: {content_id}\r\n\r\n"
+                "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n"
+                f"{json.dumps(fake_message(message_id))}\r\n"
+            )
+        response = ("".join(parts) + f"--{BOUNDARY}--").encode()
+        self.send_body(200, f"multipart/mixed; boundary={BOUNDARY}", response)
+
+    def _send_attachment(self, size: int) -> None:
+        """Streams an `attachments.get` response with `size` bytes of data."""
+        blocks, rest = divmod(size, len(ATTACHMENT_BLOCK))
+        encoded = base64.urlsafe_b64encode(ATTACHMENT_BLOCK)
+        tail = base64.urlsafe_b64encode(ATTACHMENT_BLOCK[:rest])
+        head, end = b'{\n  "data": "', b'"\n}\n'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        length = len(head) + blocks * len(encoded) + len(tail) + len(end)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        self.wfile.write(head)
+        for _ in range(blocks):
+            self.wfile.write(encoded)
+        self.wfile.write(tail + end)
+
+
+class FakeGmailServer(FakeServer):
+    def __init__(self, latency: float, mailbox: int = 0, history_changes: int = 0):
+        super().__init__(FakeGmailHandler, latency)
+        self.mailbox = mailbox
+        self.history_changes = history_changes
+        self.history_id = 1000
+        self._history_lock = threading.Lock()
+
+    def answer(self, resource: str, query: dict[str, str]) -> dict[str, Any]:
+        """Answers `users.getProfile`, `messages.list` and `history.list`."""
+        if resource == "profile":
+            return {"historyId": str(self.history_id)}
+        if resource == "messages":
+            start = int(query.get("pageToken", 0))
+            end = min(start + int(query.get("maxResults", 100)), self.mailbox)
+            page: dict[str, Any] = {
+                "messages": [{"id": f"msg{i:06d}"} for i in range(start, end)]
+            }
+            if end < self.mailbox:
+                page["nextPageToken"] = str(end)
+            return page
+        with self._history_lock:
+            first = self.mailbox
+            self.mailbox += self.history_changes
+            self.history_id += 1
+            added = [
+                {"message": {"id": f"msg{i:06d}", "labelIds": ["INBOX", "UNREAD"]}}
+                for i in range(first, self.mailbox)
+            ]
+            return {
+                "history": [{"messagesAdded": added}] if added else [],
+                "historyId": str(self.history_id),
+            }
+
+    def build_service(self) -> Any:
+        """A Gmail API service that talks to this server."""
+        document = json.loads(get_static_doc("gmail", "v1"))
+        document["rootUrl"] = self.root_url
+        document["baseUrl"] = f"{self.root_url}gmail/v1/"
+        return build_from_document(document, http=httplib2.Http())
+
+
+@contextmanager
+def fake_gmail_server(
+    latency: float = 0.05, mailbox: int = 0, history_changes: int = 0
+) -> Iterator[FakeGmailServer]:
+    with serve(FakeGmailServer(latency, mailbox, history_changes)) as server:
+        yield server
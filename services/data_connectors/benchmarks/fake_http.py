@@ -0,0 +1,76 @@
+"""
+The parts shared by the local API stand-ins used in benchmarks: a
+threaded HTTP server that counts requests and delays every answer by a
+fixed latency, approximating the round trip to the real service.
+"""
+
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, TypeVar
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle's algorithm
+    # the body would wait for the client's delayed ACK, adding ~40 ms.
+    disable_nagle_algorithm = True
+    server: "FakeServer"
+
+    def wait(self) -> None:
+        """Counts the request and waits out the server's latency."""
+        self.server.count_request()
+        time.sleep(self.server.latency)
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def send_json(self, status: int, data: Any) -> None:
+        self.send_body(status, "application/json", json.dumps(data).encode())
+
+    def send_body(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler: type[FakeHandler], latency: float):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency
+        self.requests = 0
+        self._count_lock = threading.Lock()
+
+    def count_request(self) -> None:
+        with self._count_lock:
+            self.requests += 1
+
+    @property
+    def root_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+S = TypeVar("S", bound=FakeServer)
+
+
+@contextmanager
+def serve(server: S) -> Iterator[S]:
+    """Runs `server` in a background thread until the block ends."""
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
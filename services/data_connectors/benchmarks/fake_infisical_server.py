@@ -0,0 +1,96 @@
+"""
+A local stand-in for the Infisical API, for benchmarks.
+
+Answers universal auth logins, single secret reads and path listings.
+Every request waits `latency` seconds. The project holds `secrets`
+secrets named SECRET_0, SECRET_1 and so on.
+"""
+
+import json
+import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+from urllib.parse import urlparse
+
+from fake_http import FakeHandler, FakeServer, serve
+
+LOGIN_PATH = "/api/v1/auth/universal-auth/login"
+LIST_PATH = "/api/v3/secrets/raw"
+SECRET_PATH = re.compile(r"^/api/v3/secrets/raw/([^/?]+)$")
+ACCESS_TOKEN = "fake-infisical-token"
+
+
+def fake_secret(name: str) -> dict[str, Any]:
+    return {
+        "id": f"id-{name}",
+        "_id": f"id-{name}",
+        "workspace": "bench-project",
+        "environment": "prod",
+        "version": 1,
+        "type": "shared",
+        "secretKey": name,
+        "secretValue": f"value-of-{name}",
+        "secretComment": "",
+        "secretPath": "/",
+        "createdAt": "2025-01-01T00:00:00Z",
+        "updatedAt": "2025-01-01T00:00:00Z",
+    }
+
+
+class FakeInfisicalHandler(FakeHandler):
+    server: "FakeInfisicalServer"
+
+    def do_POST(self) -> None:
+        self.wait()
+        body = json.loads(self.read_body() or b"{}")
+        if self.path != LOGIN_PATH or "clientSecret" not in body:
+            self.send_json(404, {"message": "Not found"})
+            return
+        self.server.logins += 1
+        self.send_json(
+            200,
+            {
+                "accessToken": ACCESS_TOKEN,
+                "expiresIn": 3600,
+                "accessTokenMaxTTL": 3600,
+                "tokenType": "Bearer",
+            },
+        )
+
+    def do_GET(self) -> None:
+        self.wait()
+        if self.headers.get("Authorization") != f"Bearer {ACCESS_TOKEN}":
+            self.send_json(401, {"message": "Token missing or invalid"})
+            return
+        path = urlparse(self.path).path
+        if path == LIST_PATH:
+            secrets = [fake_secret(f"SECRET_{i}") for i in range(self.server.secrets)]
+            self.send_json(200, {"secrets": secrets, "imports": []})
+            return
+        match = SECRET_PATH.match(path)
+        if match is None or match.group(1) not in self.server.names:
+            self.send_json(404, {"message": "Secret not found"})
+            return
+        self.send_json(200, {"secret": fake_secret(match.group(1))})
+
+
+class FakeInfisicalServer(FakeServer):
+    def __init__(self, latency: float, secrets: int = 50):
+        super().__init__(FakeInfisicalHandler, latency)
+        self.secrets = secrets
+        self.names = frozenset(f"SECRET_{i}" for i in range(secrets))
+        self.logins = 0
+
+    @property
+    def host(self) -> str:
+        """The INFISICAL_HOST to point clients at."""
+        return self.root_url.rstrip("/")
+
+
+@contextmanager
+def fake_infisical_server(
+    latency: float = 0.02, secrets: int = 50
+) -> Iterator[FakeInfisicalServer]:
+    with serve(FakeInfisicalServer(latency, secrets)) as server:
+        yield server
@@ -0,0 +1,88 @@
+"""
+A local stand-in for Google's OAuth 2.0 token endpoint, for benchmarks.
+
+Answers refresh token grants with a new access token. Every request waits
+`latency` seconds.
+
+google-auth always sends refreshes to Google, whatever `token_uri` the token
+JSON holds, so use `token_store()` to get credentials that refresh here.
+"""
+
+import itertools
+import json
+from collections.abc import Iterator
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+
+from fake_http import FakeHandler, FakeServer, serve
+from gmail.token_store import MemoryTokenStore
+from google.oauth2.credentials import Credentials
+
+TOKEN_PATH = "/token"
+SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
+
+
+class FakeOAuthHandler(FakeHandler):
+    server: "FakeOAuthServer"
+
+    def do_POST(self) -> None:
+        self.wait()
+        form = {k: v[0] for k, v in parse_qs(self.read_body().decode()).items()}
+        if self.path != TOKEN_PATH or form.get("grant_type") != "refresh_token":
+            self.send_json(400, {"error": "unsupported_grant_type"})
+            return
+        self.send_json(
+            200,
+            {
+                "access_token": f"access-{next(self.server.issued)}",
+                "expires_in": 3599,
+                "scope": " ".join(SCOPES),
+                "token_type": "Bearer",
+            },
+        )
+
+
+class FakeServerTokenStore(MemoryTokenStore):
+    """A MemoryTokenStore whose credentials refresh at `token_uri`."""
+
+    def __init__(self, token_json: str, token_uri: str):
+        super().__init__(token_json)
+        self.token_uri = token_uri
+
+    def _parse(self, token_json: str, scopes: list[str]) -> Credentials:
+        parsed = super()._parse(token_json, scopes)
+        creds = parsed.with_token_uri(self.token_uri)
+        # The copy leaves out the expiry.
+        creds.expiry = parsed.expiry
+        return creds
+
+
+class FakeOAuthServer(FakeServer):
+    def __init__(self, latency: float):
+        super().__init__(FakeOAuthHandler, latency)
+        self.issued = itertools.count(1)
+
+    @property
+    def token_uri(self) -> str:
+        return f"{self.root_url.rstrip('/')}{TOKEN_PATH}"
+
+    def token_store(self) -> FakeServerTokenStore:
+        """A store holding an expired token, which refreshes at this server."""
+        token_json = json.dumps(
+            {
+                "token": "expired",
+                "refresh_token": "refresh",
+                "token_uri": self.token_uri,
+                "client_id": "bench-client",
+                "client_secret": "bench-secret",
+                "scopes": SCOPES,
+                "expiry": "2000-01-01T00:00:00Z",
+            }
+        )
+        return FakeServerTokenStore(token_json, self.token_uri)
+
+
+@contextmanager
+def fake_oauth_server(latency: float = 0.05) -> Iterator[FakeOAuthServer]:
+    with serve(FakeOAuthServer(latency)) as server:
+        yield server
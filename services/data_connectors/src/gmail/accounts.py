@@ -0,0 +1,264 @@
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any
+
+from .batch_fetch import BatchMessageFetcher
+from .checkpoints import CheckpointStore, MemoryCheckpointStore
+from .message_index import INDEX_FETCH_FIELDS, Categorizer, MessageIndex, sync_index
+from .oauth_credentials_factory import OAuthCredentialsFactory
+from .quota import QuotaScheduler
+from .sync import GmailSyncEngine, SyncResult
+from .token_store import TokenStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GmailAccount:
+    """Everything needed to sync one mailbox into the index."""
+
+    email_address: str
+    credentials_factory: OAuthCredentialsFactory
+    engine: GmailSyncEngine
+    fetcher: BatchMessageFetcher
+    index: MessageIndex
+
+    def sync(self) -> SyncResult:
+        """Syncs the mailbox and brings its index up to date."""
+        return sync_index(self.engine, self.fetcher, self.index)
+
+
+@dataclass(frozen=True)
+class AccountSyncOutcome:
+    """How one account's sync in `AccountSyncOrchestrator.sync_all()` went."""
+
+    email_address: str
+    result: SyncResult | None = None
+    error: BaseException | None = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class AccountSyncOrchestrator:
+    """
+    Syncs the mailboxes of several accounts at once.
+
+    Each account gets its own OAuthCredentialsFactory, backed by its own
+    token store, and its own sync engine, fetcher and index. Syncs run on
+    a bounded pool of worker threads, and all of them share one
+    QuotaScheduler, which paces each account within its own quota and
+    caps the Gmail calls in flight across accounts at `max_connections`.
+
+    Accounts are isolated from each other: a failing sync only fails its
+    own outcome, and a slow one holds at most one worker, since further
+    syncs of an account merge into one follow-up, which only takes a
+    worker once the running sync is done. The accounts can share one
+    index database, since MessageIndex never holds its write lock while
+    fetching.
+
+        orchestrator = AccountSyncOrchestrator(
+            token_store=lambda email: FileTokenStore(f"tokens/{email}.json"),
+            checkpoint_store=SqliteCheckpointStore("sync.db"),
+            index_path="messages.db",
+        )
+        for outcome in orchestrator.sync_all(["ana@example.com", "ben@..."]):
+            if not outcome.ok:
+                ...
+    """
+
+    def __init__(
+        self,
+        token_store: Callable[[str], TokenStore],
+        checkpoint_store: CheckpointStore | None = None,
+        index_path: str = ":memory:",
+        credentials_path: str = "credentials.json",
+        client_config: dict[str, Any] | None = None,
+        scopes: list[str] | None = None,
+        categorize: Categorizer | None = None,
+        max_workers: int = 4,
+        max_connections: int = 16,
+        quota: QuotaScheduler | None = None,
+        service: Callable[[str], Any] | None = None,
+    ):
+        """
+        Initializes the orchestrator. No network calls are made here.
+
+        Args:
+            token_store: Returns the token store of an account, given its
+                         email address, e.g. a FileTokenStore per account.
+            checkpoint_store: Where each account's historyId checkpoint is
+                              kept. Defaults to memory only.
+            index_path: The SQLite database the accounts are indexed in.
+            credentials_path: Path to the OAuth 2.0 client secrets file.
+            client_config: The OAuth client secrets as a dict, used instead
+                           of `credentials_path`.
+            scopes: List of OAuth 2.0 scopes for API access.
+            categorize: Sorts indexed messages into categories.
+            max_workers: Accounts that can sync at once.
+            max_connections: The most Gmail calls in flight across all
+                             accounts, when no `quota` is given.
+            quota: Paces every account's calls. Defaults to a
+                   QuotaScheduler capped at `max_connections`.
+            service: Returns a pre-built Gmail API service for an account,
+                     mostly for tests.
+
+        Raises:
+            ValueError: If max_workers is not positive.
+        """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+        self.checkpoint_store = (
+            checkpoint_store if checkpoint_store else MemoryCheckpointStore()
+        )
+        self.index_path = index_path
+        self.credentials_path = credentials_path
+        self.client_config = client_config
+        self.scopes = scopes
+        self.categorize = categorize
+        self.quota = quota if quota else QuotaScheduler(max_connections=max_connections)
+
+        self._token_store = token_store
+        self._service = service
+        self._accounts: dict[str, GmailAccount] = {}
+        # Syncs submitted but not yet started, by account.
+        self._queued: dict[str, Future[SyncResult]] = {}
+        # Accounts with a sync on the pool; one per account at a time.
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="gmail-sync"
+        )
+
+    def account(self, email_address: str) -> GmailAccount:
+        """Returns the account, setting it up on first use."""
+        with self._lock:
+            account = self._accounts.get(email_address)
+            if account is None:
+                account = self._accounts[email_address] = self._open(email_address)
+            return account
+
+    def accounts(self) -> list[str]:
+        """The accounts set up so far."""
+        with self._lock:
+            return list(self._accounts)
+
+    def submit(self, email_address: str) -> Future[SyncResult]:
+        """
+        Schedules a sync of the account on the worker pool. Never blocks.
+
+        If a sync of the account is already waiting to start, it covers
+        this request too and its future is returned. While a sync of the
+        account runs, the next one waits off the pool, so that a slow
+        account never holds more than one worker.
+
+        Returns:
+            The sync's result, or the error it failed with.
+        """
+        self.account(email_address)
+        with self._lock:
+            future = self._queued.get(email_address)
+            if future is None:
+                future = self._queued[email_address] = Future()
+                if email_address not in self._running:
+                    self._running.add(email_address)
+                    self._executor.submit(self._run, email_address)
+            return future
+
+    def sync(self, email_address: str) -> SyncResult:
+        """Syncs the account on the worker pool and waits for the result."""
+        return self.submit(email_address).result()
+
+    def sync_all(self, email_addresses: Iterable[str]) -> Iterator[AccountSyncOutcome]:
+        """
+        Syncs the accounts concurrently, yielding each outcome as soon as
+        its sync finishes, so slow accounts do not hold up the others'.
+        Errors are reported in the outcomes rather than raised.
+        """
+        started = time.monotonic()
+        futures = {self.submit(e): e for e in dict.fromkeys(email_addresses)}
+        for future in as_completed(futures):
+            email_address = futures[future]
+            seconds = time.monotonic() - started
+            error = future.exception()
+            if error is not None:
+                logger.error("Syncing %s failed: %s", email_address, error)
+                yield AccountSyncOutcome(email_address, error=error, seconds=seconds)
+            else:
+                yield AccountSyncOutcome(
+                    email_address, result=future.result(), seconds=seconds
+                )
+
+    def close(self) -> None:
+        """Waits for running syncs, drops queued ones and closes the indexes."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for future in self._queued.values():
+                future.cancel()
+            self._queued.clear()
+            for account in self._accounts.values():
+                account.index.close()
+
+    def _run(self, email_address: str) -> None:
+        # From here on, new requests need a sync of their own.
+        with self._lock:
+            future = self._queued.pop(email_address)
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(self.account(email_address).sync())
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                if email_address in self._queued:
+                    # Requested while this sync ran; it takes this worker's place.
+                    self._submit_follow_up(email_address)
+                else:
+                    self._running.discard(email_address)
+
+    def _submit_follow_up(self, email_address: str) -> None:
+        try:
+            self._executor.submit(self._run, email_address)
+        except RuntimeError:
+            # Closing; the follow-up is dropped like any other queued sync.
+            self._running.discard(email_address)
+            self._queued.pop(email_address).cancel()
+
+    def _open(self, email_address: str) -> GmailAccount:
+        factory = OAuthCredentialsFactory(
+            credentials_path=self.credentials_path,
+            scopes=self.scopes,
+            token_store=self._token_store(email_address),
+            client_config=self.client_config,
+            # There is no one to complete an OAuth flow for every account.
+            interactive=False,
+        )
+        service = self._service(email_address) if self._service else None
+        return GmailAccount(
+            email_address=email_address,
+            credentials_factory=factory,
+            engine=GmailSyncEngine(
+                factory,
+                self.checkpoint_store,
+                account=email_address,
+                service=service,
+                quota=self.quota,
+            ),
+            fetcher=BatchMessageFetcher(
+                factory,
+                fields=INDEX_FETCH_FIELDS,
+                service=service,
+                account=email_address,
+                quota=self.quota,
+            ),
+            index=MessageIndex(
+                self.index_path, account=email_address, categorize=self.categorize
+            ),
+        )
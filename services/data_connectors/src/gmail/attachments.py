@@ -0,0 +1,350 @@
+import base64
+import contextvars
+import hashlib
+import itertools
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, BinaryIO
+from urllib.parse import quote
+
+import httplib2
+import requests
+from googleapiclient.errors import HttpError
+from requests.adapters import HTTPAdapter
+
+from .oauth_credentials_factory import OAuthCredentialsFactory
+from .quota import QuotaScheduler, is_retryable, quota_slot
+from .service import timed_call
+
+logger = logging.getLogger(__name__)
+
+GMAIL_ROOT_URL = "https://gmail.googleapis.com/"
+
+# Bytes read from the network at a time.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_DATA_FIELD = re.compile(rb'"data"\s*:\s*"')
+# The most response bytes expected before the "data" field starts.
+_MAX_PREFIX = 64 * 1024
+
+
+@dataclass(frozen=True)
+class AttachmentRef:
+    """
+    Points to an attachment without its content, which is only downloaded
+    on demand.
+    """
+
+    message_id: str
+    # The MIME part, e.g. "1" or "0.2".
+    part_id: str
+    # Gmail's id for `attachments.get`. Not stable: it can differ each time
+    # the message is fetched, so attachments are identified by part_id.
+    attachment_id: str
+    filename: str
+    mime_type: str
+    # The decoded size in bytes, as reported by Gmail.
+    size: int
+    # The content's SHA-256, once it is in an AttachmentStore.
+    sha256: str | None = None
+
+
+def attachment_refs(message: dict[str, Any]) -> list[AttachmentRef]:
+    """
+    Lists the attachments of a `messages.get` response in "full" format,
+    from its MIME parts. Nothing is downloaded.
+    """
+    refs = []
+    stack = [message.get("payload", {})]
+    while stack:
+        part = stack.pop()
+        body = part.get("body", {})
+        if body.get("attachmentId"):
+            refs.append(
+                AttachmentRef(
+                    message_id=message["id"],
+                    part_id=part.get("partId", ""),
+                    attachment_id=body["attachmentId"],
+                    filename=part.get("filename", ""),
+                    mime_type=part.get("mimeType", "application/octet-stream"),
+                    size=int(body.get("size", 0)),
+                )
+            )
+        stack.extend(reversed(part.get("parts", [])))
+    return refs
+
+
+@dataclass(frozen=True)
+class StoredAttachment:
+    sha256: str
+    size: int
+    path: str
+
+
+class AttachmentStore:
+    """
+    Keeps attachment contents on disk by SHA-256, so an attachment that
+    arrives many times (e.g. the same newsletter PDF) is stored once.
+
+    Files live at `<root>/<first two hex digits>/<sha256>` and are written
+    through a temporary file, so a file at its final path is complete.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._tmp = os.path.join(root, "tmp")
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def __contains__(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def get(self, sha256: str) -> StoredAttachment | None:
+        path = self.path(sha256)
+        try:
+            return StoredAttachment(sha256, os.path.getsize(path), path)
+        except FileNotFoundError:
+            return None
+
+    def open(self, sha256: str) -> BinaryIO:
+        """
+        Raises:
+            FileNotFoundError: If the store has no such content.
+        """
+        return open(self.path(sha256), "rb")
+
+    def put(self, chunks: Iterable[bytes]) -> StoredAttachment:
+        """
+        Stores content as it arrives, hashing it on the way, so only one
+        chunk is in memory at a time.
+
+        Returns:
+            The stored content. If it was already stored, the new copy is
+            dropped.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+            path = self.path(sha256)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return StoredAttachment(sha256, size, path)
+
+
+class AttachmentDownloader:
+    """
+    Downloads attachments into an AttachmentStore, a few at a time.
+
+    `attachments.get` returns the content base64-encoded inside a JSON
+    object. The response is decoded as it streams in, so memory use stays
+    at a few chunks per download whatever the attachment size.
+
+        downloader = AttachmentDownloader(factory, AttachmentStore("files"))
+        for ref, result in downloader.download_all(attachment_refs(message)):
+            ...
+    """
+
+    def __init__(
+        self,
+        credentials_factory: OAuthCredentialsFactory,
+        store: AttachmentStore,
+        user_id: str = "me",
+        max_parallel: int = 4,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_retries: int = 5,
+        backoff_seconds: float = 1.0,
+        root_url: str = GMAIL_ROOT_URL,
+        session: requests.Session | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+        account: str | None = None,
+        quota: QuotaScheduler | None = None,
+    ):
+        """
+        Initializes the downloader. No network calls are made here.
+
+        Args:
+            credentials_factory: Provides credentials for the Gmail API.
+            store: Where downloaded contents go.
+            user_id: The Gmail user to download from, "me" for the
+                     authorized user.
+            max_parallel: Downloads running at the same time.
+            chunk_size: Bytes read from the network at a time.
+            max_retries: How often a download failing with a transient
+                         error (rate limits, 5xx) is retried.
+            backoff_seconds: The delay before the first retry; doubled,
+                             with jitter, for each further retry.
+            root_url: The Gmail API root, mostly for tests and benchmarks.
+            session: The HTTP session to use, mostly for tests.
+            sleep: Used to wait between retries.
+            account: The key quota is tracked under. Defaults to `user_id`;
+                     set it when downloading from several accounts.
+            quota: Paces downloads within the account's quota. Without it,
+                   nothing is paced.
+        """
+        self.credentials_factory = credentials_factory
+        self.store = store
+        self.user_id = user_id
+        self.max_parallel = max_parallel
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.root_url = root_url
+        self.account = account if account else user_id
+        self.quota = quota
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=max_parallel)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self._session = session
+        self._sleep = sleep
+
+    def download(self, ref: AttachmentRef) -> StoredAttachment:
+        """
+        Downloads one attachment, unless its content is already stored.
+
+        Raises:
+            HttpError: If the download fails with a non-transient error,
+                       or still fails after `max_retries` retries.
+            ValueError: If the response has no attachment data.
+        """
+        if ref.sha256 is not None:
+            stored = self.store.get(ref.sha256)
+            if stored is not None:
+                return stored
+        for attempt in itertools.count():
+            try:
+                return self._download(ref)
+            except HttpError as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_seconds * 2**attempt * random.uniform(0.5, 1.0)
+                logger.info(
+                    "Retrying attachment %s of %s in %.1fs",
+                    ref.part_id,
+                    ref.message_id,
+                    delay,
+                )
+                self._sleep(delay)
+        raise AssertionError("unreachable")
+
+    def download_all(
+        self, refs: Iterable[AttachmentRef]
+    ) -> Iterator[tuple[AttachmentRef, StoredAttachment | Exception]]:
+        """
+        Downloads attachments, `max_parallel` at a time.
+
+        Args:
+            refs: The attachments to download. Consumed lazily.
+
+        Yields:
+            Each attachment with what it was stored as, or the exception
+            its download failed with, in order.
+        """
+        refs = iter(refs)
+        pending: deque[tuple[AttachmentRef, Future[StoredAttachment]]] = deque()
+        with ThreadPoolExecutor(
+            self.max_parallel, thread_name_prefix="attachments"
+        ) as pool:
+            while True:
+                # Keep the pool busy, without reading all refs up front.
+                for ref in itertools.islice(refs, 2 * self.max_parallel - len(pending)):
+                    # Downloads keep the caller's quota priority.
+                    download = contextvars.copy_context().run
+                    pending.append((ref, pool.submit(download, self.download, ref)))
+                if not pending:
+                    return
+                ref, future = pending.popleft()
+                try:
+                    yield ref, future.result()
+                except Exception as e:
+                    yield ref, e
+
+    def _download(self, ref: AttachmentRef) -> StoredAttachment:
+        url = (
+            f"{self.root_url}gmail/v1/users/{quote(self.user_id, safe='')}"
+            f"/messages/{quote(ref.message_id, safe='')}"
+            f"/attachments/{quote(ref.attachment_id, safe='')}"
+        )
+        headers: dict[str, str] = {}
+        self.credentials_factory.get_credentials().apply(headers)
+        with (
+            quota_slot(self.quota, self.account, "attachments.get"),
+            timed_call("attachments.get"),
+            self._session.get(
+                url, params={"fields": "data"}, headers=headers, stream=True
+            ) as response,
+        ):
+            if response.status_code != 200:
+                raise HttpError(
+                    httplib2.Response({"status": response.status_code}),
+                    response.content,
+                    uri=url,
+                )
+            return self.store.put(
+                decode_data_field(response.iter_content(self.chunk_size))
+            )
+
+
+def decode_data_field(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Decodes the base64url "data" field of an `attachments.get` response
+    while it streams in.
+
+    Raises:
+        ValueError: If the response has no "data" field.
+    """
+    chunks = iter(chunks)
+    prefix = b""
+    for chunk in chunks:
+        prefix += chunk
+        match = _DATA_FIELD.search(prefix)
+        if match:
+            rest = prefix[match.end() :]
+            break
+        if len(prefix) > _MAX_PREFIX:
+            break
+    else:
+        match = None
+    if match is None:
+        raise ValueError("The attachment response has no data field")
+    del prefix
+
+    carry = b""
+    for chunk in itertools.chain([rest], chunks):
+        end = chunk.find(b'"')
+        data = carry + (chunk if end < 0 else chunk[:end])
+        if end >= 0:
+            if data:
+                yield base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+            return
+        # Only decode whole 4-character groups; keep the rest for later.
+        whole = len(data) - len(data) % 4
+        carry = data[whole:]
+        if whole:
+            yield base64.urlsafe_b64decode(data[:whole])
+    raise ValueError("The attachment response ended inside the data field")
@@ -0,0 +1,117 @@
+import json
+import os.path
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import closing
+
+from common.client_utils import atomic_write, file_lock
+
+
+class CheckpointStore(ABC):
+    """
+    Where GmailSyncEngine keeps the last synced `historyId` per account.
+    """
+
+    @abstractmethod
+    def load(self, account: str) -> str | None:
+        """Returns the stored historyId for `account`, or None if there is none."""
+
+    @abstractmethod
+    def save(self, account: str, history_id: str) -> None:
+        """Stores the historyId for `account`."""
+
+    @abstractmethod
+    def clear(self, account: str) -> None:
+        """Forgets the checkpoint for `account`, forcing a full sync."""
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """Keeps checkpoints in memory only. Useful for tests."""
+
+    def __init__(self):
+        self._checkpoints: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, account: str) -> str | None:
+        return self._checkpoints.get(account)
+
+    def save(self, account: str, history_id: str) -> None:
+        with self._lock:
+            self._checkpoints[account] = history_id
+
+    def clear(self, account: str) -> None:
+        with self._lock:
+            self._checkpoints.pop(account, None)
+
+
+class FileCheckpointStore(CheckpointStore):
+    """
+    Keeps checkpoints for all accounts in one JSON file, written atomically
+    and guarded by a cross-process lock.
+    """
+
+    def __init__(self, path: str = "gmail_checkpoints.json"):
+        self.path = path
+
+    def load(self, account: str) -> str | None:
+        return self._read().get(account)
+
+    def save(self, account: str, history_id: str) -> None:
+        with file_lock(self.path):
+            checkpoints = self._read()
+            checkpoints[account] = history_id
+            atomic_write(self.path, json.dumps(checkpoints))
+
+    def clear(self, account: str) -> None:
+        with file_lock(self.path):
+            checkpoints = self._read()
+            if checkpoints.pop(account, None) is not None:
+                atomic_write(self.path, json.dumps(checkpoints))
+
+    def _read(self) -> dict[str, str]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+
+class SqliteCheckpointStore(CheckpointStore):
+    """
+    Keeps checkpoints in a local SQLite database, which can be shared by
+    several processes.
+    """
+
+    def __init__(self, path: str = "gmail_sync.db"):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_checkpoints ("
+                "account TEXT PRIMARY KEY, history_id TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    def load(self, account: str) -> str | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT history_id FROM sync_checkpoints WHERE account = ?",
+                (account,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, account: str, history_id: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO sync_checkpoints (account, history_id, updated_at) "
+                "VALUES (?, ?, ?) ON CONFLICT(account) DO UPDATE SET "
+                "history_id = excluded.history_id, updated_at = excluded.updated_at",
+                (account, history_id, time.time()),
+            )
+
+    def clear(self, account: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM sync_checkpoints WHERE account = ?", (account,))
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
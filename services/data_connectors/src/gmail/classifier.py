@@ -0,0 +1,422 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, fields
+from typing import Any
+
+from .message_index import IndexedMessage
+
+logger = logging.getLogger(__name__)
+
+# Only the start of a message's text is searched for keywords.
+DEFAULT_MAX_TEXT_CHARS = 8 * 1024
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+@dataclass(frozen=True)
+class CategoryRules:
+    """
+    What puts a message in one category. A message matching any rule is
+    in the category.
+    """
+
+    # Sender domains, including their subdomains: "school.example" also
+    # matches "mail.school.example".
+    sender_domains: tuple[str, ...] = ()
+    # Exact sender addresses.
+    senders: tuple[str, ...] = ()
+    # Mailing list ids from the List-Id header, including their subdomains.
+    list_ids: tuple[str, ...] = ()
+    # Gmail label ids, e.g. "Label_12".
+    labels: tuple[str, ...] = ()
+    # Words or phrases in the subject, matched as whole words.
+    subject_keywords: tuple[str, ...] = ()
+    # Words or phrases in the subject, snippet or text.
+    keywords: tuple[str, ...] = ()
+    # Regular expressions searched for in the subject.
+    subject_patterns: tuple[str, ...] = ()
+    # Regular expressions searched for in the subject, snippet or text.
+    patterns: tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, rules: Mapping[str, Any]) -> "CategoryRules":
+        """
+        Raises:
+            ValueError: If `rules` has a key that is not a field, or a value
+                        that is not a list.
+        """
+        known = {f.name for f in fields(cls)}
+        unknown = rules.keys() - known
+        if unknown:
+            raise ValueError(f"Unknown rule types: {sorted(unknown)}")
+        for key, values in rules.items():
+            if not isinstance(values, list | tuple):
+                raise ValueError(f"{key} must be a list, not {values!r}")
+        return cls(**{key: tuple(values) for key, values in rules.items()})
+
+
+def load_rules(path: str) -> dict[str, CategoryRules]:
+    """
+    Reads rules from a JSON file mapping category names to their rules:
+
+        {"school": {"sender_domains": ["school.example"],
+                    "keywords": ["field trip", "report card"]}}
+
+    Raises:
+        ValueError: If the file is not a valid rule set.
+    """
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, dict):
+        raise ValueError(f"{path} must map category names to rules")
+    return {category: CategoryRules.from_dict(r) for category, r in rules.items()}
+
+
+class MessageClassifier:
+    """
+    Sorts messages into categories such as "school" or "family", by rules
+    over sender domains, list ids, labels, subjects and keywords.
+
+    The rules are compiled so the cost of classifying a message does not
+    grow with their number: domains, senders, list ids and labels become
+    hash lookups, all keywords become one trie-shaped regular expression,
+    and patterns are prefiltered by a trie of their literal prefixes.
+
+    A MessageClassifier is a Categorizer, so it plugs into MessageIndex:
+
+        classifier = MessageClassifier.from_file("rules.json")
+        classifier.start_watching()
+        index = MessageIndex("messages.db", categorize=classifier)
+
+    Rules can be replaced while messages are being classified: new rules
+    are compiled on the side and swapped in, and every batch is classified
+    with one consistent rule set.
+    """
+
+    def __init__(
+        self,
+        rules: Mapping[str, CategoryRules] | None = None,
+        path: str | None = None,
+        max_text_chars: int = DEFAULT_MAX_TEXT_CHARS,
+    ):
+        """
+        Args:
+            rules: The rules by category.
+            path: A JSON rules file, see `load_rules`. Read when `rules` is
+                  not given, and again by `reload()`.
+            max_text_chars: How much of each message's text is searched
+                            for keywords and patterns.
+        """
+        self.path = path
+        self.max_text_chars = max_text_chars
+        # Increases every time new rules are swapped in.
+        self.version = 0
+        self._mtime: float | None = None
+        self._reload_lock = threading.Lock()
+        self._watch_stop: threading.Event | None = None
+        if rules is None:
+            if path is None:
+                raise ValueError("Either rules or a rules path is required")
+            self._mtime = os.stat(path).st_mtime
+            rules = load_rules(path)
+        self._compiled = _CompiledRules(rules, max_text_chars)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "MessageClassifier":
+        return cls(path=path, **kwargs)
+
+    @property
+    def categories(self) -> frozenset[str]:
+        return self._compiled.categories
+
+    def classify(self, message: IndexedMessage) -> frozenset[str]:
+        """Returns the categories `message` belongs to."""
+        return self._compiled.classify(message)
+
+    __call__ = classify
+
+    def classify_batch(
+        self, messages: Iterable[IndexedMessage]
+    ) -> list[frozenset[str]]:
+        """
+        Classifies messages with the same rules, even if they are replaced
+        part-way.
+
+        Returns:
+            The categories of each message, in order.
+        """
+        compiled = self._compiled
+        return [compiled.classify(message) for message in messages]
+
+    def update(self, rules: Mapping[str, CategoryRules]) -> None:
+        """
+        Replaces the rules. Classification carries on with the old rules
+        until the new ones are compiled.
+
+        Raises:
+            re.error: If a pattern is not a valid regular expression. The
+                      old rules stay in use.
+        """
+        compiled = _CompiledRules(rules, self.max_text_chars)
+        # Swapping a reference is atomic, so readers need no lock.
+        self._compiled = compiled
+        self.version += 1
+
+    def reload(self) -> bool:
+        """
+        Reloads the rules file if it changed since it was last read.
+
+        Returns:
+            Whether new rules were loaded. If the file is invalid, the
+            error is logged once and the old rules stay in use until the
+            file changes again.
+        """
+        if self.path is None:
+            return False
+        with self._reload_lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime == self._mtime:
+                    return False
+                # Recorded before parsing, so a broken file is reported once.
+                self._mtime = mtime
+                self.update(load_rules(self.path))
+            except (OSError, ValueError, re.error):
+                logger.exception("Could not reload the rules in %s", self.path)
+                return False
+        logger.info("Reloaded the rules in %s", self.path)
+        return True
+
+    def start_watching(self, interval: float = 5.0) -> None:
+        """Reloads the rules file in a background thread when it changes."""
+        if self._watch_stop is not None:
+            return
+        stop = self._watch_stop = threading.Event()
+
+        def watch() -> None:
+            while not stop.wait(interval):
+                self.reload()
+
+        threading.Thread(target=watch, name="rules-watcher", daemon=True).start()
+
+    def stop_watching(self) -> None:
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
+
+
+class _CompiledRules:
+    """An immutable, compiled rule set."""
+
+    def __init__(self, rules: Mapping[str, CategoryRules], max_text_chars: int):
+        self.categories = frozenset(rules)
+        self._max_text_chars = max_text_chars
+        self._domains: dict[str, set[str]] = {}
+        self._senders: dict[str, set[str]] = {}
+        self._list_ids: dict[str, set[str]] = {}
+        self._labels: dict[str, set[str]] = {}
+        subject_keywords: dict[str, set[str]] = {}
+        keywords: dict[str, set[str]] = {}
+        subject_patterns: dict[str, set[str]] = {}
+        patterns: dict[str, set[str]] = {}
+        for category, r in rules.items():
+            for table, values, normalize in (
+                (self._domains, r.sender_domains, _normalize_domain),
+                (self._senders, r.senders, str.lower),
+                (self._list_ids, r.list_ids, _normalize_domain),
+                (self._labels, r.labels, str),
+                (subject_keywords, r.subject_keywords, _normalize_keyword),
+                (keywords, r.keywords, _normalize_keyword),
+                (subject_patterns, r.subject_patterns, str),
+                (patterns, r.patterns, str),
+            ):
+                for value in filter(str.strip, values):
+                    table.setdefault(normalize(value), set()).add(category)
+        self._subject_matchers = _matchers(subject_keywords, subject_patterns)
+        self._text_matchers = _matchers(keywords, patterns)
+
+    def classify(self, message: IndexedMessage) -> frozenset[str]:
+        found: set[str] = set()
+        if message.sender_domain:
+            _add_suffix_matches(found, self._domains, message.sender_domain)
+        if message.sender:
+            found.update(self._senders.get(message.sender, ()))
+        if message.list_id and self._list_ids:
+            _add_suffix_matches(found, self._list_ids, _list_id(message.list_id))
+        for label in message.labels:
+            found.update(self._labels.get(label, ()))
+        if message.subject:
+            for matcher in self._subject_matchers:
+                matcher.search(message.subject, found)
+        if self._text_matchers:
+            text = "\n".join(
+                part
+                for part in (
+                    message.subject,
+                    message.snippet,
+                    (message.text or "")[: self._max_text_chars],
+                )
+                if part
+            )
+            for matcher in self._text_matchers:
+                matcher.search(text, found)
+        return frozenset(found)
+
+
+class _KeywordMatcher:
+    """
+    Finds many keywords in one pass, with a regular expression shaped like
+    a trie of the keywords, so its cost barely depends on their number.
+
+    The expression is a lookahead, so it is tried at every word start,
+    even inside a match; at each, it finds the longest keyword and the
+    shorter ones it starts with are looked up, so overlapping keywords
+    like "field" and "field trip" are all reported.
+    """
+
+    def __init__(self, keywords: dict[str, set[str]]):
+        self._keywords = keywords
+        self._all = set().union(*keywords.values())
+        self._regex = re.compile(
+            rf"(?<!\w)(?=((?:{_trie_regex(keywords)}))(?!\w))", re.IGNORECASE
+        )
+
+    def search(self, text: str, found: set[str]) -> None:
+        if self._all <= found:
+            return
+        for match in self._regex.finditer(text):
+            longest = _normalize_keyword(match.group(1))
+            for end in range(1, len(longest) + 1):
+                # Shorter keywords must end at a word boundary too.
+                if end == len(longest) or not _WORD_CHAR.match(longest, end):
+                    found.update(self._keywords.get(longest[:end], ()))
+            if self._all <= found:
+                return
+
+
+class _PatternMatcher:
+    r"""
+    Finds many regular expressions in one pass. Patterns that start with a
+    literal word, like r"grade\s+\d+", are only tried where one pass of a
+    trie of those words finds it; the rest are searched for one by one.
+    """
+
+    def __init__(self, patterns: dict[str, set[str]]):
+        self._all = set().union(*patterns.values())
+        self._by_prefix: dict[str, list[tuple[re.Pattern[str], set[str]]]] = {}
+        self._others: list[tuple[re.Pattern[str], set[str]]] = []
+        for source, categories in patterns.items():
+            pattern = re.compile(source, re.IGNORECASE)
+            prefix = _literal_prefix(source)
+            if prefix:
+                self._by_prefix.setdefault(prefix.lower(), []).append(
+                    (pattern, categories)
+                )
+            else:
+                self._others.append((pattern, categories))
+        # A lookahead, to find prefixes starting inside other prefixes too.
+        self._prefixes = (
+            re.compile(f"(?=({_trie_regex(self._by_prefix)}))", re.IGNORECASE)
+            if self._by_prefix
+            else None
+        )
+
+    def search(self, text: str, found: set[str]) -> None:
+        for pattern, categories in self._others:
+            if not categories <= found and pattern.search(text):
+                found.update(categories)
+        if self._prefixes is None or self._all <= found:
+            return
+        for match in self._prefixes.finditer(text):
+            start, longest = match.start(), match.group(1).lower()
+            for end in range(1, len(longest) + 1):
+                for pattern, categories in self._by_prefix.get(longest[:end], ()):
+                    if not categories <= found and pattern.match(text, start):
+                        found.update(categories)
+            if self._all <= found:
+                return
+
+
+def _matchers(
+    keywords: dict[str, set[str]], patterns: dict[str, set[str]]
+) -> list[_KeywordMatcher | _PatternMatcher]:
+    matchers: list[_KeywordMatcher | _PatternMatcher] = []
+    if keywords:
+        matchers.append(_KeywordMatcher(keywords))
+    if patterns:
+        matchers.append(_PatternMatcher(patterns))
+    return matchers
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """
+    Builds a regular expression matching any of `words`, preferring the
+    longest, with shared prefixes factored out: "field trip" and "field
+    day" become "field\\s+(?:day|trip)".
+    """
+    trie: dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict[str, Any]) -> str:
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        if "" in node:
+            return f"(?:{'|'.join(branches)})?"
+        if len(branches) == 1:
+            return branches[0]
+        return f"(?:{'|'.join(branches)})"
+
+    return build(trie)
+
+
+def _literal_prefix(pattern: str) -> str:
+    """
+    The word characters every match of `pattern` starts with, or "" if
+    that is not known.
+    """
+    if "|" in pattern:
+        return ""
+    prefix = re.match(r"\w*", pattern).group()
+    if pattern[len(prefix) : len(prefix) + 1] in ("?", "*", "{"):
+        # The quantifier makes the last character optional.
+        prefix = prefix[:-1]
+    return prefix
+
+
+def _add_suffix_matches(found: set[str], table: dict[str, set[str]], domain: str):
+    """Looks up `domain` and each of its parent domains in `table`."""
+    while True:
+        found.update(table.get(domain, ()))
+        dot = domain.find(".")
+        if dot < 0:
+            return
+        domain = domain[dot + 1 :]
+
+
+def _list_id(header: str) -> str:
+    """The id in a List-Id header, e.g. "pta.example" in "PTA <pta.example>"."""
+    start, end = header.find("<"), header.rfind(">")
+    if 0 <= start < end:
+        header = header[start + 1 : end]
+    return header.strip().lower()
+
+
+def _normalize_domain(domain: str) -> str:
+    return domain.strip().lstrip("@.").lower()
+
+
+def _normalize_keyword(keyword: str) -> str:
+    return " ".join(keyword.lower().split())
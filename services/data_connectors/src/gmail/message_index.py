@@ -0,0 +1,1090 @@
+import base64
+import html
+import itertools
+import json
+import logging
+import os.path
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from datetime import UTC, datetime, timedelta
+from email.utils import parseaddr
+from typing import Any
+
+from .attachments import AttachmentDownloader, AttachmentRef, attachment_refs
+from .batch_fetch import BatchMessageFetcher
+from .sync import GmailSyncEngine, SyncResult
+
+logger = logging.getLogger(__name__)
+
+# Extracted text beyond this is not indexed.
+MAX_TEXT_CHARS = 64 * 1024
+
+# A `messages.get` field mask (format="full") for what the index stores.
+INDEX_FETCH_FIELDS = "id,threadId,labelIds,snippet,internalDate,payload"
+
+# Messages are categorized this many at a time.
+_BATCH_SIZE = 100
+
+# Unread messages with these labels are not counted as new.
+_NOT_NEW_LABELS = frozenset({"TRASH", "SPAM"})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    id TEXT NOT NULL,
+    thread_id TEXT,
+    sender TEXT,
+    sender_name TEXT,
+    sender_domain TEXT,
+    recipients TEXT,
+    subject TEXT,
+    snippet TEXT,
+    text TEXT,
+    list_id TEXT,
+    internal_date INTEGER NOT NULL,
+    labels TEXT NOT NULL,
+    categories TEXT NOT NULL DEFAULT '[]',
+    UNIQUE (account, id)
+);
+CREATE INDEX IF NOT EXISTS messages_by_date
+    ON messages (account, internal_date DESC, rowid DESC);
+CREATE INDEX IF NOT EXISTS messages_by_sender
+    ON messages (account, sender, internal_date DESC, rowid DESC);
+CREATE INDEX IF NOT EXISTS messages_by_domain
+    ON messages (account, sender_domain, internal_date DESC, rowid DESC);
+
+-- Label membership, keyed so that "newest messages with label X" is a
+-- single index range scan.
+CREATE TABLE IF NOT EXISTS message_labels (
+    account TEXT NOT NULL,
+    label_id TEXT NOT NULL,
+    internal_date INTEGER NOT NULL,
+    message_rowid INTEGER NOT NULL REFERENCES messages (rowid) ON DELETE CASCADE,
+    PRIMARY KEY (account, label_id, internal_date, message_rowid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS message_labels_by_message
+    ON message_labels (message_rowid, label_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    subject, sender, sender_name, snippet, text,
+    content = 'messages', content_rowid = 'rowid',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, subject, sender, sender_name, snippet, text)
+    VALUES (new.rowid, new.subject, new.sender, new.sender_name, new.snippet,
+            new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts
+        (messages_fts, rowid, subject, sender, sender_name, snippet, text)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.sender_name,
+            old.snippet, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF
+    subject, sender, sender_name, snippet, text ON messages BEGIN
+    INSERT INTO messages_fts
+        (messages_fts, rowid, subject, sender, sender_name, snippet, text)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.sender_name,
+            old.snippet, old.text);
+    INSERT INTO messages_fts (rowid, subject, sender, sender_name, snippet, text)
+    VALUES (new.rowid, new.subject, new.sender, new.sender_name, new.snippet,
+            new.text);
+END;
+
+-- Unread messages per category, kept up to date by every write so reading
+-- one is a primary key lookup.
+CREATE TABLE IF NOT EXISTS unread_counts (
+    account TEXT NOT NULL,
+    category TEXT NOT NULL,
+    unread INTEGER NOT NULL,
+    PRIMARY KEY (account, category)
+) WITHOUT ROWID;
+
+-- When each account was last synced and its counters last reconciled, in
+-- seconds since the epoch.
+CREATE TABLE IF NOT EXISTS sync_state (
+    account TEXT PRIMARY KEY,
+    history_id TEXT,
+    synced_at REAL,
+    reconciled_at REAL
+);
+
+-- Attachments of indexed messages. Their content is only downloaded on
+-- demand; sha256 points into an AttachmentStore once it is.
+CREATE TABLE IF NOT EXISTS attachments (
+    message_rowid INTEGER NOT NULL REFERENCES messages (rowid) ON DELETE CASCADE,
+    part_id TEXT NOT NULL,
+    attachment_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT,
+    PRIMARY KEY (message_rowid, part_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS attachments_by_sha256 ON attachments (sha256);
+
+-- Goes up with every write that can change what reads return, so readers
+-- can cheaply tell whether results they cached are still current.
+CREATE TABLE IF NOT EXISTS index_generation (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    generation INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = (
+    "id",
+    "thread_id",
+    "sender",
+    "sender_name",
+    "sender_domain",
+    "recipients",
+    "subject",
+    "snippet",
+    "text",
+    "list_id",
+    "internal_date",
+    "labels",
+)
+_INTERNAL_DATE = _COLUMNS.index("internal_date")
+_ATTACHMENT_COLUMNS = (
+    "a.part_id, a.attachment_id, a.filename, a.mime_type, a.size, a.sha256"
+)
+
+
+@dataclass(frozen=True)
+class IndexedMessage:
+    """The searchable parts of a Gmail message."""
+
+    id: str
+    thread_id: str | None = None
+    sender: str | None = None
+    sender_name: str | None = None
+    recipients: str | None = None
+    subject: str | None = None
+    snippet: str | None = None
+    text: str | None = None
+    list_id: str | None = None
+    # Milliseconds since the epoch, as Gmail's `internalDate`.
+    internal_date: int = 0
+    labels: frozenset[str] = field(default_factory=frozenset)
+    # Set by from_gmail(); messages read back from the index leave it empty,
+    # see MessageIndex.attachments().
+    attachments: tuple[AttachmentRef, ...] = ()
+
+    @property
+    def sender_domain(self) -> str | None:
+        if not self.sender or "@" not in self.sender:
+            return None
+        return self.sender.rsplit("@", 1)[1]
+
+    @property
+    def date(self) -> datetime:
+        return datetime.fromtimestamp(self.internal_date / 1000, UTC)
+
+    @classmethod
+    def from_gmail(cls, message: dict[str, Any]) -> "IndexedMessage":
+        """
+        Builds an IndexedMessage from a `messages.get` response in "full"
+        or "metadata" format.
+        """
+        payload = message.get("payload", {})
+        headers = {h["name"].lower(): h["value"] for h in payload.get("headers", [])}
+        sender_name, sender = parseaddr(headers.get("from", ""))
+        return cls(
+            id=message["id"],
+            thread_id=message.get("threadId"),
+            sender=sender.lower() or None,
+            sender_name=sender_name or None,
+            recipients=headers.get("to"),
+            subject=headers.get("subject"),
+            snippet=html.unescape(message.get("snippet", "")) or None,
+            text=extract_text(payload) or None,
+            list_id=headers.get("list-id"),
+            internal_date=int(message.get("internalDate", 0)),
+            labels=frozenset(message.get("labelIds", [])),
+            attachments=tuple(attachment_refs(message)),
+        )
+
+
+@dataclass(frozen=True)
+class MessagePage:
+    messages: list[IndexedMessage]
+    # Pass to `query(cursor=...)` for the next page; None on the last page.
+    next_cursor: str | None
+
+
+# Names the categories a message belongs to, e.g. {"school"}.
+Categorizer = Callable[[IndexedMessage], Iterable[str]]
+
+
+@dataclass(frozen=True)
+class UnreadCount:
+    category: str
+    unread: int
+    # When the account was last synced; None if it never was.
+    synced_at: datetime | None
+
+    def staleness(self, now: datetime | None = None) -> timedelta | None:
+        """How long ago the count was last brought up to date with Gmail."""
+        if self.synced_at is None:
+            return None
+        return (now if now else datetime.now(UTC)) - self.synced_at
+
+
+def categorize_by_labels(categories: dict[str, str]) -> Categorizer:
+    """
+    Builds a Categorizer from Gmail labels, e.g. {"Label_12": "school"}
+    puts every message labelled Label_12 in the "school" category.
+    """
+
+    def categorize(message: IndexedMessage) -> set[str]:
+        return {categories[label] for label in message.labels if label in categories}
+
+    return categorize
+
+
+_TAG = re.compile(r"<(script|style)\b.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def extract_text(payload: dict[str, Any]) -> str:
+    """
+    Returns a message's text: its text/plain parts, or its text/html parts
+    with the markup stripped when there is no plain text.
+    """
+    plain: list[str] = []
+    rich: list[str] = []
+    for part in _walk_parts(payload):
+        data = part.get("body", {}).get("data")
+        if not data:
+            continue
+        mime_type = part.get("mimeType", "")
+        if mime_type == "text/plain":
+            plain.append(_decode_body(data))
+        elif mime_type == "text/html":
+            rich.append(html.unescape(_TAG.sub(" ", _decode_body(data))))
+    text = "\n".join(plain) if plain else "\n".join(rich)
+    return _WHITESPACE.sub(" ", text).strip()[:MAX_TEXT_CHARS]
+
+
+def _walk_parts(part: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield part
+    for child in part.get("parts", []):
+        yield from _walk_parts(child)
+
+
+def _decode_body(data: str) -> str:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode(
+        "utf-8", errors="replace"
+    )
+
+
+class MessageIndex:
+    """
+    A local, searchable copy of Gmail message metadata.
+
+    Messages are stored in SQLite with B-tree indexes on date, sender,
+    sender domain and label, and an FTS5 full-text index over subject,
+    sender, snippet and extracted text. Queries never touch the Gmail API
+    and return pages ordered newest first, with keyset pagination.
+
+    Safe to share between threads: each thread gets its own connection,
+    and the database is in WAL mode so readers in other processes (e.g.
+    the MCP server) never block the writer.
+
+        index = MessageIndex("messages.db")
+        sync_index(engine, fetcher, index)
+        page = index.query("picture day", label="INBOX", limit=20)
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        account: str = "me",
+        categorize: Categorizer | None = None,
+    ):
+        """
+        Opens (and if needed creates) the index.
+
+        Args:
+            path: The SQLite database file. ":memory:" keeps the index in
+                  memory, shared by the threads of this process.
+            account: The mailbox this instance reads and writes. Several
+                     accounts can share one database.
+            categorize: Sorts messages into the categories that
+                        `unread_count()` counts. Without it, messages
+                        belong to no category.
+        """
+        self.path = path
+        self.account = account
+        self.categorize = categorize
+        if path == ":memory:":
+            # A named shared-cache database, so every thread's connection
+            # sees the same in-memory data.
+            self._uri = f"file:message-index-{id(self)}?mode=memory&cache=shared"
+        else:
+            self._uri = f"file:{path}"
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Holds an in-memory database open for the lifetime of the index.
+        self._keepalive = self._connect()
+        with self._keepalive:
+            self._keepalive.executescript(_SCHEMA)
+
+    # --- Writes ---
+
+    def upsert(self, messages: Iterable[IndexedMessage]) -> int:
+        """
+        Adds messages, or replaces them if already indexed.
+
+        Returns:
+            The number of messages written.
+        """
+        count = 0
+        with self._transaction() as conn:
+            for batch in _batches(messages):
+                for message, categories in zip(batch, self._categorize_batch(batch)):
+                    self._upsert(conn, message, categories)
+                count += len(batch)
+        return count
+
+    def delete(self, message_ids: Iterable[str]) -> int:
+        """Removes messages. Returns the number removed."""
+        with self._transaction() as conn:
+            return sum(self._delete(conn, message_id) for message_id in message_ids)
+
+    def update_labels(
+        self,
+        added: dict[str, set[str]] | None = None,
+        removed: dict[str, set[str]] | None = None,
+    ) -> None:
+        """Applies label changes by message id. Unknown messages are ignored."""
+        with self._transaction() as conn:
+            self._update_labels(conn, added or {}, removed or {})
+
+    def apply_sync(
+        self, result: SyncResult, messages: Iterable[dict[str, Any]]
+    ) -> None:
+        """
+        Brings the index up to date with a sync.
+
+        `messages` is consumed outside any transaction, since it usually
+        fetches from Gmail as it goes, and each batch is written in a short
+        transaction of its own, so other accounts sharing the database are
+        never locked out for long. Deletes, label changes and the sync
+        state are written last, in one transaction: if anything fails
+        before, the next sync reports the same changes again and the
+        batches already written are simply rewritten.
+
+        Args:
+            result: What the sync reported.
+            messages: The `messages.get` responses for `result.added`,
+                      e.g. from BatchMessageFetcher.
+        """
+        for batch in _batches(map(IndexedMessage.from_gmail, messages)):
+            categories = self._categorize_batch(batch)
+            with self._transaction() as conn:
+                for message, message_categories in zip(batch, categories):
+                    self._upsert(conn, message, message_categories)
+
+        changed = result.changed or result.full_sync
+        with self._transaction(bump_generation=changed) as conn:
+            for message_id in result.deleted:
+                self._delete(conn, message_id)
+            self._update_labels(conn, result.labels_added, result.labels_removed)
+            if result.full_sync:
+                # Drop whatever disappeared while there was no history.
+                indexed = {
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT id FROM messages WHERE account = ?", (self.account,)
+                    )
+                }
+                for message_id in indexed - result.added:
+                    self._delete(conn, message_id)
+                # A full sync rewrites most of the index anyway; recounting
+                # is cheap next to it.
+                self._reconcile(conn)
+            conn.execute(
+                "INSERT INTO sync_state (account, history_id, synced_at) "
+                "VALUES (?, ?, ?) ON CONFLICT (account) DO UPDATE SET "
+                "history_id = excluded.history_id, synced_at = excluded.synced_at",
+                (self.account, result.history_id, time.time()),
+            )
+
+    def reconcile_unread_counts(self) -> dict[str, int]:
+        """
+        Recounts unread messages per category, and corrects the stored
+        counters if they drifted. Unread messages are categorized again
+        first, so changes to the categorizer's rules are picked up.
+
+        Returns:
+            The drift that was corrected: the stored count minus the real
+            one, for each category that was wrong.
+        """
+        with self._transaction(bump_generation=False) as conn:
+            return self._reconcile(conn)
+
+    # --- Reads ---
+
+    def get(self, message_id: str) -> IndexedMessage | None:
+        row = (
+            self._conn()
+            .execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM messages "
+                "WHERE account = ? AND id = ?",
+                (self.account, message_id),
+            )
+            .fetchone()
+        )
+        return _to_message(row) if row else None
+
+    def query(
+        self,
+        text: str | None = None,
+        sender: str | None = None,
+        sender_domain: str | None = None,
+        label: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 50,
+        cursor: str | None = None,
+    ) -> MessagePage:
+        """
+        Finds messages, newest first.
+
+        Args:
+            text: Words that must all appear in the subject, sender,
+                  snippet or text. Matched as whole words, case- and
+                  accent-insensitively.
+            sender: Exact sender address.
+            sender_domain: Exact sender domain, e.g. "school.example".
+            label: A Gmail label id, e.g. "INBOX" or "UNREAD".
+            since: Only messages received at or after this time.
+            until: Only messages received before this time.
+            limit: The page size.
+            cursor: `next_cursor` of the previous page.
+
+        Returns:
+            A page of messages and the cursor for the next page.
+        """
+        sql, params, (date, rowid) = self._select(
+            ", ".join(f"m.{column}" for column in (*_COLUMNS, "rowid")),
+            text,
+            sender,
+            sender_domain,
+            label,
+            since,
+            until,
+        )
+        if cursor is not None:
+            sql += f" AND ({date}, {rowid}) < (?, ?)"
+            params += _decode_cursor(cursor)
+        sql += f" ORDER BY {date} DESC, {rowid} DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._conn().execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][_INTERNAL_DATE], rows[-1][-1])
+        return MessagePage([_to_message(row[:-1]) for row in rows], next_cursor)
+
+    def count(
+        self,
+        text: str | None = None,
+        sender: str | None = None,
+        sender_domain: str | None = None,
+        label: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> int:
+        """Counts the messages `query()` would return with the same filters."""
+        sql, params, _ = self._select(
+            "COUNT(*)", text, sender, sender_domain, label, since, until
+        )
+        return self._conn().execute(sql, params).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def unread_count(self, category: str) -> UnreadCount:
+        """
+        Returns the number of unread messages in a category, without
+        scanning any messages: the count is kept up to date as messages
+        are indexed, relabelled and read.
+        """
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT unread FROM unread_counts WHERE account = ? AND category = ?",
+            (self.account, category),
+        ).fetchone()
+        synced_at = conn.execute(
+            "SELECT synced_at FROM sync_state WHERE account = ?", (self.account,)
+        ).fetchone()
+        return UnreadCount(
+            category,
+            row[0] if row else 0,
+            (
+                datetime.fromtimestamp(synced_at[0], UTC)
+                if synced_at and synced_at[0] is not None
+                else None
+            ),
+        )
+
+    def attachments(self, message_id: str) -> list[AttachmentRef]:
+        """A message's attachments, whether or not they were downloaded."""
+        return [
+            AttachmentRef(message_id, *row)
+            for row in self._conn().execute(
+                f"SELECT {_ATTACHMENT_COLUMNS} FROM messages m"
+                " JOIN attachments a ON a.message_rowid = m.rowid"
+                " WHERE m.account = ? AND m.id = ? ORDER BY a.part_id",
+                (self.account, message_id),
+            )
+        ]
+
+    def missing_attachments(self, limit: int = 100) -> list[AttachmentRef]:
+        """Attachments whose content was not downloaded yet, newest first."""
+        return [
+            AttachmentRef(*row)
+            for row in self._conn().execute(
+                f"SELECT m.id, {_ATTACHMENT_COLUMNS} FROM messages m"
+                " JOIN attachments a ON a.message_rowid = m.rowid"
+                " WHERE m.account = ? AND a.sha256 IS NULL"
+                " ORDER BY m.internal_date DESC, m.rowid DESC LIMIT ?",
+                (self.account, limit),
+            )
+        ]
+
+    def set_attachment_sha256(self, ref: AttachmentRef, sha256: str) -> None:
+        """Records where an attachment's content is in the AttachmentStore."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE attachments SET sha256 = ? WHERE part_id = ? AND "
+                "message_rowid = (SELECT rowid FROM messages "
+                "WHERE account = ? AND id = ?)",
+                (sha256, ref.part_id, self.account, ref.message_id),
+            )
+
+    def accounts(self) -> list[str]:
+        """The accounts synced into this database."""
+        return _accounts(self._conn())
+
+    def generation(self) -> int:
+        """
+        A number that goes up whenever the contents of the database change,
+        for any account. Cheap enough to check before every cached read.
+        """
+        return _generation(self._conn())
+
+    def close(self) -> None:
+        """Closes this thread's connection and releases the database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        self._keepalive.close()
+
+    # --- Internals ---
+
+    def _select(
+        self,
+        columns: str,
+        text: str | None,
+        sender: str | None,
+        sender_domain: str | None,
+        label: str | None,
+        since: datetime | None,
+        until: datetime | None,
+    ) -> tuple[str, list[Any], tuple[str, str]]:
+        """
+        Builds the SELECT for a query, and the (date, rowid) columns to
+        order and paginate by.
+
+        The CROSS JOINs pin the join order, so the most selective index
+        drives the query: the full-text index for text searches, the label
+        index (already in date order) for label filters.
+        """
+        params: list[Any]
+        match = _match_expression(text) if text else None
+        if match is not None:
+            sql = (
+                f"SELECT {columns} FROM messages_fts"
+                " CROSS JOIN messages m ON m.rowid = messages_fts.rowid"
+                " WHERE messages_fts MATCH ? AND m.account = ?"
+            )
+            params = [match, self.account]
+            order = ("m.internal_date", "m.rowid")
+            if label is not None:
+                sql += (
+                    " AND EXISTS (SELECT 1 FROM message_labels l"
+                    " WHERE l.message_rowid = m.rowid AND l.label_id = ?)"
+                )
+                params.append(label)
+        elif label is not None:
+            sql = (
+                f"SELECT {columns} FROM message_labels l"
+                " CROSS JOIN messages m ON m.rowid = l.message_rowid"
+                " WHERE l.account = ? AND l.label_id = ?"
+            )
+            params = [self.account, label]
+            order = ("l.internal_date", "l.message_rowid")
+        else:
+            sql = f"SELECT {columns} FROM messages m WHERE m.account = ?"
+            params = [self.account]
+            order = ("m.internal_date", "m.rowid")
+
+        if sender is not None:
+            sql += " AND m.sender = ?"
+            params.append(sender.lower())
+        if sender_domain is not None:
+            sql += " AND m.sender_domain = ?"
+            params.append(sender_domain.lower())
+        if since is not None:
+            sql += f" AND {order[0]} >= ?"
+            params.append(_to_millis(since))
+        if until is not None:
+            sql += f" AND {order[0]} < ?"
+            params.append(_to_millis(until))
+        return sql, params, order
+
+    def _upsert(
+        self,
+        conn: sqlite3.Connection,
+        message: IndexedMessage,
+        categories: frozenset[str],
+    ) -> None:
+        old = conn.execute(
+            "SELECT labels, categories FROM messages WHERE account = ? AND id = ?",
+            (self.account, message.id),
+        ).fetchone()
+        row = conn.execute(
+            "INSERT INTO messages (account, id, thread_id, sender, sender_name, "
+            "sender_domain, recipients, subject, snippet, text, list_id, "
+            "internal_date, labels, categories) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (account, id) DO UPDATE SET "
+            "thread_id = excluded.thread_id, sender = excluded.sender, "
+            "sender_name = excluded.sender_name, "
+            "sender_domain = excluded.sender_domain, "
+            "recipients = excluded.recipients, subject = excluded.subject, "
+            "snippet = excluded.snippet, text = excluded.text, "
+            "list_id = excluded.list_id, internal_date = excluded.internal_date, "
+            "labels = excluded.labels, categories = excluded.categories "
+            "RETURNING rowid",
+            (
+                self.account,
+                message.id,
+                message.thread_id,
+                message.sender,
+                message.sender_name,
+                message.sender_domain,
+                message.recipients,
+                message.subject,
+                message.snippet,
+                message.text,
+                message.list_id,
+                message.internal_date,
+                json.dumps(sorted(message.labels)),
+                json.dumps(sorted(categories)),
+            ),
+        ).fetchone()
+        rowid = row[0]
+        self._count_unread(
+            conn,
+            _unread_categories(*map(json.loads, old)) if old else frozenset(),
+            _unread_categories(message.labels, categories),
+        )
+        conn.execute("DELETE FROM message_labels WHERE message_rowid = ?", (rowid,))
+        conn.executemany(
+            "INSERT INTO message_labels "
+            "(account, label_id, internal_date, message_rowid) VALUES (?, ?, ?, ?)",
+            [
+                (self.account, label, message.internal_date, rowid)
+                for label in message.labels
+            ],
+        )
+        # Keeps what was already downloaded, unless the part changed.
+        conn.executemany(
+            "INSERT INTO attachments (message_rowid, part_id, attachment_id, "
+            "filename, mime_type, size) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (message_rowid, part_id) DO UPDATE SET "
+            "attachment_id = excluded.attachment_id, "
+            "sha256 = CASE WHEN size = excluded.size THEN sha256 END, "
+            "filename = excluded.filename, mime_type = excluded.mime_type, "
+            "size = excluded.size",
+            [
+                (rowid, a.part_id, a.attachment_id, a.filename, a.mime_type, a.size)
+                for a in message.attachments
+            ],
+        )
+        conn.execute(
+            "DELETE FROM attachments WHERE message_rowid = ? AND part_id NOT IN "
+            "(SELECT value FROM json_each(?))",
+            (rowid, json.dumps([a.part_id for a in message.attachments])),
+        )
+
+    def _delete(self, conn: sqlite3.Connection, message_id: str) -> int:
+        row = conn.execute(
+            "DELETE FROM messages WHERE account = ? AND id = ? "
+            "RETURNING labels, categories",
+            (self.account, message_id),
+        ).fetchone()
+        if row is None:
+            return 0
+        self._count_unread(conn, _unread_categories(*map(json.loads, row)), frozenset())
+        return 1
+
+    def _update_labels(
+        self,
+        conn: sqlite3.Connection,
+        added: dict[str, set[str]],
+        removed: dict[str, set[str]],
+    ) -> None:
+        for message_id in added.keys() | removed.keys():
+            row = conn.execute(
+                f"SELECT rowid, categories, {', '.join(_COLUMNS)} FROM messages "
+                "WHERE account = ? AND id = ?",
+                (self.account, message_id),
+            ).fetchone()
+            if row is None:
+                continue
+            rowid, categories_json, message = row[0], row[1], _to_message(row[2:])
+            old = set(message.labels)
+            new = (old | added.get(message_id, set())) - removed.get(message_id, set())
+            if new == old:
+                continue
+            # Categories may depend on labels, e.g. with categorize_by_labels.
+            old_categories = frozenset(json.loads(categories_json))
+            new_categories = self._categories(replace(message, labels=frozenset(new)))
+            conn.execute(
+                "UPDATE messages SET labels = ?, categories = ? WHERE rowid = ?",
+                (json.dumps(sorted(new)), json.dumps(sorted(new_categories)), rowid),
+            )
+            self._count_unread(
+                conn,
+                _unread_categories(old, old_categories),
+                _unread_categories(new, new_categories),
+            )
+            conn.executemany(
+                "DELETE FROM message_labels WHERE message_rowid = ? AND label_id = ?",
+                [(rowid, label) for label in old - new],
+            )
+            conn.executemany(
+                "INSERT INTO message_labels "
+                "(account, label_id, internal_date, message_rowid) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (self.account, label, message.internal_date, rowid)
+                    for label in new - old
+                ],
+            )
+
+    def _categories(self, message: IndexedMessage) -> frozenset[str]:
+        if self.categorize is None:
+            return frozenset()
+        return frozenset(self.categorize(message))
+
+    def _categorize_batch(self, messages: list[IndexedMessage]) -> list[frozenset[str]]:
+        # Categorizers like MessageClassifier are faster on whole batches.
+        classify_batch = getattr(self.categorize, "classify_batch", None)
+        if classify_batch is not None:
+            return [frozenset(categories) for categories in classify_batch(messages)]
+        return [self._categories(message) for message in messages]
+
+    def _count_unread(
+        self,
+        conn: sqlite3.Connection,
+        old: frozenset[str],
+        new: frozenset[str],
+    ) -> None:
+        """Moves a message's unread count from the `old` to `new` categories."""
+        conn.executemany(
+            "INSERT INTO unread_counts (account, category, unread) VALUES (?, ?, ?) "
+            "ON CONFLICT (account, category) DO UPDATE SET "
+            "unread = unread + excluded.unread",
+            [(self.account, category, -1) for category in old - new]
+            + [(self.account, category, 1) for category in new - old],
+        )
+
+    def _reconcile(self, conn: sqlite3.Connection) -> dict[str, int]:
+        actual: Counter[str] = Counter()
+        recategorized = []
+        for row in conn.execute(
+            f"SELECT m.rowid, m.categories, {', '.join(f'm.{c}' for c in _COLUMNS)}"
+            " FROM message_labels l"
+            " CROSS JOIN messages m ON m.rowid = l.message_rowid"
+            " WHERE l.account = ? AND l.label_id = 'UNREAD'",
+            (self.account,),
+        ).fetchall():
+            rowid, message = row[0], _to_message(row[2:])
+            categories = frozenset(json.loads(row[1]))
+            if self.categorize is not None:
+                # Picks up changes to the categorizer's rules.
+                new_categories = self._categories(message)
+                if new_categories != categories:
+                    recategorized.append((json.dumps(sorted(new_categories)), rowid))
+                    categories = new_categories
+            actual.update(_unread_categories(message.labels, categories))
+        conn.executemany(
+            "UPDATE messages SET categories = ? WHERE rowid = ?", recategorized
+        )
+        if recategorized:
+            _bump_generation(conn)
+        stored = dict(
+            conn.execute(
+                "SELECT category, unread FROM unread_counts WHERE account = ?",
+                (self.account,),
+            ).fetchall()
+        )
+        drift = {
+            category: stored.get(category, 0) - actual[category]
+            for category in stored.keys() | actual.keys()
+            if stored.get(category, 0) != actual[category]
+        }
+        if drift:
+            _bump_generation(conn)
+            logger.warning("Corrected unread counts for %s: %s", self.account, drift)
+            conn.execute("DELETE FROM unread_counts WHERE account = ?", (self.account,))
+            conn.executemany(
+                "INSERT INTO unread_counts (account, category, unread) "
+                "VALUES (?, ?, ?)",
+                [(self.account, category, n) for category, n in actual.items()],
+            )
+        conn.execute(
+            "INSERT INTO sync_state (account, reconciled_at) VALUES (?, ?) "
+            "ON CONFLICT (account) DO UPDATE SET "
+            "reconciled_at = excluded.reconciled_at",
+            (self.account, time.time()),
+        )
+        return drift
+
+    @contextmanager
+    def _transaction(
+        self, bump_generation: bool = True
+    ) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                if bump_generation:
+                    _bump_generation(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._uri,
+            uri=True,
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA foreign_keys = ON")
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+
+def indexed_accounts(path: str) -> list[str]:
+    """
+    The accounts synced into the index database at `path`, like
+    `MessageIndex.accounts()`, but read-only: a missing database has no
+    accounts, and is not created.
+    """
+    with _read_only(path) as conn:
+        return _accounts(conn) if conn else []
+
+
+def index_generation(path: str) -> int:
+    """
+    `MessageIndex.generation()` of the index database at `path`, read-only:
+    0 if there is no database yet.
+    """
+    with _read_only(path) as conn:
+        return _generation(conn) if conn else 0
+
+
+@contextmanager
+def _read_only(path: str) -> Iterator[sqlite3.Connection | None]:
+    if not os.path.exists(path):
+        yield None
+        return
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _accounts(conn: sqlite3.Connection) -> list[str]:
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT account FROM sync_state WHERE synced_at IS NOT NULL "
+            "ORDER BY account"
+        )
+    ]
+
+
+def _generation(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT generation FROM index_generation WHERE id = 0"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def _batches(
+    messages: Iterable[IndexedMessage], size: int = _BATCH_SIZE
+) -> Iterator[list[IndexedMessage]]:
+    messages = iter(messages)
+    while batch := list(itertools.islice(messages, size)):
+        yield batch
+
+
+def _bump_generation(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "INSERT INTO index_generation (id, generation) VALUES (0, 1) "
+        "ON CONFLICT (id) DO UPDATE SET generation = generation + 1"
+    )
+
+
+def _unread_categories(
+    labels: Iterable[str], categories: Iterable[str]
+) -> frozenset[str]:
+    """The categories whose unread count a message adds to."""
+    labels = frozenset(labels)
+    if "UNREAD" not in labels or labels & _NOT_NEW_LABELS:
+        return frozenset()
+    return frozenset(categories)
+
+
+def _to_message(row: tuple[Any, ...]) -> IndexedMessage:
+    (
+        message_id,
+        thread_id,
+        sender,
+        sender_name,
+        _sender_domain,
+        recipients,
+        subject,
+        snippet,
+        text,
+        list_id,
+        internal_date,
+        labels,
+    ) = row
+    return IndexedMessage(
+        id=message_id,
+        thread_id=thread_id,
+        sender=sender,
+        sender_name=sender_name,
+        recipients=recipients,
+        subject=subject,
+        snippet=snippet,
+        text=text,
+        list_id=list_id,
+        internal_date=internal_date,
+        labels=frozenset(json.loads(labels)),
+    )
+
+
+def _match_expression(text: str) -> str | None:
+    """
+    The FTS5 query for `text`, or None if it has no words (an empty MATCH
+    is a syntax error).
+    """
+    # Quote every word, so user input can't inject FTS5 query syntax.
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    return " ".join(words) if words else None
+
+
+def _to_millis(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def _encode_cursor(internal_date: int, rowid: int) -> str:
+    return base64.urlsafe_b64encode(f"{internal_date}:{rowid}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        internal_date, rowid = base64.urlsafe_b64decode(cursor).decode().split(":")
+        return int(internal_date), int(rowid)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def sync_index(
+    engine: GmailSyncEngine, fetcher: BatchMessageFetcher, index: MessageIndex
+) -> SyncResult:
+    """
+    Syncs a mailbox and brings its index up to date.
+
+    The checkpoint only advances once the index has been updated, so a
+    failure part-way reports the same changes again on the next sync.
+
+    Args:
+        engine: The account's sync engine.
+        fetcher: Fetches added messages. Use INDEX_FETCH_FIELDS as its
+                 `fields` to only download what the index stores.
+        index: The account's index.
+
+    Returns:
+        What the sync reported.
+    """
+
+    def apply(result: SyncResult) -> None:
+        index.apply_sync(result, fetcher.fetch(sorted(result.added)))
+
+    return engine.sync(consumer=apply)
+
+
+def download_attachments(
+    downloader: AttachmentDownloader, index: MessageIndex, limit: int = 100
+) -> int:
+    """
+    Downloads attachments the index has no content for yet, newest first,
+    and records where they were stored.
+
+    Args:
+        downloader: The account's downloader.
+        index: The account's index.
+        limit: The most attachments to download.
+
+    Returns:
+        The number downloaded. Failures are logged and retried next time.
+    """
+    count = 0
+    for ref, result in downloader.download_all(index.missing_attachments(limit)):
+        if isinstance(result, Exception):
+            logger.warning(
+                "Could not download attachment %s of %s: %s",
+                ref.part_id,
+                ref.message_id,
+                result,
+            )
+            continue
+        index.set_attachment_sha256(ref, result.sha256)
+        count += 1
+    return count
@@ -1,84 +1,250 @@
-import os.path
-
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from common.instrumentation import REGISTRY
+from google.auth.exceptions import RefreshError, TransportError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 
+from .token_store import FileTokenStore, TokenStore
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_SECONDS = REGISTRY.histogram(
+    "oauth_token_refresh_seconds", "OAuth access token refreshes with Google."
+).labels()
+_REFRESH_FAILURES = REGISTRY.counter(
+    "oauth_token_refresh_failures_total", "OAuth access token refreshes that failed."
+).labels()
+
 
 class OAuthCredentialsFactory:
-    """A factory to create and manage OAuth 2.0 credentials for Google API access."""
+    """
+    A factory to create and manage OAuth 2.0 credentials for Google API access.
+
+    Safe to share between threads and coroutines: concurrent callers that
+    need new credentials wait on a single refresh (single-flight), and the
+    token store is locked around each refresh so workers that share it
+    pick up each other's refreshes instead of racing.
+
+    Tokens are kept in a TokenStore: a local file by default, or memory or
+    Infisical for stateless containers and replicas sharing one token.
+    """
 
     def __init__(
         self,
         credentials_path: str = "credentials.json",
         token_path: str = "token.json",
         scopes: list[str] | None = None,
+        refresh_skew: timedelta = timedelta(minutes=5),
+        token_store: TokenStore | None = None,
+        client_config: dict[str, Any] | None = None,
+        interactive: bool = True,
     ):
         """
         Initializes the CredentialsFactory with OAuth 2.0 credentials.
 
         Args:
             credentials_path: Path to the OAuth 2.0 client secrets file.
-            token_path: Path where the current access token is stored.
+            token_path: Path where the current access token is stored, when
+                        no `token_store` is given.
             scopes: List of OAuth 2.0 scopes for API access.
+            refresh_skew: Refresh the access token this long before it
+                          expires, so callers never receive one that is
+                          about to lapse.
+            token_store: Where the token is kept. Defaults to a
+                         FileTokenStore at `token_path`.
+            client_config: The OAuth client secrets as a dict (e.g. read
+                           from Infisical), used instead of
+                           `credentials_path`.
+            interactive: Whether the browser-based OAuth flow may run when
+                         there is no usable token. Disable it for headless
+                         services.
         """
         self.scopes = scopes if scopes is not None else []
         self.credentials_path = credentials_path
         self.token_path = token_path
+        self.refresh_skew = refresh_skew
+        self.token_store = token_store if token_store else FileTokenStore(token_path)
+        self.client_config = client_config
+        self.interactive = interactive
+
+        # Credentials kept in memory between calls.
+        self._creds: Credentials | None = None
+        # The refresh currently running, shared by every caller waiting on it.
+        self._inflight: Future[Credentials] | None = None
+        self._inflight_lock = threading.Lock()
 
     def get_credentials(self) -> Credentials:
         """
         Retrieves valid OAuth 2.0 credentials, refreshing or obtaining new ones if
         necessary.
 
+        Credentials are kept in memory, so repeated calls do no I/O until the
+        token gets within `refresh_skew` of expiring. From then on the token
+        is refreshed in the background while callers keep using it; callers
+        only block when there is no usable token at all. The token store
+        is only written when the token actually changed.
+
         Returns:
             The authenticated credentials object.
         """
-        creds = self._authenticate(self.credentials_path, self.token_path, self.scopes)
-        # Save the credentials for the next run
-        self._write_creds_to_token_file(creds, self.token_path)
-        return creds
+        creds = self._creds
+        if creds is not None and self._is_fresh(creds):
+            return creds
+
+        future, is_leader = self._join_refresh()
+        if creds is not None and creds.valid:
+            if is_leader:
+                self._start_background_refresh(future)
+            return creds
+        if is_leader:
+            self._run_refresh(future)
+        return future.result()
+
+    async def aget_credentials(self) -> Credentials:
+        """
+        The asyncio counterpart of `get_credentials()`.
+
+        Shares the same single-flight refresh, and never blocks the event
+        loop: file I/O and token refreshes run in a worker thread.
+
+        Returns:
+            The authenticated credentials object.
+        """
+        creds = self._creds
+        if creds is not None and self._is_fresh(creds):
+            return creds
 
-    def _authenticate(
-        self, credentials_path: str, token_path: str, scopes: list[str]
-    ) -> Credentials:
+        future, is_leader = self._join_refresh()
+        if creds is not None and creds.valid:
+            if is_leader:
+                self._start_background_refresh(future)
+            return creds
+        if is_leader:
+            await asyncio.to_thread(self._run_refresh, future)
+        return await asyncio.wrap_future(future)
+
+    def _join_refresh(self) -> tuple[Future[Credentials], bool]:
+        """
+        Returns the in-flight refresh, starting a new one if there is none.
+        The second value is True if the caller must run the refresh.
+        """
+        with self._inflight_lock:
+            if self._inflight is not None:
+                return self._inflight, False
+            self._inflight = Future()
+            return self._inflight, True
+
+    def _run_refresh(self, future: Future[Credentials]) -> None:
+        try:
+            # Serialize with other workers sharing the token store.
+            with self.token_store.lock():
+                creds = self._authenticate(self.credentials_path, self.scopes)
+                self._creds = creds
+                # Save the credentials for the next run
+                self.token_store.save(creds)
+        except BaseException as e:
+            with self._inflight_lock:
+                self._inflight = None
+            future.set_exception(e)
+            return
+        with self._inflight_lock:
+            self._inflight = None
+        future.set_result(creds)
+
+    def _start_background_refresh(self, future: Future[Credentials]) -> None:
+        def log_failure(done: Future[Credentials]) -> None:
+            if done.exception() is not None:
+                logger.warning(
+                    "Background token refresh failed", exc_info=done.exception()
+                )
+
+        future.add_done_callback(log_failure)
+        threading.Thread(
+            target=self._run_refresh,
+            args=(future,),
+            name="oauth-token-refresh",
+            daemon=True,
+        ).start()
+
+    def _authenticate(self, credentials_path: str, scopes: list[str]) -> Credentials:
         """
         Handles the OAuth 2.0 authentication flow.
 
         Args:
             credentials_path: Path to the credentials file.
-            token_path: Path to the token file.
             scopes: List of OAuth 2.0 scopes to request.
 
         Returns:
             The authenticated credentials object.
         """
-        if not os.path.exists(token_path):
+        creds = self._creds
+        if creds is None or not self._is_fresh(creds):
+            # Another worker sharing the token store may have refreshed it.
+            stored = self.token_store.load(scopes, if_changed=creds is not None)
+            creds = stored or creds
+        if creds is None:
             # First time requires OAuth login.
-            creds = self._oauth_flow(credentials_path, scopes)
-        else:
-            creds = Credentials.from_authorized_user_file(token_path, scopes)
+            return self._oauth_flow(credentials_path, scopes)
 
-        if creds and creds.valid:
+        if creds and self._is_fresh(creds):
             return creds
 
-        if creds and creds.expired and creds.refresh_token:
-            return self._refresh_credentials(creds)
+        # Refresh expired tokens, and valid ones about to expire.
+        if creds and creds.refresh_token:
+            try:
+                return self._refresh_credentials(creds)
+            except (RefreshError, TransportError):
+                if not creds.valid:
+                    raise
+                # An early refresh failed, but the token still works; retry
+                # on a later call instead of failing this one.
+                logger.warning("Proactive token refresh failed", exc_info=True)
+                return creds
+
+        if creds and creds.valid:
+            # Can't refresh ahead of time; use it until it actually expires.
+            return creds
 
         # As a fallback, use OAuth flow if credentials are non-existent or invalid or
         # unable to refresh.
         return self._oauth_flow(credentials_path, scopes)
 
+    def _is_fresh(self, creds: Credentials) -> bool:
+        """True if the credentials are valid for at least `refresh_skew`."""
+        if not creds.valid:
+            return False
+        if creds.expiry is None:
+            return True
+        # google-auth stores expiry as a naive UTC datetime.
+        now = datetime.now(UTC).replace(tzinfo=None)
+        return creds.expiry - self.refresh_skew > now
+
     def _refresh_credentials(self, creds: Credentials) -> Credentials:
-        creds.refresh(Request())
+        with _REFRESH_SECONDS.time():
+            try:
+                creds.refresh(Request())
+            except Exception:
+                _REFRESH_FAILURES.inc()
+                raise
         return creds
 
     def _oauth_flow(self, credentials_path: str, scopes: list[str]) -> Credentials:
-        flow = InstalledAppFlow.from_client_secrets_file(credentials_path, scopes)
+        if not self.interactive:
+            raise RuntimeError(
+                "No usable OAuth token in the token store, and the interactive "
+                "OAuth flow is disabled."
+            )
+        if self.client_config is not None:
+            flow = InstalledAppFlow.from_client_config(self.client_config, scopes)
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(credentials_path, scopes)
         creds = flow.run_local_server(port=0)
         assert isinstance(creds, Credentials)
         return creds
-
-    def _write_creds_to_token_file(self, creds: Credentials, token_path: str) -> None:
-        with open(token_path, "w") as token:
-            token.write(creds.to_json())
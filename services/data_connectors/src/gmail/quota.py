@@ -0,0 +1,388 @@
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from enum import IntEnum
+from typing import TypeVar
+
+from common.instrumentation import REGISTRY
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The quota units Gmail charges per call, by method. Calls in a batch
+# request are charged one by one.
+QUOTA_UNITS = {
+    "getProfile": 1,
+    "labels.get": 1,
+    "labels.list": 1,
+    "history.list": 2,
+    "attachments.get": 5,
+    "messages.get": 5,
+    "messages.list": 5,
+    "messages.modify": 5,
+    "threads.get": 10,
+    "threads.list": 10,
+    "messages.batchModify": 50,
+    "messages.send": 100,
+    "watch": 100,
+}
+# Charged for methods missing from QUOTA_UNITS.
+DEFAULT_UNITS = 10
+
+# Gmail's limit per user, as a moving average that allows short bursts.
+USER_UNITS_PER_SECOND = 250.0
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+_WAIT_SECONDS = REGISTRY.histogram(
+    "gmail_quota_wait_seconds",
+    "Time Gmail API calls waited for quota, by priority.",
+    ["priority"],
+)
+_THROTTLED = REGISTRY.counter(
+    "gmail_quota_throttled_total",
+    "Gmail API calls answered with 429, 5xx or a rate limit error.",
+).labels()
+
+
+class Priority(IntEnum):
+    """Lower values get quota first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_priority = contextvars.ContextVar("gmail_quota_priority", default=Priority.BACKGROUND)
+
+
+@contextmanager
+def interactive() -> Iterator[None]:
+    """
+    Gives the Gmail calls made in this block priority over background
+    syncs and backfills, e.g. for a request someone is waiting on:
+
+        with interactive():
+            message = next(fetcher.fetch([message_id]))
+
+    Carries over into `asyncio.to_thread`, which copies the context.
+    """
+    token = _priority.set(Priority.INTERACTIVE)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_retryable(error: HttpError) -> bool:
+    """Whether Gmail asks to slow down (429, rate limits) or failed (5xx)."""
+    if error.resp.status in RETRYABLE_STATUSES:
+        return True
+    # Gmail reports per-user rate limits as 403s.
+    content = error.content.decode(errors="replace") if error.content else ""
+    return error.resp.status == 403 and any(r in content for r in _RATE_LIMIT_REASONS)
+
+
+class _UserQuota:
+    def __init__(self, tokens: float, concurrency: float):
+        self.tokens = tokens
+        self.updated = time.monotonic()
+        # The adaptive concurrency limit.
+        self.limit = concurrency
+        self.in_flight = 0
+        # No calls start before this time, after being throttled.
+        self.paused_until = 0.0
+        self.throttled_at = 0.0
+        # Throttles since the last success, which sets the backoff.
+        self.throttles = 0
+        # (priority, arrival) of the calls waiting, best first.
+        self.waiters: list[tuple[int, int]] = []
+
+
+class QuotaScheduler:
+    """
+    Paces Gmail API calls to stay within each user's quota, shared by
+    every sync engine, fetcher and downloader given the same scheduler.
+
+    - Each user has a token bucket of quota units, refilled at
+      `units_per_second`. A call takes the units its method costs, see
+      QUOTA_UNITS.
+    - The calls in flight per user are capped by a limit that grows by one
+      per round of successful calls and halves when Gmail answers 429, a
+      rate limit error or 5xx, like TCP congestion control.
+    - Such answers also pause the user's calls for an exponential backoff
+      with jitter, or as long as Gmail's Retry-After asks.
+    - Interactive calls (see `interactive()`) go before waiting background
+      calls, and one call slot is kept free for them.
+    - Optionally, `max_connections` caps the calls in flight across all
+      users together.
+
+        quota = QuotaScheduler()
+        engine = GmailSyncEngine(factory, account="ana@example.com", quota=quota)
+    """
+
+    def __init__(
+        self,
+        units_per_second: float = USER_UNITS_PER_SECOND,
+        burst_units: float | None = None,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 16,
+        max_retries: int = 5,
+        backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 32.0,
+        max_connections: int | None = None,
+    ):
+        """
+        Args:
+            units_per_second: The quota units each user gets per second.
+            burst_units: The most units a user can use at once after being
+                         idle. Defaults to two seconds' worth.
+            initial_concurrency: The calls in flight per user at first.
+            max_concurrency: The most calls in flight per user.
+            max_retries: How often `execute()` retries a throttled call.
+            backoff_seconds: The pause after a first throttle; doubled,
+                             with jitter, for each further one in a row.
+            max_backoff_seconds: The longest pause.
+            max_connections: The most calls in flight across all users, to
+                             bound the connections open at once. Unlimited
+                             by default.
+
+        Raises:
+            ValueError: If a limit is not positive.
+        """
+        if (
+            units_per_second <= 0
+            or initial_concurrency <= 0
+            or (max_connections is not None and max_connections <= 0)
+        ):
+            raise ValueError("units_per_second and concurrency must be positive")
+        self.units_per_second = units_per_second
+        self.burst_units = (
+            burst_units if burst_units is not None else 2 * units_per_second
+        )
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max(max_concurrency, initial_concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_connections = max_connections
+
+        self._in_flight = 0
+        self._users: dict[str, _UserQuota] = {}
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+
+    def concurrency_limit(self, account: str) -> float:
+        """The current limit on `account`'s calls in flight."""
+        with self._cond:
+            return self._user(account).limit
+
+    @contextmanager
+    def slot(
+        self, account: str, method: str, units: float | None = None
+    ) -> Iterator[None]:
+        """
+        Waits until `account` has the quota and a free slot for a call,
+        which is then made in the block. An HttpError raised from the block
+        is checked for throttling and re-raised.
+
+        Args:
+            account: The user the call is charged to.
+            method: The API method, e.g. "messages.list", to price the call.
+            units: The units to charge instead, e.g. for a batch request.
+        """
+        priority = _priority.get()
+        cost = units if units is not None else QUOTA_UNITS.get(method, DEFAULT_UNITS)
+        waited = self._acquire(account, cost, priority)
+        _WAIT_SECONDS.labels(priority.name.lower()).observe(waited)
+        started = time.monotonic()
+        try:
+            yield
+        except HttpError as e:
+            self._release(account, started, e)
+            raise
+        except BaseException:
+            self._release(account, started, None, succeeded=False)
+            raise
+        self._release(account, started, None)
+
+    def execute(
+        self,
+        account: str,
+        method: str,
+        call: Callable[[], T],
+        units: float | None = None,
+    ) -> T:
+        """
+        Runs `call` in a `slot()`, retrying it after the backoff when it is
+        throttled.
+
+        Raises:
+            HttpError: If the call fails otherwise, or is still throttled
+                       after `max_retries` retries.
+        """
+        for attempt in itertools.count():
+            try:
+                with self.slot(account, method, units):
+                    return call()
+            except HttpError as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                logger.info(
+                    "Gmail answered %s to %s for %s, retrying",
+                    e.resp.status,
+                    method,
+                    account,
+                )
+        raise AssertionError("unreachable")
+
+    def throttled(self, account: str, retry_after: float | None = None) -> None:
+        """
+        Reports throttling seen outside a slot's error, e.g. in the
+        sub-requests of a batch. Ignored while the user's calls are paused.
+        """
+        with self._cond:
+            self._throttle(self._user(account), time.monotonic(), retry_after)
+            self._cond.notify_all()
+
+    def _user(self, account: str) -> _UserQuota:
+        user = self._users.get(account)
+        if user is None:
+            user = self._users[account] = _UserQuota(
+                self.burst_units, float(self.initial_concurrency)
+            )
+        return user
+
+    def _acquire(self, account: str, units: float, priority: Priority) -> float:
+        """
+        Blocks until the call may start.
+
+        Returns:
+            How long it waited, in seconds.
+        """
+        start = time.monotonic()
+        with self._cond:
+            user = self._user(account)
+            ticket = (int(priority), next(self._arrivals))
+            heapq.heappush(user.waiters, ticket)
+            try:
+                while (timeout := self._try_start(user, ticket, units)) != 0:
+                    self._cond.wait(timeout)
+            except BaseException:
+                user.waiters.remove(ticket)
+                heapq.heapify(user.waiters)
+                self._cond.notify_all()
+                raise
+        return time.monotonic() - start
+
+    def _try_start(
+        self, user: _UserQuota, ticket: tuple[int, int], units: float
+    ) -> float | None:
+        """
+        Starts the call holding `ticket` if it is its turn and there is
+        quota.
+
+        Returns:
+            0 if it started, else how long to wait before trying again;
+            None to wait until another call finishes.
+        """
+        if user.waiters[0] != ticket:
+            return None
+        now = time.monotonic()
+        if now < user.paused_until:
+            return user.paused_until - now
+        slots = int(user.limit)
+        if ticket[0] != Priority.INTERACTIVE and slots > 1:
+            slots -= 1
+        if user.in_flight >= slots:
+            return None
+        # Past the global cap, wait for any user's call to finish.
+        cap = self.max_connections
+        if cap is not None and self._in_flight >= cap:
+            return None
+        user.tokens = min(
+            self.burst_units,
+            user.tokens + (now - user.updated) * self.units_per_second,
+        )
+        user.updated = now
+        # Calls costing more than a burst go once the bucket is full, and
+        # leave it in debt.
+        needed = min(units, self.burst_units)
+        if user.tokens < needed:
+            return (needed - user.tokens) / self.units_per_second
+        user.tokens -= units
+        user.in_flight += 1
+        self._in_flight += 1
+        heapq.heappop(user.waiters)
+        # The next waiter may be able to start too.
+        self._cond.notify_all()
+        return 0
+
+    def _release(
+        self,
+        account: str,
+        started: float,
+        error: HttpError | None,
+        succeeded: bool = True,
+    ) -> None:
+        with self._cond:
+            user = self._user(account)
+            user.in_flight -= 1
+            self._in_flight -= 1
+            if error is not None and is_retryable(error):
+                self._throttle(user, started, _retry_after(error))
+            elif error is None and succeeded and started >= user.throttled_at:
+                user.throttles = 0
+                user.limit = min(self.max_concurrency, user.limit + 1 / user.limit)
+            self._cond.notify_all()
+
+    def _throttle(
+        self, user: _UserQuota, started: float, retry_after: float | None
+    ) -> None:
+        _THROTTLED.inc()
+        # Calls already in flight when the last throttle was handled were
+        # sent too fast for the old limit, and reports during a pause are
+        # about those calls; neither must cut the limit again.
+        if started < user.throttled_at or started < user.paused_until:
+            return
+        now = time.monotonic()
+        user.throttled_at = now
+        user.throttles += 1
+        user.limit = max(1.0, user.limit / 2)
+        delay = min(
+            self.max_backoff_seconds,
+            self.backoff_seconds * 2 ** (user.throttles - 1),
+        ) * random.uniform(0.5, 1.0)
+        delay = max(delay, retry_after or 0.0)
+        user.paused_until = max(user.paused_until, now + delay)
+        logger.info(
+            "Gmail is throttling, pausing for %.1fs at %.1f calls in flight",
+            delay,
+            user.limit,
+        )
+
+
+def quota_slot(
+    quota: QuotaScheduler | None, account: str, method: str, units: float | None = None
+) -> AbstractContextManager[None]:
+    """`quota.slot(...)`, or no limit at all without a scheduler."""
+    if quota is None:
+        return contextlib.nullcontext()
+    return quota.slot(account, method, units)
+
+
+def _retry_after(error: HttpError) -> float | None:
+    """The seconds to wait that Gmail's Retry-After header asks for."""
+    try:
+        return max(0.0, float(error.resp.get("retry-after", "")))
+    except ValueError:
+        return None
@@ -0,0 +1,76 @@
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from common.instrumentation import REGISTRY
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from .oauth_credentials_factory import OAuthCredentialsFactory
+
+GMAIL_API_SECONDS = REGISTRY.histogram(
+    "gmail_api_call_seconds", "Gmail API requests, by method.", ["method"]
+)
+GMAIL_API_ERRORS = REGISTRY.counter(
+    "gmail_api_errors_total",
+    "Gmail API requests that failed, by method and HTTP status.",
+    ["method", "status"],
+)
+
+
+@contextmanager
+def timed_call(method: str) -> Iterator[None]:
+    """
+    Times a Gmail API request, counting failures by HTTP status:
+
+        with timed_call("history.list"):
+            page = request.execute()
+    """
+    with GMAIL_API_SECONDS.labels(method).time():
+        try:
+            yield
+        except HttpError as e:
+            GMAIL_API_ERRORS.labels(method, str(e.resp.status)).inc()
+            raise
+
+
+class GmailServiceProvider:
+    """
+    Builds the Gmail API service from an OAuthCredentialsFactory.
+
+    The service is built once and reused. Refreshed tokens are updated in
+    place on the credentials object, so it is only rebuilt when the
+    factory hands out a different credentials object (e.g. after a fresh
+    OAuth flow).
+    """
+
+    def __init__(
+        self,
+        credentials_factory: OAuthCredentialsFactory,
+        service: Any | None = None,
+    ):
+        """
+        Args:
+            credentials_factory: Provides credentials for the Gmail API.
+            service: A pre-built Gmail API service, used as-is. Mostly for
+                     tests and benchmarks.
+        """
+        self.credentials_factory = credentials_factory
+        self._service = service
+        self._fixed = service is not None
+        self._service_creds: Any | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Returns the Gmail API service, with fresh credentials."""
+        creds = self.credentials_factory.get_credentials()
+        if self._fixed:
+            return self._service
+        with self._lock:
+            if self._service is None or creds is not self._service_creds:
+                self._service = build(
+                    "gmail", "v1", credentials=creds, cache_discovery=False
+                )
+                self._service_creds = creds
+            return self._service
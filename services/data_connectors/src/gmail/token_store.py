@@ -0,0 +1,195 @@
+import contextlib
+import json
+import logging
+import os.path
+import threading
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager
+
+from common.client_utils import atomic_write, file_lock
+from common.infisical_client import InfisicalClient
+from google.oauth2.credentials import Credentials
+from infisical_sdk.infisical_requests import APIError
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStore(ABC):
+    """
+    Where OAuthCredentialsFactory keeps the authorized-user token JSON.
+
+    Stores remember the last token they loaded or saved, so `save()` only
+    writes when the token actually changed and `load(if_changed=True)`
+    can cheaply tell whether someone else (another process or replica)
+    has stored a newer token.
+    """
+
+    def __init__(self):
+        self._last_token_json: str | None = None
+
+    def load(self, scopes: list[str], if_changed: bool = False) -> Credentials | None:
+        """
+        Loads the stored credentials.
+
+        Args:
+            scopes: OAuth 2.0 scopes the credentials are for.
+            if_changed: Return None if the stored token is the one this
+                        store last loaded or saved.
+
+        Returns:
+            The stored credentials, or None if nothing (new) is stored.
+        """
+        token_json = self._read()
+        if token_json is None:
+            return None
+        if if_changed and token_json == self._last_token_json:
+            return None
+        creds = self._parse(token_json, scopes)
+        self._last_token_json = token_json
+        return creds
+
+    def save(self, creds: Credentials) -> None:
+        """Stores the credentials, unless they are unchanged."""
+        token_json = creds.to_json()
+        if token_json == self._last_token_json:
+            return
+        self._write(token_json)
+        self._last_token_json = token_json
+
+    def lock(self) -> AbstractContextManager[object]:
+        """
+        Serializes load-refresh-save cycles between everyone sharing this
+        store. The default does nothing.
+        """
+        return contextlib.nullcontext()
+
+    @abstractmethod
+    def _read(self) -> str | None:
+        """Returns the raw stored token JSON, or None if there is none."""
+
+    @abstractmethod
+    def _write(self, token_json: str) -> None:
+        """Replaces the stored token JSON."""
+
+    def _parse(self, token_json: str, scopes: list[str]) -> Credentials:
+        return Credentials.from_authorized_user_info(json.loads(token_json), scopes)
+
+
+class FileTokenStore(TokenStore):
+    """
+    Keeps the token in a local file, written atomically and guarded by a
+    cross-process lock so worker processes can share it.
+    """
+
+    def __init__(self, token_path: str = "token.json"):
+        super().__init__()
+        self.token_path = token_path
+
+    def lock(self) -> AbstractContextManager[object]:
+        return file_lock(self.token_path)
+
+    def _read(self) -> str | None:
+        if not os.path.exists(self.token_path):
+            return None
+        with open(self.token_path) as token:
+            return token.read()
+
+    def _write(self, token_json: str) -> None:
+        # Write to a temp file and rename, so readers never see a torn file.
+        atomic_write(self.token_path, token_json)
+
+    def _parse(self, token_json: str, scopes: list[str]) -> Credentials:
+        return Credentials.from_authorized_user_file(self.token_path, scopes)
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    Keeps the token in memory only. Useful for tests, and for processes
+    that are handed a token at startup and don't need to persist it.
+    """
+
+    def __init__(self, token_json: str | None = None):
+        super().__init__()
+        self._token_json = token_json
+        self._lock = threading.Lock()
+
+    def lock(self) -> AbstractContextManager[object]:
+        return self._lock
+
+    def _read(self) -> str | None:
+        return self._token_json
+
+    def _write(self, token_json: str) -> None:
+        self._token_json = token_json
+
+
+class InfisicalTokenStore(TokenStore):
+    """
+    Keeps the token as a secret in Infisical, next to the OAuth client
+    secret.
+
+    Stateless containers can start with a valid token straight away, and
+    replicas share one refreshed token. The secret is only written back
+    when the token changed.
+
+    Reads bypass every cache, so a token refreshed by another replica is
+    seen at once. Infisical has no locks, so `lock()` does nothing; instead
+    a token is only written if the secret still holds the token this store
+    last saw. A replica that lost the race keeps using its own, still
+    valid, access token and picks up the stored one on its next refresh.
+    The check and the write are not atomic, so run a single writer where
+    refresh tokens rotate.
+    """
+
+    def __init__(self, client: InfisicalClient, secret_name: str = "GMAIL_TOKEN_JSON"):
+        """
+        Args:
+            client: An InfisicalClient scoped to the path holding the token.
+            secret_name: The name of the secret holding the token JSON.
+        """
+        super().__init__()
+        self._client = client
+        self.secret_name = secret_name
+
+    def _read(self) -> str | None:
+        try:
+            secret = self._client.uncached_secrets.get_secret_by_name(
+                secret_name=self.secret_name
+            )
+        except APIError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        return secret.secretValue or None
+
+    def _write(self, token_json: str) -> None:
+        stored = self._read()
+        if stored is not None and stored != self._last_token_json:
+            logger.info(
+                "Secret %s was updated by someone else, keeping theirs",
+                self.secret_name,
+            )
+            return
+        try:
+            self._client.secrets.update_secret_by_name(
+                current_secret_name=self.secret_name, secret_value=token_json
+            )
+        except APIError as e:
+            if e.status_code != 404:
+                raise
+            logger.info("Creating secret %s", self.secret_name)
+            self._client.secrets.create_secret_by_name(
+                secret_name=self.secret_name, secret_value=token_json
+            )
+
+
+def client_config_from_infisical(
+    client: InfisicalClient, secret_name: str = "OAUTH_CLIENT_SECRET_JSON"
+) -> dict:
+    """
+    Reads the OAuth client secret JSON saved to Infisical (see the
+    infrastructure README) for use as OAuthCredentialsFactory's
+    `client_config`.
+    """
+    secret = client.secrets.get_secret_by_name(secret_name=secret_name)
+    return json.loads(secret.secretValue)
@@ -0,0 +1,218 @@
+import threading
+from datetime import UTC, datetime, timedelta
+
+import httplib2
+import pytest
+from gmail.accounts import AccountSyncOrchestrator
+from gmail.token_store import MemoryTokenStore
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+
+ACCOUNTS = ["ana@example.com", "ben@example.com", "cy@example.com"]
+
+
+class FakeRequest:
+    def __init__(self, respond):
+        self._respond = respond
+
+    def execute(self):
+        return self._respond()
+
+
+class EmptyMailbox:
+    """
+    A Gmail API stand-in for a mailbox without changes, listing
+    `message_ids`. `getProfile` waits for `gate` if one is given, and
+    raises `error` if one is given.
+    """
+
+    def __init__(self, history_id=100, gate=None, error=None):
+        self.history_id = history_id
+        self.message_ids = []
+        self.gate = gate
+        self.error = error
+        self.started = threading.Event()
+
+    def users(self):
+        return self
+
+    def getProfile(self, userId, fields=None):
+        return FakeRequest(self._profile)
+
+    def messages(self):
+        return self
+
+    def history(self):
+        return self
+
+    def list(self, userId, maxResults, pageToken, **kwargs):
+        # Serves both messages.list and history.list.
+        return FakeRequest(
+            lambda: {
+                "messages": [{"id": i} for i in self.message_ids],
+                "historyId": str(self.history_id),
+            }
+        )
+
+    def _profile(self):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {"historyId": str(self.history_id)}
+
+
+class GatedFetcher:
+    """A BatchMessageFetcher stand-in that waits for `gate` to fetch."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+
+    def fetch(self, message_ids):
+        self.started.set()
+        self.gate.wait(5)
+        for message_id in message_ids:
+            yield {"id": message_id, "labelIds": ["INBOX"]}
+
+
+def token_store(token):
+    expiry = datetime.now(UTC).replace(tzinfo=None) + timedelta(hours=1)
+    creds = Credentials(
+        token=token,
+        refresh_token="fake-refresh-token",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="fake-client-id",
+        client_secret="fake-client-secret",
+        expiry=expiry,
+    )
+    return MemoryTokenStore(creds.to_json())
+
+
+@pytest.fixture
+def mailboxes():
+    return {email: EmptyMailbox() for email in ACCOUNTS}
+
+
+@pytest.fixture
+def orchestrator(mailboxes):
+    orchestrator = AccountSyncOrchestrator(
+        token_store=lambda email: token_store(f"token-{email}"),
+        service=mailboxes.__getitem__,
+        max_workers=4,
+    )
+    yield orchestrator
+    for mailbox in mailboxes.values():
+        if mailbox.gate is not None:
+            mailbox.gate.set()
+    orchestrator.close()
+
+
+def test_each_account_has_its_own_credentials(orchestrator):
+    for email in ACCOUNTS:
+        factory = orchestrator.account(email).credentials_factory
+        assert factory.get_credentials().token == f"token-{email}"
+
+    assert orchestrator.account(ACCOUNTS[0]) is orchestrator.account(ACCOUNTS[0])
+    assert orchestrator.accounts() == ACCOUNTS
+
+
+def test_syncs_every_account(orchestrator):
+    outcomes = list(orchestrator.sync_all(ACCOUNTS))
+
+    assert sorted(o.email_address for o in outcomes) == ACCOUNTS
+    assert all(o.ok and o.result.history_id == "100" for o in outcomes)
+    for email in ACCOUNTS:
+        assert orchestrator.checkpoint_store.load(email) == "100"
+
+
+def test_slow_accounts_do_not_hold_up_the_others(orchestrator, mailboxes):
+    slow = mailboxes[ACCOUNTS[0]]
+    slow.gate = threading.Event()
+
+    outcomes = orchestrator.sync_all(ACCOUNTS)
+    first, second = next(outcomes), next(outcomes)
+
+    assert {first.email_address, second.email_address} == set(ACCOUNTS[1:])
+    slow.gate.set()
+    assert next(outcomes).email_address == ACCOUNTS[0]
+
+
+def test_a_failing_account_does_not_fail_the_others(orchestrator, mailboxes):
+    error = HttpError(httplib2.Response({"status": 401}), b"")
+    mailboxes[ACCOUNTS[1]].error = error
+
+    outcomes = {o.email_address: o for o in orchestrator.sync_all(ACCOUNTS)}
+
+    assert outcomes[ACCOUNTS[1]].error is error
+    assert outcomes[ACCOUNTS[0]].ok and outcomes[ACCOUNTS[2]].ok
+    assert orchestrator.checkpoint_store.load(ACCOUNTS[1]) is None
+
+
+def test_syncs_waiting_to_start_are_merged(orchestrator, mailboxes):
+    slow = mailboxes[ACCOUNTS[0]]
+    slow.gate = threading.Event()
+    running = orchestrator.submit(ACCOUNTS[0])
+    slow.started.wait(1)
+
+    queued = orchestrator.submit(ACCOUNTS[0])
+
+    assert queued is not running
+    assert orchestrator.submit(ACCOUNTS[0]) is queued
+    slow.gate.set()
+    assert queued.result(1).history_id == "100"
+
+
+def test_slow_accounts_hold_one_worker_each(mailboxes):
+    orchestrator = AccountSyncOrchestrator(
+        token_store=lambda email: token_store(f"token-{email}"),
+        service=mailboxes.__getitem__,
+        max_workers=3,
+    )
+    slow = [mailboxes[email] for email in ACCOUNTS[:2]]
+    for mailbox in slow:
+        mailbox.gate = threading.Event()
+    try:
+        for email, mailbox in zip(ACCOUNTS, slow):
+            orchestrator.submit(email)
+            assert mailbox.started.wait(1)
+            # Waits for the running sync without taking a worker.
+            orchestrator.submit(email)
+
+        assert orchestrator.submit(ACCOUNTS[2]).result(1).history_id == "100"
+    finally:
+        for mailbox in slow:
+            mailbox.gate.set()
+    orchestrator.close()
+
+
+def test_slow_accounts_do_not_lock_the_others_out_of_a_shared_index(
+    tmp_path, mailboxes
+):
+    orchestrator = AccountSyncOrchestrator(
+        token_store=lambda email: token_store(f"token-{email}"),
+        index_path=str(tmp_path / "index.db"),
+        service=mailboxes.__getitem__,
+    )
+    slow = ACCOUNTS[0]
+    mailboxes[slow].message_ids = ["m1"]
+    fetcher = orchestrator.account(slow).fetcher = GatedFetcher()
+    try:
+        running = orchestrator.submit(slow)
+        assert fetcher.started.wait(1)
+
+        outcomes = list(orchestrator.sync_all(ACCOUNTS[1:]))
+
+        assert all(o.ok for o in outcomes)
+        assert not running.done()
+    finally:
+        fetcher.gate.set()
+    assert running.result(5).added == {"m1"}
+    assert orchestrator.account(slow).index.get("m1") is not None
+    orchestrator.close()
+
+
+def test_rejects_an_empty_worker_pool():
+    with pytest.raises(ValueError):
+        AccountSyncOrchestrator(token_store=token_store, max_workers=0)
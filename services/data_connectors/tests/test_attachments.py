@@ -0,0 +1,294 @@
+import base64
+import hashlib
+import os
+import threading
+import tracemalloc
+from unittest.mock import MagicMock
+
+import pytest
+from gmail.attachments import (
+    AttachmentDownloader,
+    AttachmentRef,
+    AttachmentStore,
+    attachment_refs,
+    decode_data_field,
+)
+from gmail.message_index import IndexedMessage, MessageIndex, download_attachments
+from googleapiclient.errors import HttpError
+
+# Divisible by 3, so blocks encode to base64 without padding.
+BLOCK = bytes(range(256)) * 192
+
+
+def encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data)
+
+
+class FakeResponse:
+    def __init__(self, status_code, chunks):
+        self.status_code = status_code
+        self._chunks = chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def iter_content(self, chunk_size):
+        buffer = b""
+        for chunk in self._chunks:
+            buffer += chunk
+            while len(buffer) >= chunk_size:
+                yield buffer[:chunk_size]
+                buffer = buffer[chunk_size:]
+        if buffer:
+            yield buffer
+
+    @property
+    def content(self):
+        return b"".join(self._chunks)
+
+
+class FakeSession:
+    """Serves `attachments.get` for attachment ids mapped to their content."""
+
+    def __init__(self, contents, failures=None, delay=0.0):
+        self.contents = contents
+        self.failures = failures or {}
+        self.requests = []
+        self.running = 0
+        self.max_running = 0
+        self._delay = delay
+        self._lock = threading.Lock()
+
+    def get(self, url, params, headers, stream):
+        assert stream and params == {"fields": "data"}
+        attachment_id = url.rsplit("/", 1)[1]
+        with self._lock:
+            self.requests.append(attachment_id)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        threading.Event().wait(self._delay)
+        with self._lock:
+            self.running -= 1
+        statuses = self.failures.get(attachment_id)
+        if statuses:
+            return FakeResponse(statuses.pop(0), [b'{"error": {}}'])
+        if attachment_id not in self.contents:
+            return FakeResponse(404, [b'{"error": {}}'])
+        content = self.contents[attachment_id]
+        if callable(content):
+            return FakeResponse(200, content())
+        return FakeResponse(200, [b'{\n  "data": "', encode(content), b'"\n}\n'])
+
+
+def ref(attachment_id, message_id="m1", part_id="1", size=0):
+    return AttachmentRef(
+        message_id, part_id, attachment_id, "a.pdf", "application/pdf", size
+    )
+
+
+def downloader(tmp_path, session, **kwargs):
+    return AttachmentDownloader(
+        MagicMock(),
+        AttachmentStore(str(tmp_path / "store")),
+        session=session,
+        sleep=lambda _: None,
+        **kwargs,
+    )
+
+
+def gmail_message(message_id, attachment_ids):
+    return {
+        "id": message_id,
+        "internalDate": "0",
+        "payload": {
+            "mimeType": "multipart/mixed",
+            "partId": "",
+            "parts": [
+                {"partId": "0", "mimeType": "text/plain", "body": {"data": "aGk"}},
+                *(
+                    {
+                        "partId": str(i + 1),
+                        "mimeType": "application/pdf",
+                        "filename": f"{attachment_id}.pdf",
+                        "body": {"attachmentId": attachment_id, "size": 3},
+                    }
+                    for i, attachment_id in enumerate(attachment_ids)
+                ),
+            ],
+        },
+    }
+
+
+def test_attachment_refs():
+    message = gmail_message("m1", ["a1", "a2"])
+    message["payload"]["parts"].append(
+        {
+            "partId": "3",
+            "mimeType": "multipart/mixed",
+            "parts": [
+                {
+                    "partId": "3.1",
+                    "mimeType": "image/png",
+                    "filename": "photo.png",
+                    "body": {"attachmentId": "a3", "size": 1234},
+                }
+            ],
+        }
+    )
+
+    refs = attachment_refs(message)
+
+    assert [(r.part_id, r.attachment_id, r.filename) for r in refs] == [
+        ("1", "a1", "a1.pdf"),
+        ("2", "a2", "a2.pdf"),
+        ("3.1", "a3", "photo.png"),
+    ]
+    assert refs[2] == AttachmentRef("m1", "3.1", "a3", "photo.png", "image/png", 1234)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1024])
+@pytest.mark.parametrize("data", [b"", b"x", b"xy", b"xyz", os.urandom(1000)])
+def test_decode_data_field(chunk_size, data):
+    body = b'{"size": %d, "data": "%s"}' % (len(data), encode(data))
+    chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    assert b"".join(decode_data_field(chunks)) == data
+
+
+def test_decode_data_field_without_padding():
+    body = b'{"data": "%s"}' % encode(b"xy").rstrip(b"=")
+
+    assert b"".join(decode_data_field([body])) == b"xy"
+
+
+def test_decode_data_field_errors():
+    with pytest.raises(ValueError, match="no data field"):
+        list(decode_data_field([b'{"size": 0}']))
+    with pytest.raises(ValueError, match="ended inside"):
+        list(decode_data_field([b'{"data": "eHl6']))
+
+
+def test_store_keeps_duplicates_once(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+
+    first = store.put([b"news", b"letter"])
+    second = store.put([b"newsletter"])
+
+    assert first == second
+    assert first.sha256 == hashlib.sha256(b"newsletter").hexdigest()
+    assert first.size == 10
+    assert first.sha256 in store
+    with store.open(first.sha256) as f:
+        assert f.read() == b"newsletter"
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_store_cleans_up_failed_writes(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+
+    def chunks():
+        yield b"partial"
+        raise OSError("connection reset")
+
+    with pytest.raises(OSError):
+        store.put(chunks())
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_download_retries_transient_errors(tmp_path):
+    session = FakeSession({"a1": b"report card"}, failures={"a1": [503, 429]})
+
+    stored = downloader(tmp_path, session).download(ref("a1"))
+
+    assert open(stored.path, "rb").read() == b"report card"
+    assert session.requests == ["a1"] * 3
+
+
+def test_download_raises_on_permanent_errors(tmp_path):
+    session = FakeSession({})
+
+    with pytest.raises(HttpError) as e:
+        downloader(tmp_path, session).download(ref("gone"))
+    assert e.value.resp.status == 404
+    assert session.requests == ["gone"]
+
+
+def test_download_skips_stored_content(tmp_path):
+    session = FakeSession({"a1": b"report card"})
+    attachments = downloader(tmp_path, session)
+    stored = attachments.download(ref("a1"))
+
+    again = attachments.download(
+        AttachmentRef("m2", "1", "a1-again", "a.pdf", "x", 11, sha256=stored.sha256)
+    )
+
+    assert again == stored
+    assert session.requests == ["a1"]
+
+
+def test_download_all_is_bounded_and_ordered(tmp_path):
+    contents = {f"a{i}": f"attachment {i % 3}".encode() for i in range(12)}
+    session = FakeSession(contents, delay=0.02)
+    refs = [ref(f"a{i}", part_id=str(i)) for i in range(12)] + [ref("gone")]
+
+    results = list(downloader(tmp_path, session, max_parallel=3).download_all(refs))
+
+    assert [r.attachment_id for r, _ in results] == [r.attachment_id for r in refs]
+    assert isinstance(results[-1][1], HttpError)
+    assert {result.sha256 for _, result in results[:-1]} == {
+        hashlib.sha256(f"attachment {i}".encode()).hexdigest() for i in range(3)
+    }
+    assert session.max_running == 3
+    # Three distinct contents, stored once each.
+    assert len(os.listdir(tmp_path / "store")) == 4
+
+
+def test_memory_stays_flat_for_large_attachments(tmp_path):
+    size = 16 * 1024 * 1024
+    blocks = size // len(BLOCK)
+
+    def body():
+        yield b'{"data": "'
+        encoded = encode(BLOCK)
+        for _ in range(blocks):
+            yield encoded
+        yield b'"}'
+
+    attachments = downloader(tmp_path, FakeSession({"big": body}))
+
+    tracemalloc.start()
+    try:
+        stored = attachments.download(ref("big"))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert stored.size == blocks * len(BLOCK)
+    assert peak < 1024 * 1024
+
+
+def test_index_points_to_attachments_until_downloaded(tmp_path):
+    index = MessageIndex()
+    index.upsert([IndexedMessage.from_gmail(gmail_message("m1", ["a1", "a2"]))])
+    session = FakeSession({"a1": b"pdf 1", "a2": b"pdf 2"})
+
+    assert [r.sha256 for r in index.attachments("m1")] == [None, None]
+    assert len(index.missing_attachments()) == 2
+
+    assert download_attachments(downloader(tmp_path, session), index) == 2
+
+    assert [r.sha256 for r in index.attachments("m1")] == [
+        hashlib.sha256(b"pdf 1").hexdigest(),
+        hashlib.sha256(b"pdf 2").hexdigest(),
+    ]
+    assert index.missing_attachments() == []
+
+    # Refetching the message keeps the downloads; dropped parts go away.
+    index.upsert([IndexedMessage.from_gmail(gmail_message("m1", ["a1-new"]))])
+    assert [(r.attachment_id, r.sha256) for r in index.attachments("m1")] == [
+        ("a1-new", hashlib.sha256(b"pdf 1").hexdigest())
+    ]
+    index.close()
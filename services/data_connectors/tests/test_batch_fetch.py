@@ -0,0 +1,163 @@
+import json
+import re
+from email.parser import Parser
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+import pytest
+from gmail.batch_fetch import BatchMessageFetcher
+from gmail.quota import QuotaScheduler
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+REQUEST_LINE = re.compile(r"^(\w+) (\S+) HTTP/1\.1", re.MULTILINE)
+
+
+class FakeGmailHttp:
+    """
+    An httplib2.Http stand-in answering Gmail batch requests.
+
+    `failures` maps a message id to the statuses its next sub-requests
+    return, e.g. {"m1": [503]} fails m1 once and then succeeds.
+    """
+
+    def __init__(self, message_ids, failures=None):
+        self.messages = {i: {"id": i, "threadId": f"t-{i}"} for i in message_ids}
+        self.failures = {i: list(s) for i, s in (failures or {}).items()}
+        self.batches: list[list[tuple[str, dict]]] = []
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        assert uri == "https://gmail.googleapis.com/batch"
+        content_type = headers["content-type"]
+        parts = Parser().parsestr(f"content-type: {content_type}\n\n{body}")
+        boundary = "fake-boundary"
+        out, batch = [], []
+        for part in parts.get_payload():
+            _, path = REQUEST_LINE.search(part.get_payload()).groups()
+            url = urlparse(path)
+            message_id = url.path.rsplit("/", 1)[1]
+            batch.append((message_id, parse_qs(url.query)))
+            status, payload = self._get(message_id)
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            out.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        self.batches.append(batch)
+        response = httplib2.Response(
+            {"status": 200, "content-type": f"multipart/mixed; boundary={boundary}"}
+        )
+        return response, ("".join(out) + f"--{boundary}--").encode()
+
+    def _get(self, message_id):
+        statuses = self.failures.get(message_id)
+        if statuses:
+            status = statuses.pop(0)
+            return status, {"error": {"code": status, "message": "failed"}}
+        if message_id not in self.messages:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        return 200, self.messages[message_id]
+
+
+def build_fetcher(http, **kwargs):
+    service = build("gmail", "v1", http=http, static_discovery=True)
+    return BatchMessageFetcher(
+        credentials_factory=MagicMock(),
+        service=service,
+        sleep=lambda seconds: None,
+        **kwargs,
+    )
+
+
+def test_fetches_in_batches_of_at_most_100():
+    ids = [f"m{i}" for i in range(250)]
+    http = FakeGmailHttp(ids)
+
+    messages = list(build_fetcher(http).fetch(ids))
+
+    assert [m["id"] for m in messages] == ids
+    assert [len(b) for b in http.batches] == [100, 100, 50]
+
+
+def test_fetch_is_lazy():
+    ids = [f"m{i}" for i in range(250)]
+    http = FakeGmailHttp(ids)
+
+    messages = build_fetcher(http, batch_size=50).fetch(iter(ids))
+    next(messages)
+
+    assert len(http.batches) == 1
+
+
+def test_passes_format_and_fields():
+    http = FakeGmailHttp(["m1"])
+    fetcher = build_fetcher(
+        http,
+        format="metadata",
+        fields="id,labelIds",
+        metadata_headers=["From", "Subject"],
+    )
+
+    list(fetcher.fetch(["m1"]))
+
+    _, params = http.batches[0][0]
+    assert params["format"] == ["metadata"]
+    assert params["fields"] == ["id,labelIds"]
+    assert params["metadataHeaders"] == ["From", "Subject"]
+
+
+def test_retries_only_failed_sub_requests():
+    http = FakeGmailHttp(["m1", "m2", "m3"], failures={"m2": [429, 503]})
+
+    messages = list(build_fetcher(http).fetch(["m1", "m2", "m3"]))
+
+    assert sorted(m["id"] for m in messages) == ["m1", "m2", "m3"]
+    assert [[i for i, _ in b] for b in http.batches] == [
+        ["m1", "m2", "m3"],
+        ["m2"],
+        ["m2"],
+    ]
+
+
+def test_throttled_sub_requests_slow_the_account_down():
+    http = FakeGmailHttp(["m1", "m2"], failures={"m2": [429]})
+    quota = QuotaScheduler(backoff_seconds=0.001)
+    fetcher = build_fetcher(http, account="ana@example.com", quota=quota)
+
+    assert [m["id"] for m in fetcher.fetch(["m1", "m2"])] == ["m1", "m2"]
+    assert quota.concurrency_limit("ana@example.com") < 4
+
+
+def test_skips_deleted_messages():
+    http = FakeGmailHttp(["m1"])
+
+    messages = list(build_fetcher(http).fetch(["m1", "gone"]))
+
+    assert [m["id"] for m in messages] == ["m1"]
+    assert len(http.batches) == 1
+
+
+def test_gives_up_after_max_retries():
+    http = FakeGmailHttp(["m1"], failures={"m1": [500, 500, 500]})
+
+    with pytest.raises(HttpError) as e:
+        list(build_fetcher(http, max_retries=2).fetch(["m1"]))
+
+    assert e.value.resp.status == 500
+    assert len(http.batches) == 3
+
+
+def test_non_retryable_errors_are_raised():
+    http = FakeGmailHttp(["m1"], failures={"m1": [400]})
+
+    with pytest.raises(HttpError):
+        list(build_fetcher(http).fetch(["m1"]))
+    assert len(http.batches) == 1
+
+
+def test_rejects_oversized_batches():
+    with pytest.raises(ValueError, match="batch_size"):
+        BatchMessageFetcher(credentials_factory=MagicMock(), batch_size=101)
@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+
+import pytest
+from gmail.classifier import CategoryRules, MessageClassifier, load_rules
+from gmail.message_index import IndexedMessage, MessageIndex
+
+RULES = {
+    "school": CategoryRules(
+        sender_domains=("school.example",),
+        list_ids=("pta.district.example",),
+        subject_keywords=("report card",),
+        keywords=("field trip", "field day", "homework"),
+        patterns=(r"grade\s+\d+",),
+    ),
+    "family": CategoryRules(
+        senders=("grandma@family.example",),
+        labels=("Label_7",),
+        keywords=("birthday party",),
+        subject_patterns=(r"^fam(ily)?:",),
+    ),
+}
+
+
+@pytest.fixture
+def classifier():
+    return MessageClassifier(RULES)
+
+
+def message(**kwargs):
+    return IndexedMessage("m1", **kwargs)
+
+
+@pytest.mark.parametrize(
+    "kwargs, categories",
+    [
+        ({"sender": "office@school.example"}, {"school"}),
+        ({"sender": "teacher@mail.school.example"}, {"school"}),
+        ({"sender": "office@notschool.example"}, set()),
+        ({"list_id": "PTA News <pta.district.example>"}, {"school"}),
+        ({"list_id": "<news.pta.district.example>"}, {"school"}),
+        ({"subject": "Report  Card is ready"}, {"school"}),
+        ({"text": "A report card"}, set()),
+        ({"text": "Sign up for the FIELD\ntrip!"}, {"school"}),
+        ({"text": "Fieldtrip"}, set()),
+        ({"snippet": "math homework due"}, {"school"}),
+        ({"text": "Welcome to grade 4"}, {"school"}),
+        ({"sender": "Grandma@family.example"}, set()),
+        ({"sender": "grandma@family.example"}, {"family"}),
+        ({"labels": frozenset({"Label_7"})}, {"family"}),
+        ({"subject": "Family: dinner"}, {"family"}),
+        ({"text": "Family: dinner"}, set()),
+        ({"subject": "Field day and birthday party"}, {"school", "family"}),
+    ],
+)
+def test_classify(classifier, kwargs, categories):
+    assert classifier.classify(message(**kwargs)) == categories
+
+
+def test_overlapping_keywords_all_match():
+    classifier = MessageClassifier(
+        {
+            "sports": CategoryRules(keywords=("field",)),
+            "school": CategoryRules(keywords=("field trip",)),
+            "travel": CategoryRules(keywords=("trip",)),
+        }
+    )
+
+    assert classifier(message(text="Field trip tomorrow")) == {
+        "sports",
+        "school",
+        "travel",
+    }
+    assert classifier(message(text="field  trips")) == {"sports"}
+    assert classifier(message(text="fields")) == set()
+
+
+def test_overlapping_subject_keywords_all_match():
+    classifier = MessageClassifier(
+        {
+            "a": CategoryRules(subject_keywords=("school",)),
+            "b": CategoryRules(subject_keywords=("school bus",)),
+        }
+    )
+
+    assert classifier(message(subject="School bus delayed")) == {"a", "b"}
+    assert classifier(message(subject="School closed")) == {"a"}
+
+
+def test_classify_batch(classifier):
+    messages = [message(subject="homework"), message(), message(subject="fam: hi")]
+
+    assert classifier.classify_batch(messages) == [{"school"}, set(), {"family"}]
+
+
+def test_load_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"school": {"keywords": ["homework"]}}))
+
+    assert load_rules(str(path)) == {"school": CategoryRules(keywords=("homework",))}
+
+    path.write_text(json.dumps({"school": {"keywordz": ["homework"]}}))
+    with pytest.raises(ValueError, match="keywordz"):
+        load_rules(str(path))
+    path.write_text(json.dumps({"school": {"keywords": "homework"}}))
+    with pytest.raises(ValueError, match="must be a list"):
+        load_rules(str(path))
+
+
+def test_reload(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"school": {"keywords": ["homework"]}}))
+    classifier = MessageClassifier.from_file(str(path))
+    assert classifier.reload() is False
+
+    path.write_text(json.dumps({"school": {"keywords": ["recess"]}}))
+    os.utime(path, (0, 1))
+    assert classifier.reload() is True
+    assert classifier(message(text="recess")) == {"school"}
+    assert classifier(message(text="homework")) == set()
+    assert classifier.version == 1
+
+    # Broken rules are ignored.
+    path.write_text("{")
+    os.utime(path, (0, 2))
+    assert classifier.reload() is False
+    assert classifier(message(text="recess")) == {"school"}
+
+    path.write_text(json.dumps({"school": {"patterns": ["("]}}))
+    os.utime(path, (0, 3))
+    assert classifier.reload() is False
+    assert classifier.version == 1
+
+
+def test_broken_rules_are_reported_once(tmp_path, caplog):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"school": {"keywords": ["homework"]}}))
+    classifier = MessageClassifier.from_file(str(path))
+    path.write_text("{")
+    os.utime(path, (0, 1))
+
+    assert classifier.reload() is False
+    assert classifier.reload() is False
+    assert len(caplog.records) == 1
+    assert classifier(message(text="homework")) == {"school"}
+
+    path.write_text(json.dumps({"school": {"keywords": ["recess"]}}))
+    os.utime(path, (0, 2))
+    assert classifier.reload() is True
+
+
+def test_update_does_not_block_classification(classifier):
+    errors = []
+    stop = threading.Event()
+
+    def classify():
+        while not stop.is_set():
+            categories = classifier(message(subject="homework", text="recess"))
+            if categories != {"school"}:
+                errors.append(categories)
+
+    thread = threading.Thread(target=classify)
+    thread.start()
+    for i in range(20):
+        keyword = "homework" if i % 2 else "recess"
+        classifier.update({"school": CategoryRules(keywords=(keyword,))})
+    stop.set()
+    thread.join()
+
+    assert errors == []
+
+
+def test_index_counts_classified_messages(classifier):
+    index = MessageIndex(categorize=classifier)
+    index.upsert(
+        [
+            IndexedMessage(
+                "m1", sender="office@school.example", labels=frozenset({"UNREAD"})
+            ),
+            IndexedMessage(
+                "m2", subject="birthday party", labels=frozenset({"UNREAD"})
+            ),
+            IndexedMessage("m3", subject="homework"),
+        ]
+    )
+
+    assert index.unread_count("school").unread == 1
+    assert index.unread_count("family").unread == 1
+
+    # New rules are applied to existing messages when reconciling.
+    classifier.update({"school": CategoryRules(keywords=("birthday",))})
+    assert index.reconcile_unread_counts() == {"family": 1}
+    assert index.unread_count("school").unread == 1
+    assert index.unread_count("family").unread == 0
+    index.close()
+
+
+def test_patterns_with_literal_prefixes():
+    classifier = MessageClassifier(
+        {
+            "a": CategoryRules(patterns=(r"colou?r\s+run",)),
+            "b": CategoryRules(patterns=(r"our\s+team",)),
+            "c": CategoryRules(patterns=(r"x{2}l", r"[0-9]+ km")),
+        }
+    )
+
+    assert classifier(message(text="The Color  Run")) == {"a"}
+    # Starts inside another pattern's prefix.
+    assert classifier(message(text="colour team")) == {"b"}
+    assert classifier(message(text="XXL shirts, 5 km")) == {"c"}
+    assert classifier(message(text="colouring")) == set()
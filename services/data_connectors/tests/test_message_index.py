@@ -0,0 +1,397 @@
+import base64
+import threading
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from gmail.message_index import (
+    IndexedMessage,
+    MessageIndex,
+    categorize_by_labels,
+    extract_text,
+    index_generation,
+    indexed_accounts,
+    sync_index,
+)
+from gmail.sync import SyncResult
+
+DAY_MS = 24 * 60 * 60 * 1000
+JAN_1 = int(datetime(2026, 1, 1, tzinfo=UTC).timestamp() * 1000)
+
+
+def gmail_message(
+    message_id,
+    sender="Office <office@school.example>",
+    subject="Newsletter",
+    text="Picture day is on Friday.",
+    days=0,
+    labels=("INBOX", "UNREAD"),
+):
+    body = base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+    return {
+        "id": message_id,
+        "threadId": f"t-{message_id}",
+        "labelIds": list(labels),
+        "snippet": text[:20],
+        "internalDate": str(JAN_1 + days * DAY_MS),
+        "payload": {
+            "mimeType": "multipart/alternative",
+            "headers": [
+                {"name": "From", "value": sender},
+                {"name": "To", "value": "parent@family.example"},
+                {"name": "Subject", "value": subject},
+            ],
+            "parts": [
+                {"mimeType": "text/plain", "body": {"data": body}},
+                {"mimeType": "text/html", "body": {"data": "PGI-aWdub3JlZDwvYj4"}},
+            ],
+        },
+    }
+
+
+@pytest.fixture
+def index():
+    index = MessageIndex()
+    yield index
+    index.close()
+
+
+def test_from_gmail_parses_message():
+    message = IndexedMessage.from_gmail(gmail_message("m1", days=1))
+
+    assert message.id == "m1"
+    assert message.thread_id == "t-m1"
+    assert message.sender == "office@school.example"
+    assert message.sender_name == "Office"
+    assert message.sender_domain == "school.example"
+    assert message.subject == "Newsletter"
+    assert message.text == "Picture day is on Friday."
+    assert message.labels == {"INBOX", "UNREAD"}
+    assert message.date == datetime(2026, 1, 2, tzinfo=UTC)
+
+
+def test_extract_text_falls_back_to_html():
+    html = "<p>Field&nbsp;trip <b>permission</b></p><style>p {}</style>"
+    payload = {
+        "mimeType": "text/html",
+        "body": {"data": base64.urlsafe_b64encode(html.encode()).decode()},
+    }
+
+    assert extract_text(payload) == "Field trip permission"
+
+
+def test_upsert_and_get(index):
+    index.upsert([IndexedMessage.from_gmail(gmail_message("m1"))])
+    index.upsert([IndexedMessage.from_gmail(gmail_message("m1", subject="Changed"))])
+
+    assert len(index) == 1
+    assert index.get("m1").subject == "Changed"
+    assert index.get("missing") is None
+
+
+def test_full_text_search(index):
+    index.upsert(
+        [
+            IndexedMessage.from_gmail(gmail_message("m1", text="Picture day Friday")),
+            IndexedMessage.from_gmail(gmail_message("m2", text="Soccer practice")),
+            IndexedMessage.from_gmail(
+                gmail_message("m3", subject="Café menu", text="Lunch")
+            ),
+        ]
+    )
+
+    assert [m.id for m in index.query("picture").messages] == ["m1"]
+    assert [m.id for m in index.query("SOCCER practice").messages] == ["m2"]
+    assert [m.id for m in index.query("cafe").messages] == ["m3"]
+    assert index.query("picture soccer").messages == []
+    # FTS5 syntax in user input is matched literally.
+    assert index.query('"picture" OR NEAR(').messages == []
+
+
+def test_blank_text_does_not_filter(index):
+    index.upsert([IndexedMessage.from_gmail(gmail_message("m1"))])
+
+    assert [m.id for m in index.query(text="   ").messages] == ["m1"]
+    assert index.count(text="\t\n") == 1
+
+
+def test_filters(index):
+    index.upsert(
+        [
+            IndexedMessage.from_gmail(gmail_message("m1", days=0)),
+            IndexedMessage.from_gmail(
+                gmail_message("m2", sender="coach@club.example", days=1)
+            ),
+            IndexedMessage.from_gmail(gmail_message("m3", days=2, labels=["INBOX"])),
+        ]
+    )
+
+    assert [m.id for m in index.query(sender="OFFICE@school.example").messages] == [
+        "m3",
+        "m1",
+    ]
+    assert [m.id for m in index.query(sender_domain="club.example").messages] == ["m2"]
+    assert [m.id for m in index.query(label="UNREAD").messages] == ["m2", "m1"]
+    since = datetime(2026, 1, 2, tzinfo=UTC)
+    assert [m.id for m in index.query(since=since).messages] == ["m3", "m2"]
+    assert [m.id for m in index.query(until=since).messages] == ["m1"]
+    assert index.count(label="UNREAD", sender_domain="school.example") == 1
+
+
+def test_keyset_pagination(index):
+    # Several messages share a date, so pages must break ties consistently.
+    index.upsert(
+        IndexedMessage.from_gmail(gmail_message(f"m{i:02d}", days=i // 3))
+        for i in range(20)
+    )
+
+    seen, cursor = [], None
+    while True:
+        page = index.query(label="INBOX", limit=6, cursor=cursor)
+        seen.extend(m.id for m in page.messages)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+
+    assert len(seen) == len(set(seen)) == 20
+    dates = [index.get(i).internal_date for i in seen]
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_invalid_cursor(index):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        index.query(cursor="bm9wZQ==")
+
+
+def test_label_changes_and_deletes(index):
+    index.upsert(IndexedMessage.from_gmail(gmail_message(i)) for i in ["m1", "m2"])
+
+    index.update_labels(
+        added={"m1": {"STARRED"}, "unknown": {"X"}}, removed={"m2": {"UNREAD"}}
+    )
+    index.delete(["m1"])
+
+    assert index.get("m1") is None
+    assert index.get("m2").labels == {"INBOX"}
+    assert index.count(label="UNREAD") == 0
+    assert index.count(label="STARRED") == 0
+    assert index.query("picture").messages[0].id == "m2"
+
+
+def test_apply_sync(index):
+    index.apply_sync(
+        SyncResult("me", "100", full_sync=True, added={"m1", "m2"}),
+        [gmail_message("m1"), gmail_message("m2")],
+    )
+    index.apply_sync(
+        SyncResult(
+            "me",
+            "101",
+            full_sync=False,
+            added={"m3"},
+            deleted={"m1"},
+            labels_removed={"m2": {"UNREAD"}},
+        ),
+        [gmail_message("m3")],
+    )
+
+    assert {m.id for m in index.query().messages} == {"m2", "m3"}
+    assert index.count(label="UNREAD") == 1
+
+
+def test_full_sync_drops_messages_gone_from_gmail(index):
+    index.upsert(IndexedMessage.from_gmail(gmail_message(i)) for i in ["m1", "m2"])
+
+    index.apply_sync(
+        SyncResult("me", "200", full_sync=True, added={"m2"}), [gmail_message("m2")]
+    )
+
+    assert [m.id for m in index.query().messages] == ["m2"]
+
+
+def test_accounts_share_a_database(tmp_path):
+    path = str(tmp_path / "index.db")
+    alice = MessageIndex(path, account="alice")
+    bob = MessageIndex(path, account="bob")
+
+    alice.upsert([IndexedMessage.from_gmail(gmail_message("m1"))])
+
+    assert len(alice) == 1
+    assert len(bob) == 0
+    assert bob.get("m1") is None
+    alice.close()
+    bob.close()
+
+
+def test_database_wide_reads(tmp_path):
+    path = str(tmp_path / "index.db")
+    assert indexed_accounts(path) == []
+    assert index_generation(path) == 0
+
+    index = MessageIndex(path, account="alice")
+    index.apply_sync(SyncResult("alice", "1", full_sync=True, added={"m1"}), [])
+
+    assert indexed_accounts(path) == ["alice"]
+    assert index_generation(path) == index.generation() > 0
+    index.close()
+
+
+def test_fetching_for_a_sync_does_not_lock_out_other_accounts(tmp_path):
+    path = str(tmp_path / "index.db")
+    alice = MessageIndex(path, account="alice")
+    bob = MessageIndex(path, account="bob")
+    # Fail fast instead of waiting 30s for the write lock.
+    bob._conn().execute("PRAGMA busy_timeout = 100")
+
+    def fetch_alice():
+        # While alice's messages are being fetched, bob syncs.
+        bob.apply_sync(
+            SyncResult("bob", "7", full_sync=True, added={"b1"}),
+            [gmail_message("b1")],
+        )
+        yield gmail_message("a1")
+
+    alice.apply_sync(
+        SyncResult("alice", "100", full_sync=True, added={"a1"}), fetch_alice()
+    )
+
+    assert alice.get("a1") is not None
+    assert bob.get("b1") is not None
+    alice.close()
+    bob.close()
+
+
+def test_sync_state_is_written_last(tmp_path):
+    index = MessageIndex(str(tmp_path / "index.db"))
+
+    def failing_fetch():
+        yield gmail_message("m1")
+        raise ConnectionError("network down")
+
+    with pytest.raises(ConnectionError):
+        index.apply_sync(
+            SyncResult("me", "100", full_sync=True, added={"m1", "m2"}),
+            failing_fetch(),
+        )
+
+    assert index.accounts() == []
+    assert index.unread_count("school").synced_at is None
+    index.close()
+
+
+def test_readers_in_other_threads(tmp_path):
+    index = MessageIndex(str(tmp_path / "index.db"))
+    index.upsert([IndexedMessage.from_gmail(gmail_message("m1"))])
+    counts = []
+
+    thread = threading.Thread(target=lambda: counts.append(len(index)))
+    thread.start()
+    thread.join()
+
+    assert counts == [1]
+    index.close()
+
+
+def test_sync_index_advances_checkpoint_after_indexing(index):
+    result = SyncResult("me", "100", full_sync=True, added={"m1"})
+    engine = MagicMock()
+    engine.sync.side_effect = lambda consumer: consumer(result) or result
+    fetcher = MagicMock()
+    fetcher.fetch.return_value = [gmail_message("m1")]
+
+    assert sync_index(engine, fetcher, index) is result
+
+    fetcher.fetch.assert_called_once_with(["m1"])
+    assert index.get("m1") is not None
+
+
+def school_index():
+    return MessageIndex(categorize=categorize_by_labels({"Label_1": "school"}))
+
+
+def test_unread_counts_follow_sync():
+    index = school_index()
+    school = ("INBOX", "UNREAD", "Label_1")
+
+    index.apply_sync(
+        SyncResult("me", "100", full_sync=True, added={"m1", "m2", "m3"}),
+        [
+            gmail_message("m1", labels=school),
+            gmail_message("m2", labels=school),
+            gmail_message("m3"),
+        ],
+    )
+    assert index.unread_count("school").unread == 2
+
+    # Read, filed as school, and deleted.
+    index.apply_sync(
+        SyncResult(
+            "me",
+            "101",
+            full_sync=False,
+            added={"m4"},
+            deleted={"m2"},
+            labels_added={"m3": {"Label_1"}},
+            labels_removed={"m1": {"UNREAD"}},
+        ),
+        [gmail_message("m4", labels=school)],
+    )
+    assert index.unread_count("school").unread == 2
+
+    # Trashed, then re-fetched unchanged.
+    index.update_labels(added={"m3": {"TRASH"}})
+    index.upsert([IndexedMessage.from_gmail(gmail_message("m4", labels=school))])
+    count = index.unread_count("school")
+    assert count.unread == 1
+    assert index.reconcile_unread_counts() == {}
+    index.close()
+
+
+def test_unread_count_reports_staleness():
+    index = school_index()
+    assert index.unread_count("school").synced_at is None
+    assert index.unread_count("school").staleness() is None
+
+    before = datetime.now(UTC)
+    index.apply_sync(SyncResult("me", "100", full_sync=True), [])
+    count = index.unread_count("school")
+
+    assert count.unread == 0
+    assert before <= count.synced_at <= datetime.now(UTC)
+    assert count.staleness(count.synced_at + timedelta(minutes=5)) == timedelta(
+        minutes=5
+    )
+    assert index.accounts() == ["me"]
+    index.close()
+
+
+def test_reconcile_fixes_drift():
+    index = school_index()
+    index.upsert(
+        IndexedMessage.from_gmail(gmail_message(i, labels=["UNREAD", "Label_1"]))
+        for i in ["m1", "m2"]
+    )
+    with index._transaction() as conn:
+        conn.execute("UPDATE unread_counts SET unread = 7")
+        conn.execute("INSERT INTO unread_counts VALUES ('me', 'sports', 1)")
+
+    assert index.reconcile_unread_counts() == {"school": 5, "sports": 1}
+    assert index.unread_count("school").unread == 2
+    assert index.unread_count("sports").unread == 0
+    assert index.reconcile_unread_counts() == {}
+    index.close()
+
+
+def test_generation_tracks_changes(index):
+    assert index.generation() == 0
+
+    index.apply_sync(SyncResult("me", "100", full_sync=True, added={"m1"}), [])
+    first = index.generation()
+    index.apply_sync(SyncResult("me", "101", full_sync=False), [])
+    assert index.generation() == first
+    index.apply_sync(
+        SyncResult("me", "102", full_sync=False, labels_removed={"m1": {"X"}}), []
+    )
+    assert index.generation() > first
+    assert index.reconcile_unread_counts() == {}
+    assert index.generation() == first + 1
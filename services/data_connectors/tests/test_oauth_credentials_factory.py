@@ -1,9 +1,14 @@
+import asyncio
 import json
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
 from gmail.oauth_credentials_factory import Credentials, OAuthCredentialsFactory
+from google.auth.exceptions import RefreshError
 
 TEST_SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 
@@ -201,12 +206,272 @@ def build_expired_unrefreshable_creds():
     return creds
 
 
+def test_get_creds_repeatedly_does_no_io(
+    tmp_path,
+    mock_creds_from_file,
+    mock_installed_app_flow,
+):
+    """
+    Scenario 5: Valid credentials are kept in memory between calls.
+    """
+    fake_valid_creds = Credentials(token="fake-valid-token")
+    token_path = tmp_path / "token.json"
+    token_path.write_text(fake_valid_creds.to_json())
+    mock_creds_from_file.return_value = fake_valid_creds
+    factory = OAuthCredentialsFactory(
+        credentials_path=str(tmp_path / "credentials.json"),
+        token_path=str(token_path),
+        scopes=TEST_SCOPES,
+    )
+    factory.get_credentials()
+
+    with (
+        patch("builtins.open") as mock_open,
+        patch("gmail.token_store.atomic_write") as mock_write,
+    ):
+        for _ in range(10):
+            assert factory.get_credentials() is fake_valid_creds
+
+    mock_creds_from_file.assert_called_once()
+    mock_open.assert_not_called()
+    mock_write.assert_not_called()
+
+
+def test_get_creds_does_not_rewrite_unchanged_token(
+    tmp_path,
+    mock_creds_from_file,
+    mock_installed_app_flow,
+):
+    """
+    Scenario 6: The token file is left alone when the token didn't change.
+    """
+    fake_valid_creds = Credentials(token="fake-valid-token")
+    token_path = tmp_path / "token.json"
+    token_path.write_text(fake_valid_creds.to_json())
+    mock_creds_from_file.return_value = fake_valid_creds
+
+    with patch("gmail.token_store.atomic_write") as mock_write:
+        OAuthCredentialsFactory(
+            credentials_path=str(tmp_path / "credentials.json"),
+            token_path=str(token_path),
+            scopes=TEST_SCOPES,
+        ).get_credentials()
+
+    mock_write.assert_not_called()
+
+
+def test_get_creds_refreshes_ahead_of_expiry(
+    tmp_path,
+    mock_creds_from_file,
+    mock_installed_app_flow,
+):
+    """
+    Scenario 7: A still-valid token within the refresh skew is refreshed.
+    """
+    creds = build_expired_refreshable_creds()
+    creds.token = "about-to-expire-token"
+    creds.expiry = utcnow() + timedelta(minutes=4, seconds=30)
+    assert creds.valid
+    token_path = tmp_path / "token.json"
+    token_path.write_text("token data")
+    mock_creds_from_file.return_value = creds
+
+    factory = OAuthCredentialsFactory(
+        credentials_path=str(tmp_path / "credentials.json"),
+        token_path=str(token_path),
+        scopes=TEST_SCOPES,
+        refresh_skew=timedelta(minutes=5),
+    )
+    factory.get_credentials()
+    factory.get_credentials()
+
+    creds.refresh.assert_called_once()
+    assert get_token_file_as_dict(token_path)["token"] == "refreshed-token"
+    # Written atomically: no temp files are left behind.
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "token.json",
+        "token.json.lock",
+    ]
+
+
+def test_get_creds_keeps_valid_token_when_early_refresh_fails(
+    tmp_path,
+    mock_creds_from_file,
+    mock_installed_app_flow,
+):
+    """
+    Scenario 8: A failed proactive refresh doesn't fail the caller.
+    """
+    creds = build_expired_refreshable_creds()
+    creds.token = "about-to-expire-token"
+    creds.expiry = utcnow() + timedelta(minutes=4, seconds=30)
+    creds.refresh.side_effect = RefreshError("token endpoint unavailable")
+    token_path = tmp_path / "token.json"
+    token_path.write_text("token data")
+    mock_creds_from_file.return_value = creds
+
+    result = OAuthCredentialsFactory(
+        credentials_path=str(tmp_path / "credentials.json"),
+        token_path=str(token_path),
+        scopes=TEST_SCOPES,
+    ).get_credentials()
+
+    assert result.token == "about-to-expire-token"
+    mock_installed_app_flow.from_client_secrets_file.assert_not_called()
+
+
+def test_concurrent_callers_share_one_refresh(
+    tmp_path,
+    mock_creds_from_file,
+    mock_installed_app_flow,
+):
+    """
+    Scenario 9: Threads racing on an expired token trigger a single refresh.
+    """
+    creds = build_expired_refreshable_creds()
+    refresh_side_effect = creds.refresh.side_effect
+
+    def slow_refresh(request):
+        time.sleep(0.05)
+        refresh_side_effect(request)
+
+    creds.refresh.side_effect = slow_refresh
+    token_path = tmp_path / "token.json"
+    token_path.write_text("expired token data")
+    mock_creds_from_file.return_value = creds
+    factory = OAuthCredentialsFactory(
+        credentials_path=str(tmp_path / "credentials.json"),
+        token_path=str(token_path),
+        scopes=TEST_SCOPES,
+    )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: factory.get_credentials(), range(8)))
+
+    assert all(result is creds for result in results)
+    creds.refresh.assert_called_once()
+    mock_creds_from_file.assert_called_once()
+
+
+def test_async_callers_share_one_refresh(
+    tmp_path,
+    mock_creds_from_file,
+    mock_installed_app_flow,
+):
+    """
+    Scenario 10: Coroutines racing on an expired token share one refresh.
+    """
+    creds = build_expired_refreshable_creds()
+    token_path = tmp_path / "token.json"
+    token_path.write_text("expired token data")
+    mock_creds_from_file.return_value = creds
+    factory = OAuthCredentialsFactory(
+        credentials_path=str(tmp_path / "credentials.json"),
+        token_path=str(token_path),
+        scopes=TEST_SCOPES,
+    )
+
+    async def run():
+        return await asyncio.gather(*(factory.aget_credentials() for _ in range(8)))
+
+    results = asyncio.run(run())
+
+    assert all(result.token == "refreshed-token" for result in results)
+    creds.refresh.assert_called_once()
+
+
+def test_token_near_expiry_is_refreshed_in_background(
+    tmp_path,
+    mock_creds_from_file,
+    mock_installed_app_flow,
+):
+    """
+    Scenario 11: Callers keep using a still-valid token while it refreshes.
+    """
+    creds = build_expired_refreshable_creds()
+    creds.token = "about-to-expire-token"
+    creds.expiry = utcnow() + timedelta(hours=1)
+    token_path = tmp_path / "token.json"
+    token_path.write_text("token data")
+    mock_creds_from_file.return_value = creds
+    factory = OAuthCredentialsFactory(
+        credentials_path=str(tmp_path / "credentials.json"),
+        token_path=str(token_path),
+        scopes=TEST_SCOPES,
+    )
+    factory.get_credentials()
+
+    release_refresh = threading.Event()
+    refresh_side_effect = creds.refresh.side_effect
+
+    def blocked_refresh(request):
+        assert release_refresh.wait(timeout=5)
+        refresh_side_effect(request)
+
+    creds.refresh.side_effect = blocked_refresh
+    creds.expiry = utcnow() + timedelta(minutes=4, seconds=30)
+
+    # Returns immediately, while the refresh waits in the background.
+    assert factory.get_credentials().token == "about-to-expire-token"
+    assert factory.get_credentials().token == "about-to-expire-token"
+
+    release_refresh.set()
+    deadline = time.monotonic() + 5
+    while get_token_file_as_dict(token_path).get("token") != "refreshed-token":
+        assert time.monotonic() < deadline, "token was not refreshed"
+        time.sleep(0.01)
+    creds.refresh.assert_called_once()
+
+
+def test_factory_picks_up_token_refreshed_by_another_process(
+    tmp_path, mock_installed_app_flow
+):
+    """
+    Scenario 12: A token refreshed by another process sharing the token file
+    is used instead of refreshing again.
+    """
+    token_path = tmp_path / "token.json"
+    token_path.write_text(build_authorized_user_json("first-token", hours=1))
+    factory = OAuthCredentialsFactory(
+        credentials_path=str(tmp_path / "credentials.json"),
+        token_path=str(token_path),
+        scopes=TEST_SCOPES,
+    )
+    creds = factory.get_credentials()
+    assert creds.token == "first-token"
+
+    # Time passes; another worker refreshes the shared token file.
+    creds.expiry = utcnow() - timedelta(minutes=1)
+    token_path.write_text(build_authorized_user_json("second-token", hours=1))
+
+    with patch.object(Credentials, "refresh") as mock_refresh:
+        assert factory.get_credentials().token == "second-token"
+
+    mock_refresh.assert_not_called()
+
+
+def build_authorized_user_json(token: str, hours: int) -> str:
+    return Credentials(
+        token=token,
+        refresh_token="fake-refresh-token",
+        token_uri="https://fake.token.uri",
+        client_id="fake-client-id",
+        client_secret="fake-client-secret",
+        expiry=utcnow() + timedelta(hours=hours),
+    ).to_json()
+
+
 # --- Helpers ---
 
 
 from pathlib import Path
 
 
+def utcnow() -> datetime:
+    """Naive UTC now, matching how google-auth stores expiry."""
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
 def get_token_file_as_dict(token_path: str | Path) -> dict:
     """Helper to read the token file as a dict."""
     with open(str(token_path)) as f:
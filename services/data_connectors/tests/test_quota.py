@@ -0,0 +1,204 @@
+import contextlib
+import threading
+import time
+
+import httplib2
+import pytest
+from gmail.quota import QuotaScheduler, interactive
+from googleapiclient.errors import HttpError
+
+
+def http_error(status, **headers):
+    return HttpError(httplib2.Response({"status": status, **headers}), b"")
+
+
+class Flaky:
+    """Fails with the given errors, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_token_bucket_paces_each_user():
+    quota = QuotaScheduler(units_per_second=200, burst_units=20)
+
+    start = time.monotonic()
+    for _ in range(10):
+        # 5 units each: 4 fit the burst, the other 30 units take 0.15s.
+        quota.execute("ana", "messages.get", lambda: None)
+    paced = time.monotonic() - start
+    start = time.monotonic()
+    quota.execute("ben", "messages.get", lambda: None)
+    other_user = time.monotonic() - start
+
+    assert paced >= 0.13
+    assert other_user < 0.05
+
+
+def test_calls_costing_more_than_a_burst_still_run():
+    quota = QuotaScheduler(units_per_second=1000, burst_units=10)
+
+    quota.execute("ana", "batch", lambda: None, units=500)
+    start = time.monotonic()
+    quota.execute("ana", "getProfile", lambda: None)
+
+    # The big call left the bucket in debt.
+    assert time.monotonic() - start >= 0.4
+
+
+def test_interactive_calls_go_first():
+    quota = QuotaScheduler(initial_concurrency=1, max_concurrency=1)
+    holding, release = threading.Event(), threading.Event()
+    order = []
+
+    def hold():
+        with quota.slot("ana", "messages.list"):
+            holding.set()
+            release.wait()
+
+    def call(name, priority):
+        with priority():
+            quota.execute("ana", "messages.get", lambda: order.append(name))
+
+    threads = [threading.Thread(target=hold)]
+    threads[0].start()
+    holding.wait()
+    for args in [("backfill", contextlib.nullcontext), ("user", interactive)]:
+        threads.append(threading.Thread(target=call, args=args))
+        threads[-1].start()
+        time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(1)
+
+    assert order == ["user", "backfill"]
+
+
+def test_a_slot_is_kept_for_interactive_calls():
+    quota = QuotaScheduler(initial_concurrency=2)
+    release = threading.Event()
+    started = threading.Event()
+
+    def background():
+        with quota.slot("ana", "messages.list"):
+            started.set()
+            release.wait()
+
+    thread = threading.Thread(target=background)
+    thread.start()
+    started.wait()
+    try:
+        with interactive():
+            start = time.monotonic()
+            quota.execute("ana", "messages.get", lambda: None)
+        assert time.monotonic() - start < 0.05
+        waiting = threading.Thread(
+            target=quota.execute, args=("ana", "messages.get", lambda: None)
+        )
+        waiting.start()
+        waiting.join(0.1)
+        assert waiting.is_alive()
+    finally:
+        release.set()
+    waiting.join(1)
+    thread.join(1)
+
+
+def test_throttling_halves_concurrency_and_backs_off():
+    quota = QuotaScheduler(initial_concurrency=8, backoff_seconds=0.1)
+    call = Flaky(http_error(429))
+
+    start = time.monotonic()
+    assert quota.execute("ana", "messages.list", call) == "ok"
+
+    assert call.calls == 2
+    assert time.monotonic() - start >= 0.05
+    # Halved, then grown by the success.
+    assert quota.concurrency_limit("ana") == pytest.approx(4.25)
+
+
+def test_retry_after_is_honored():
+    quota = QuotaScheduler(backoff_seconds=0.001)
+    call = Flaky(http_error(503, **{"retry-after": "0.2"}))
+
+    start = time.monotonic()
+    quota.execute("ana", "history.list", call)
+
+    assert time.monotonic() - start >= 0.2
+
+
+def test_successes_grow_concurrency_up_to_the_maximum():
+    quota = QuotaScheduler(initial_concurrency=2, max_concurrency=3)
+
+    for _ in range(20):
+        quota.execute("ana", "getProfile", lambda: None)
+
+    assert quota.concurrency_limit("ana") == 3
+
+
+def test_throttles_of_calls_already_in_flight_count_once():
+    quota = QuotaScheduler(initial_concurrency=8, backoff_seconds=0.001)
+    in_flight = [quota.slot("ana", "messages.get") for _ in range(4)]
+    for slot in in_flight:
+        slot.__enter__()
+
+    for slot in in_flight:
+        slot.__exit__(HttpError, http_error(429), None)
+
+    assert quota.concurrency_limit("ana") == 4
+
+
+def test_other_errors_are_not_retried():
+    quota = QuotaScheduler()
+    call = Flaky(http_error(404))
+
+    with pytest.raises(HttpError):
+        quota.execute("ana", "messages.get", call)
+
+    assert call.calls == 1
+    assert quota.concurrency_limit("ana") == 4
+
+
+def test_gives_up_after_max_retries():
+    quota = QuotaScheduler(max_retries=2, backoff_seconds=0.001)
+    call = Flaky(*[http_error(500)] * 5)
+
+    with pytest.raises(HttpError):
+        quota.execute("ana", "messages.list", call)
+
+    assert call.calls == 3
+
+
+def test_max_connections_caps_calls_across_users():
+    quota = QuotaScheduler(max_connections=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        with quota.slot("ana", "messages.list"):
+            started.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    started.wait()
+    other_user = threading.Thread(
+        target=quota.execute, args=("ben", "messages.get", lambda: None)
+    )
+    other_user.start()
+    other_user.join(0.1)
+    try:
+        assert other_user.is_alive()
+    finally:
+        release.set()
+    other_user.join(1)
+    thread.join(1)
+
+    assert not other_user.is_alive()
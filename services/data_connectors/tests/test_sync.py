@@ -0,0 +1,263 @@
+from unittest.mock import MagicMock
+
+import httplib2
+import pytest
+from gmail.checkpoints import (
+    FileCheckpointStore,
+    MemoryCheckpointStore,
+    SqliteCheckpointStore,
+)
+from gmail.quota import QuotaScheduler
+from gmail.sync import GmailSyncEngine
+from googleapiclient.errors import HttpError
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self._response = response
+
+    def execute(self):
+        if isinstance(self._response, Exception):
+            raise self._response
+        return self._response
+
+
+class FlakyRequest:
+    """Answers 429 once, then executes `request`."""
+
+    def __init__(self, request):
+        self._request = request
+        self._failed = False
+
+    def execute(self):
+        if not self._failed:
+            self._failed = True
+            raise HttpError(httplib2.Response({"status": 429}), b"")
+        return self._request.execute()
+
+
+class FakeGmailService:
+    """
+    A minimal stand-in for the Gmail API service: a mailbox of message
+    ids, a history log, and page-at-a-time list methods.
+    """
+
+    def __init__(self, message_ids, history_id, page_size=2):
+        self.message_ids = list(message_ids)
+        self.history_id = history_id
+        self.history_log = []
+        self.oldest_history_id = 0
+        self.page_size = page_size
+        self.calls = []
+
+    def record(self, **change):
+        self.history_id += 1
+        self.history_log.append({"id": str(self.history_id), **change})
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return FakeNamespace(list=self._list_messages)
+
+    def history(self):
+        return FakeNamespace(list=self._list_history)
+
+    def getProfile(self, userId, fields=None):
+        self.calls.append(("getProfile", {}))
+        return FakeRequest({"historyId": str(self.history_id)})
+
+    def _list_messages(self, userId, maxResults, pageToken, **kwargs):
+        self.calls.append(("messages.list", kwargs))
+        messages = [{"id": i} for i in self.message_ids]
+        return FakeRequest(self._page(messages, "messages", pageToken))
+
+    def _list_history(self, userId, maxResults, pageToken, startHistoryId, **kwargs):
+        self.calls.append(("history.list", {"startHistoryId": startHistoryId}))
+        if int(startHistoryId) < self.oldest_history_id:
+            return FakeRequest(HttpError(httplib2.Response({"status": 404}), b""))
+        records = [r for r in self.history_log if int(r["id"]) > int(startHistoryId)]
+        page = self._page(records, "history", pageToken)
+        page["historyId"] = str(self.history_id)
+        return FakeRequest(page)
+
+    def _page(self, items, key, page_token):
+        start = int(page_token) if page_token else 0
+        page = {key: items[start : start + self.page_size]}
+        if start + self.page_size < len(items):
+            page["nextPageToken"] = str(start + self.page_size)
+        return page
+
+
+class FakeNamespace:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+
+@pytest.fixture
+def gmail():
+    return FakeGmailService(["m1", "m2", "m3"], history_id=100)
+
+
+def build_engine(gmail, store=None):
+    return GmailSyncEngine(
+        credentials_factory=MagicMock(),
+        checkpoint_store=store if store else MemoryCheckpointStore(),
+        service=gmail,
+    )
+
+
+def test_first_sync_is_a_full_sync(gmail):
+    engine = build_engine(gmail)
+
+    result = engine.sync()
+
+    assert result.full_sync
+    assert result.added == {"m1", "m2", "m3"}
+    assert result.history_id == "100"
+    assert engine.checkpoint_store.load("me") == "100"
+
+
+def test_incremental_sync_only_fetches_changes(gmail):
+    engine = build_engine(gmail)
+    engine.sync()
+    gmail.calls.clear()
+
+    gmail.record(messagesAdded=[{"message": {"id": "m4"}}])
+    gmail.record(messagesDeleted=[{"message": {"id": "m1"}}])
+    gmail.record(labelsAdded=[{"message": {"id": "m2"}, "labelIds": ["STARRED"]}])
+    gmail.record(labelsRemoved=[{"message": {"id": "m3"}, "labelIds": ["UNREAD"]}])
+    result = engine.sync()
+
+    assert not result.full_sync
+    assert result.added == {"m4"}
+    assert result.deleted == {"m1"}
+    assert result.labels_added == {"m2": {"STARRED"}}
+    assert result.labels_removed == {"m3": {"UNREAD"}}
+    assert result.history_id == "104"
+    assert engine.checkpoint_store.load("me") == "104"
+    assert [name for name, _ in gmail.calls] == ["history.list", "history.list"]
+
+
+def test_incremental_sync_collapses_changes(gmail):
+    engine = build_engine(gmail)
+    engine.sync()
+
+    gmail.record(messagesAdded=[{"message": {"id": "m4"}}])
+    gmail.record(labelsAdded=[{"message": {"id": "m4"}, "labelIds": ["STARRED"]}])
+    gmail.record(messagesAdded=[{"message": {"id": "m5"}}])
+    gmail.record(messagesDeleted=[{"message": {"id": "m5"}}])
+    gmail.record(labelsAdded=[{"message": {"id": "m2"}, "labelIds": ["A", "B"]}])
+    gmail.record(labelsRemoved=[{"message": {"id": "m2"}, "labelIds": ["A"]}])
+    result = engine.sync()
+
+    assert result.added == {"m4"}
+    assert result.deleted == {"m5"}
+    assert result.labels_added == {"m2": {"B"}}
+    assert result.labels_removed == {"m2": {"A"}}
+
+
+def test_no_changes_keeps_checkpoint(gmail):
+    store = MagicMock(wraps=MemoryCheckpointStore())
+    engine = build_engine(gmail, store)
+    engine.sync()
+    store.save.reset_mock()
+
+    result = engine.sync()
+
+    assert not result.changed
+    store.save.assert_not_called()
+
+
+def test_expired_checkpoint_falls_back_to_full_sync(gmail):
+    engine = build_engine(gmail)
+    engine.sync()
+
+    gmail.record(messagesAdded=[{"message": {"id": "m4"}}])
+    gmail.message_ids.append("m4")
+    gmail.oldest_history_id = 101
+    result = engine.sync()
+
+    assert result.full_sync
+    assert result.added == {"m1", "m2", "m3", "m4"}
+    assert engine.checkpoint_store.load("me") == "101"
+
+
+def test_other_errors_are_raised(gmail):
+    engine = build_engine(gmail)
+    engine.sync()
+    error = HttpError(httplib2.Response({"status": 500}), b"")
+    gmail._list_history = lambda **kwargs: FakeRequest(error)
+
+    with pytest.raises(HttpError):
+        engine.sync()
+    assert engine.checkpoint_store.load("me") == "100"
+
+
+def test_throttled_requests_are_retried_with_a_quota(gmail):
+    engine = build_engine(gmail)
+    engine.quota = QuotaScheduler(backoff_seconds=0.001)
+    engine.sync()
+    gmail.record(messagesAdded=[{"message": {"id": "m4"}}])
+    list_history = gmail._list_history
+    gmail._list_history = lambda **kwargs: FlakyRequest(list_history(**kwargs))
+
+    result = engine.sync()
+
+    assert result.added == {"m4"}
+    assert engine.quota.concurrency_limit("me") < 4
+
+
+def test_label_filter_is_passed_to_gmail(gmail):
+    engine = build_engine(gmail)
+    engine.label_id = "INBOX"
+
+    engine.sync()
+    engine.sync()
+
+    assert gmail.calls[1] == (
+        "messages.list",
+        {"fields": "messages/id,nextPageToken", "labelIds": ["INBOX"]},
+    )
+
+
+@pytest.mark.parametrize(
+    "build_store",
+    [
+        lambda tmp_path: MemoryCheckpointStore(),
+        lambda tmp_path: FileCheckpointStore(str(tmp_path / "checkpoints.json")),
+        lambda tmp_path: SqliteCheckpointStore(str(tmp_path / "sync.db")),
+    ],
+    ids=["memory", "file", "sqlite"],
+)
+def test_checkpoint_stores(tmp_path, build_store):
+    store = build_store(tmp_path)
+    assert store.load("a@example.com") is None
+
+    store.save("a@example.com", "100")
+    store.save("b@example.com", "200")
+    store.save("a@example.com", "101")
+
+    assert store.load("a@example.com") == "101"
+    assert store.load("b@example.com") == "200"
+    store.clear("a@example.com")
+    assert store.load("a@example.com") is None
+    assert store.load("b@example.com") == "200"
+
+
+def test_failed_consumer_keeps_checkpoint(gmail):
+    engine = build_engine(gmail)
+    engine.sync()
+    gmail.record(messagesAdded=[{"message": {"id": "m4"}}])
+
+    def fail(result):
+        raise RuntimeError("indexing failed")
+
+    with pytest.raises(RuntimeError):
+        engine.sync(consumer=fail)
+    assert engine.checkpoint_store.load("me") == "100"
+
+    consumed = []
+    engine.sync(consumer=consumed.append)
+    assert consumed[0].added == {"m4"}
+    assert engine.checkpoint_store.load("me") == "101"
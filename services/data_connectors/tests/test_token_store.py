@@ -0,0 +1,215 @@
+import json
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from gmail.oauth_credentials_factory import OAuthCredentialsFactory
+from gmail.token_store import (
+    FileTokenStore,
+    InfisicalTokenStore,
+    MemoryTokenStore,
+    client_config_from_infisical,
+)
+from google.oauth2.credentials import Credentials
+from infisical_sdk.infisical_requests import APIError
+
+TEST_SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
+EXPIRY = datetime.now(UTC).replace(tzinfo=None, microsecond=0) + timedelta(hours=1)
+
+
+def test_memory_store_round_trip():
+    store = MemoryTokenStore()
+    assert store.load(TEST_SCOPES) is None
+
+    store.save(build_creds("token-1"))
+
+    assert store.load(TEST_SCOPES).token == "token-1"
+
+
+def test_load_if_changed_skips_the_token_last_seen():
+    store = MemoryTokenStore(build_creds("token-1").to_json())
+    assert store.load(TEST_SCOPES, if_changed=True).token == "token-1"
+    assert store.load(TEST_SCOPES, if_changed=True) is None
+
+    # Someone else stores a new token.
+    store._token_json = build_creds("token-2").to_json()
+
+    assert store.load(TEST_SCOPES, if_changed=True).token == "token-2"
+
+
+def test_file_store_writes_only_when_changed(tmp_path):
+    store = FileTokenStore(str(tmp_path / "token.json"))
+    creds = build_creds("token-1")
+
+    with patch("gmail.token_store.atomic_write") as mock_write:
+        store.save(creds)
+        store.save(creds)
+
+    mock_write.assert_called_once_with(str(tmp_path / "token.json"), creds.to_json())
+
+
+def test_file_store_round_trip(tmp_path):
+    store = FileTokenStore(str(tmp_path / "token.json"))
+    assert store.load(TEST_SCOPES) is None
+
+    with store.lock():
+        store.save(build_creds("token-1"))
+
+    assert FileTokenStore(store.token_path).load(TEST_SCOPES).token == "token-1"
+
+
+def test_infisical_store_reads_token_secret():
+    client = MagicMock()
+    client.uncached_secrets.get_secret_by_name.return_value = MagicMock(
+        secretValue=build_creds("token-1").to_json()
+    )
+    store = InfisicalTokenStore(client)
+
+    assert store.load(TEST_SCOPES).token == "token-1"
+    client.uncached_secrets.get_secret_by_name.assert_called_once_with(
+        secret_name="GMAIL_TOKEN_JSON"
+    )
+
+
+def test_infisical_store_treats_missing_secret_as_empty():
+    client = MagicMock()
+    client.uncached_secrets.get_secret_by_name.side_effect = APIError(
+        "Not found", 404, None
+    )
+
+    assert InfisicalTokenStore(client).load(TEST_SCOPES) is None
+
+
+def test_infisical_store_raises_other_errors():
+    client = MagicMock()
+    client.uncached_secrets.get_secret_by_name.side_effect = APIError(
+        "Forbidden", 403, None
+    )
+
+    with pytest.raises(APIError):
+        InfisicalTokenStore(client).load(TEST_SCOPES)
+
+
+def test_infisical_store_writes_back_only_when_changed():
+    client = MagicMock()
+    client.uncached_secrets.get_secret_by_name.return_value = MagicMock(
+        secretValue=build_creds("token-1").to_json()
+    )
+    store = InfisicalTokenStore(client, secret_name="TOKEN")
+
+    creds = store.load(TEST_SCOPES)
+    store.save(creds)
+    client.secrets.update_secret_by_name.assert_not_called()
+
+    store.save(build_creds("token-2"))
+    client.secrets.update_secret_by_name.assert_called_once_with(
+        current_secret_name="TOKEN", secret_value=build_creds("token-2").to_json()
+    )
+
+
+def test_infisical_store_creates_missing_secret():
+    client = MagicMock()
+    not_found = APIError("Not found", 404, None)
+    client.uncached_secrets.get_secret_by_name.side_effect = not_found
+    client.secrets.update_secret_by_name.side_effect = not_found
+    store = InfisicalTokenStore(client)
+
+    store.save(build_creds("token-1"))
+
+    client.secrets.create_secret_by_name.assert_called_once_with(
+        secret_name="GMAIL_TOKEN_JSON", secret_value=build_creds("token-1").to_json()
+    )
+
+
+def test_infisical_store_keeps_a_token_stored_by_someone_else():
+    client = MagicMock()
+    read = client.uncached_secrets.get_secret_by_name
+    read.return_value = MagicMock(secretValue=build_creds("token-1").to_json())
+    store = InfisicalTokenStore(client)
+    store.load(TEST_SCOPES)
+
+    # Another replica refreshes first.
+    read.return_value = MagicMock(secretValue=build_creds("token-2").to_json())
+    store.save(build_creds("token-3"))
+
+    client.secrets.update_secret_by_name.assert_not_called()
+    assert store.load(TEST_SCOPES, if_changed=True).token == "token-2"
+
+
+def test_infisical_store_reads_past_the_caches():
+    client = MagicMock()
+    client.uncached_secrets.get_secret_by_name.return_value = MagicMock(secretValue="")
+
+    assert InfisicalTokenStore(client).load(TEST_SCOPES) is None
+
+    client.uncached_secrets.get_secret_by_name.assert_called_once()
+    client.secrets.get_secret_by_name.assert_not_called()
+
+
+def test_client_config_from_infisical():
+    client = MagicMock()
+    client.secrets.get_secret_by_name.return_value = MagicMock(
+        secretValue='{"installed": {"client_id": "id"}}'
+    )
+
+    assert client_config_from_infisical(client) == {"installed": {"client_id": "id"}}
+    client.secrets.get_secret_by_name.assert_called_once_with(
+        secret_name="OAUTH_CLIENT_SECRET_JSON"
+    )
+
+
+def test_factory_with_memory_store_does_no_disk_io(tmp_path, monkeypatch):
+    """A stateless factory starts with a stored token and touches no files."""
+    monkeypatch.chdir(tmp_path)
+    store = MemoryTokenStore(build_creds("token-1").to_json())
+    factory = OAuthCredentialsFactory(
+        scopes=TEST_SCOPES, token_store=store, interactive=False
+    )
+
+    with patch("builtins.open") as mock_open:
+        assert factory.get_credentials().token == "token-1"
+
+    mock_open.assert_not_called()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_factory_without_token_fails_when_not_interactive():
+    factory = OAuthCredentialsFactory(
+        scopes=TEST_SCOPES, token_store=MemoryTokenStore(), interactive=False
+    )
+
+    with pytest.raises(RuntimeError, match="interactive OAuth flow is disabled"):
+        factory.get_credentials()
+
+
+def test_factory_uses_client_config_for_oauth_flow():
+    client_config = {"installed": {"client_id": "id"}}
+    store = MemoryTokenStore()
+    factory = OAuthCredentialsFactory(
+        scopes=TEST_SCOPES, token_store=store, client_config=client_config
+    )
+
+    with patch("gmail.oauth_credentials_factory.InstalledAppFlow") as mock_flow:
+        mock_flow.from_client_config.return_value.run_local_server.return_value = (
+            build_creds("token-1")
+        )
+        factory.get_credentials()
+
+    mock_flow.from_client_config.assert_called_once_with(client_config, TEST_SCOPES)
+    mock_flow.from_client_secrets_file.assert_not_called()
+    assert json.loads(store._token_json)["token"] == "token-1"
+
+
+# --- Helpers ---
+
+
+def build_creds(token: str) -> Credentials:
+    return Credentials(
+        token=token,
+        refresh_token="fake-refresh-token",
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="fake-client-id",
+        client_secret="fake-client-secret",
+        scopes=TEST_SCOPES,
+        expiry=EXPIRY,
+    )
@@ -1,13 +1,246 @@
+import functools
+from datetime import UTC, datetime
+
+from common.instrumentation import (
+    PROMETHEUS_CONTENT_TYPE,
+    render_prometheus,
+    set_enabled,
+)
 from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from gmail.message_index import (
+    IndexedMessage,
+    MessageIndex,
+    index_generation,
+    indexed_accounts,
+)
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings
+from starlette.requests import Request
+from starlette.responses import Response
+from tool_runner import ToolRunner
+
+# The category web_ui counts school emails under; see its
+# GMAIL_CATEGORY_LABELS setting.
+SCHOOL_CATEGORY = "school"
+
+# The most emails a tool returns at once.
+MAX_PAGE_SIZE = 50
+
+# Backends that tools call, limited separately.
+INDEX_BACKEND = "index"
+
+
+class McpSettings(BaseSettings):
+    # The local message index that web_ui keeps in sync with Gmail.
+    GMAIL_INDEX_DB: str = "gmail_index.db"
+
+    # Seconds that tool results are cached for, unless a sync changes the
+    # index first.
+    MCP_CACHE_TTL: float = 30.0
+    # Tool calls reading the message index at the same time.
+    MCP_INDEX_CONCURRENCY: int = 8
+
+    # Record timings and counts for /metrics. Off, they cost next to nothing.
+    METRICS_ENABLED: bool = True
+
+
+class NewEmailCount(BaseModel):
+    count: int
+    # When the least recently synced account was synced; None if an
+    # account never was, or there are no accounts.
+    as_of: datetime | None
+    # Seconds since `as_of`.
+    stale_seconds: float | None
+
+
+class Email(BaseModel):
+    id: str
+    thread_id: str | None
+    sender: str | None
+    sender_name: str | None
+    subject: str | None
+    snippet: str | None
+    date: datetime
+    labels: list[str]
+
+    @classmethod
+    def from_indexed(cls, message: IndexedMessage) -> "Email":
+        return cls(
+            id=message.id,
+            thread_id=message.thread_id,
+            sender=message.sender,
+            sender_name=message.sender_name,
+            subject=message.subject,
+            snippet=message.snippet,
+            date=message.date,
+            labels=sorted(message.labels),
+        )
+
+
+class EmailPage(BaseModel):
+    emails: list[Email]
+    # Pass as `cursor` to get the next page; None on the last page.
+    next_cursor: str | None
+
 
 mcp = FastMCP()
 
 
+@functools.cache
+def _settings() -> McpSettings:
+    settings = McpSettings()
+    # Here rather than under __main__, so it also applies when the server
+    # is started by `fastmcp run` or imported.
+    set_enabled(settings.METRICS_ENABLED)
+    return settings
+
+
+@functools.cache
+def _index(account: str) -> MessageIndex:
+    # Cached per account, so only call it with accounts in the index.
+    return MessageIndex(_settings().GMAIL_INDEX_DB, account=account)
+
+
+def _generation() -> int:
+    return index_generation(_settings().GMAIL_INDEX_DB)
+
+
+@functools.cache
+def _runner() -> ToolRunner:
+    settings = _settings()
+    return ToolRunner(
+        {INDEX_BACKEND: settings.MCP_INDEX_CONCURRENCY},
+        ttl=settings.MCP_CACHE_TTL,
+        generation=_generation,
+    )
+
+
+def count_new_emails(category: str) -> NewEmailCount:
+    """
+    Sums the unread counters of every account in the message index, which
+    sync keeps up to date, so this never scans messages or calls Gmail.
+    """
+    counts = [_index(account).unread_count(category) for account in list_accounts()]
+    synced = [count.synced_at for count in counts]
+    as_of = min(synced) if synced and None not in synced else None
+    return NewEmailCount(
+        count=sum(count.unread for count in counts),
+        as_of=as_of,
+        stale_seconds=(datetime.now(UTC) - as_of).total_seconds() if as_of else None,
+    )
+
+
+def list_accounts() -> list[str]:
+    return indexed_accounts(_settings().GMAIL_INDEX_DB)
+
+
+def search_index(
+    account: str | None,
+    text: str | None,
+    sender: str | None,
+    label: str | None,
+    since: datetime | None,
+    limit: int,
+    cursor: str | None,
+) -> EmailPage:
+    """
+    Searches one account's messages in the index.
+
+    Raises:
+        ToolError: If `account` is not given and there is more than one,
+                   `account` is not synced, or the cursor is invalid.
+    """
+    accounts = list_accounts()
+    if account is None:
+        if len(accounts) > 1:
+            raise ToolError(f"Several accounts are synced, choose one of {accounts}")
+        if not accounts:
+            return EmailPage(emails=[], next_cursor=None)
+        account = accounts[0]
+    elif account not in accounts:
+        # Never open (and cache) an index for an unknown account.
+        raise ToolError(f"Unknown account {account!r}, choose one of {accounts}")
+    try:
+        page = _index(account).query(
+            text=text,
+            sender=sender,
+            label=label,
+            since=since,
+            limit=max(1, min(limit, MAX_PAGE_SIZE)),
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise ToolError(str(e)) from e
+    return EmailPage(
+        emails=[Email.from_indexed(message) for message in page.messages],
+        next_cursor=page.next_cursor,
+    )
+
+
+@mcp.tool()
+async def get_num_new_school_emails() -> NewEmailCount:
+    """
+    Gets the number of new (unread) school-related emails, as of the last
+    sync with Gmail. `stale_seconds` is how long ago that was.
+    """
+    return await _runner().run(
+        "get_num_new_school_emails",
+        INDEX_BACKEND,
+        count_new_emails,
+        category=SCHOOL_CATEGORY,
+    )
+
+
+@mcp.tool()
+async def get_email_accounts() -> list[str]:
+    """Gets the email addresses of the family's synced Gmail accounts."""
+    return await _runner().run("get_email_accounts", INDEX_BACKEND, list_accounts)
+
+
 @mcp.tool()
-def get_num_new_school_emails() -> int:
-    """Gets the number of new school-reated emails."""
-    return 0
+async def search_emails(
+    text: str | None = None,
+    sender: str | None = None,
+    label: str | None = None,
+    since: datetime | None = None,
+    account: str | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> EmailPage:
+    """
+    Searches emails, newest first, one page at a time.
+
+    Args:
+        text: Words that must all appear in the subject, sender or body.
+        sender: The exact sender address.
+        label: A Gmail label id, e.g. "INBOX" or "UNREAD".
+        since: Only emails received at or after this time.
+        account: The email address of the account to search. Required when
+                 several accounts are synced; see get_email_accounts.
+        limit: The page size, at most 50.
+        cursor: `next_cursor` from the previous page, to get the next one.
+    """
+    return await _runner().run(
+        "search_emails",
+        INDEX_BACKEND,
+        search_index,
+        account=account,
+        text=text,
+        sender=sender,
+        label=label,
+        since=since,
+        limit=limit,
+        cursor=cursor,
+    )
+
+
+@mcp.custom_route("/metrics", methods=["GET"], include_in_schema=False)
+async def metrics(request: Request) -> Response:
+    """Serves tool, index and Gmail metrics to Prometheus."""
+    return Response(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 if __name__ == "__main__":
+    _settings()
     mcp.run()
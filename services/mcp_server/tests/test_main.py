@@ -0,0 +1,192 @@
+import asyncio
+import os.path
+
+import httpx
+import main
+import pytest
+from common.instrumentation import is_enabled, set_enabled
+from fastmcp import Client
+from fastmcp.exceptions import ToolError
+from gmail.message_index import MessageIndex, categorize_by_labels
+from gmail.sync import SyncResult
+
+SCHOOL = categorize_by_labels({"Label_1": "school"})
+
+
+def gmail_message(message_id, labels, subject="Hello", date=0):
+    return {
+        "id": message_id,
+        "labelIds": labels,
+        "internalDate": str(date),
+        "payload": {"headers": [{"name": "Subject", "value": subject}]},
+    }
+
+
+@pytest.fixture
+def index_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.db")
+    monkeypatch.setenv("GMAIL_INDEX_DB", path)
+    clear_caches()
+    yield path
+    clear_caches()
+
+
+def clear_caches():
+    main._settings.cache_clear()
+    main._index.cache_clear()
+    main._runner.cache_clear()
+
+
+def sync(path, account, messages, full_sync=True):
+    index = MessageIndex(path, account=account, categorize=SCHOOL)
+    index.apply_sync(
+        SyncResult(
+            account, "1", full_sync=full_sync, added={m["id"] for m in messages}
+        ),
+        messages,
+    )
+    index.close()
+
+
+async def call_tool(name, **arguments):
+    async with Client(main.mcp) as client:
+        return (await client.call_tool(name, arguments)).structured_content
+
+
+def test_counts_unread_school_emails_of_every_account(index_db):
+    sync(
+        index_db,
+        "alice@example.com",
+        [
+            gmail_message("m1", ["UNREAD", "Label_1"]),
+            gmail_message("m2", ["Label_1"]),
+            gmail_message("m3", ["UNREAD"]),
+        ],
+    )
+    sync(index_db, "bob@example.com", [gmail_message("m1", ["UNREAD", "Label_1"])])
+
+    count = main.count_new_emails("school")
+
+    assert count.count == 2
+    assert 0 <= count.stale_seconds < 60
+
+
+def test_no_index_yet(index_db):
+    count = main.count_new_emails("school")
+
+    assert count.count == 0
+    assert count.as_of is None
+    assert main._generation() == 0
+    assert not os.path.exists(index_db)
+
+
+def test_only_synced_accounts_are_opened(index_db):
+    sync(index_db, "alice@example.com", [gmail_message("m1", ["UNREAD", "Label_1"])])
+
+    assert main.count_new_emails("school").count == 1
+    assert main._generation() > 0
+    assert main._index.cache_info().currsize == 1
+
+
+def test_tool_reports_staleness(index_db):
+    sync(index_db, "alice@example.com", [gmail_message("m1", ["UNREAD", "Label_1"])])
+
+    result = asyncio.run(call_tool("get_num_new_school_emails"))
+
+    assert result["count"] == 1
+    assert result["as_of"] is not None
+
+
+def test_search_emails_pages_through_results(index_db):
+    sync(
+        index_db,
+        "alice@example.com",
+        [gmail_message(f"m{i}", ["INBOX"], date=i) for i in range(5)],
+    )
+
+    async def search_all():
+        ids, cursor = [], None
+        while True:
+            page = await call_tool("search_emails", limit=2, cursor=cursor)
+            ids.extend(email["id"] for email in page["emails"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return ids
+
+    assert asyncio.run(search_all()) == ["m4", "m3", "m2", "m1", "m0"]
+
+
+def test_search_emails_needs_an_account_when_there_are_several(index_db):
+    sync(index_db, "alice@example.com", [gmail_message("m1", ["INBOX"], "Recess")])
+    sync(index_db, "bob@example.com", [gmail_message("m2", ["INBOX"], "Recess")])
+
+    async def main_():
+        with pytest.raises(ToolError, match="Several accounts"):
+            await call_tool("search_emails", text="recess")
+        return await call_tool(
+            "search_emails", text="recess", account="bob@example.com"
+        )
+
+    assert [email["id"] for email in asyncio.run(main_())["emails"]] == ["m2"]
+
+
+def test_search_emails_rejects_unknown_accounts(index_db):
+    sync(index_db, "alice@example.com", [gmail_message("m1", ["INBOX"])])
+
+    with pytest.raises(ToolError, match="Unknown account"):
+        asyncio.run(call_tool("search_emails", account="mallory@example.com"))
+
+    assert main._index.cache_info().currsize == 0
+
+
+def test_search_emails_does_not_create_the_index(index_db):
+    with pytest.raises(ToolError, match="Unknown account"):
+        asyncio.run(call_tool("search_emails", account="alice@example.com"))
+
+    assert not os.path.exists(index_db)
+
+
+def test_sync_invalidates_cached_results(index_db):
+    sync(index_db, "alice@example.com", [gmail_message("m1", ["UNREAD", "Label_1"])])
+
+    async def count_twice():
+        first = await call_tool("get_num_new_school_emails")
+        sync(
+            index_db,
+            "alice@example.com",
+            [gmail_message("m2", ["UNREAD", "Label_1"])],
+            full_sync=False,
+        )
+        return first["count"], (await call_tool("get_num_new_school_emails"))["count"]
+
+    assert asyncio.run(count_twice()) == (1, 2)
+
+
+def test_metrics_endpoint(index_db):
+    sync(index_db, "alice@example.com", [gmail_message("m1", ["INBOX"])])
+
+    async def scrape():
+        await call_tool("get_email_accounts")
+        await call_tool("get_email_accounts")
+        transport = httpx.ASGITransport(app=main.mcp.http_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp") as c:
+            return await c.get("/metrics")
+
+    response = asyncio.run(scrape())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'mcp_tool_cache_total{tool="get_email_accounts",result="hit"}' in (
+        response.text
+    )
+    assert 'mcp_tool_seconds_count{tool="get_email_accounts"}' in response.text
+
+
+def test_metrics_can_be_disabled(index_db, monkeypatch):
+    monkeypatch.setenv("METRICS_ENABLED", "false")
+    clear_caches()
+    try:
+        asyncio.run(call_tool("get_email_accounts"))
+        assert not is_enabled()
+    finally:
+        set_enabled(True)
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+
+import pytest
+from tool_runner import ToolRunner
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Backend:
+    """Counts calls, and tracks how many run at once."""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self._delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, value=None):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        threading.Event().wait(self._delay)
+        with self._lock:
+            self.running -= 1
+        return value
+
+
+def test_results_are_cached_per_arguments_until_ttl():
+    clock = Clock()
+    runner = ToolRunner({"index": 1}, ttl=10, clock=clock)
+    backend = Backend()
+
+    async def main():
+        assert await runner.run("tool", "index", backend, value=1) == 1
+        assert await runner.run("tool", "index", backend, value=1) == 1
+        assert await runner.run("tool", "index", backend, value=2) == 2
+        assert await runner.run("other", "index", backend, value=1) == 1
+        clock.now = 11
+        await runner.run("tool", "index", backend, value=1)
+
+    asyncio.run(main())
+    assert backend.calls == 4
+    assert runner.hits == 1
+
+
+def test_generation_change_invalidates():
+    generation = [0]
+    runner = ToolRunner({"index": 1}, generation=lambda: generation[0])
+    backend = Backend()
+
+    async def main():
+        await runner.run("tool", "index", backend)
+        generation[0] += 1
+        await runner.run("tool", "index", backend)
+        await runner.run("tool", "index", backend)
+
+    asyncio.run(main())
+    assert backend.calls == 2
+
+
+def test_generation_is_read_off_the_event_loop():
+    threads = set()
+
+    def generation():
+        threads.add(threading.get_ident())
+        return 0
+
+    runner = ToolRunner({"index": 1}, generation=generation)
+
+    async def main():
+        await runner.run("tool", "index", Backend())
+        await runner.run("tool", "index", Backend())
+
+    asyncio.run(main())
+    assert threads and threading.get_ident() not in threads
+
+
+def test_concurrency_is_bounded_per_backend():
+    runner = ToolRunner({"index": 2, "gmail": 1}, ttl=0)
+    index, gmail = Backend(delay=0.05), Backend(delay=0.05)
+
+    async def main():
+        await asyncio.gather(
+            *(runner.run("search", "index", index, value=i) for i in range(6)),
+            *(runner.run("fetch", "gmail", gmail, value=i) for i in range(3)),
+        )
+
+    asyncio.run(main())
+    assert (index.calls, index.max_running) == (6, 2)
+    assert (gmail.calls, gmail.max_running) == (3, 1)
+
+
+def test_identical_concurrent_calls_share_one_backend_call():
+    runner = ToolRunner({"index": 4})
+    backend = Backend(delay=0.05)
+
+    async def main():
+        return await asyncio.gather(
+            *(runner.run("tool", "index", backend, value=7) for _ in range(5))
+        )
+
+    assert asyncio.run(main()) == [7] * 5
+    assert backend.calls == 1
+
+
+def test_failures_are_not_cached():
+    runner = ToolRunner({"index": 1})
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("backend down")
+        return "ok"
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await runner.run("tool", "index", flaky)
+        return await runner.run("tool", "index", flaky)
+
+    assert asyncio.run(main()) == "ok"
+
+
+def test_least_recently_used_results_are_evicted():
+    runner = ToolRunner({"index": 1}, max_entries=2)
+    backend = Backend()
+
+    async def main():
+        for value in [1, 2, 1, 3, 1, 2]:
+            await runner.run("tool", "index", backend, value=value)
+
+    asyncio.run(main())
+    # 1, 2 and 3 miss; then 2 was evicted by 3, as 1 was used more recently.
+    assert backend.calls == 4
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown backend"):
+        asyncio.run(ToolRunner({"index": 1}).run("tool", "llm", Backend()))
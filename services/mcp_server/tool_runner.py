@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from common.instrumentation import REGISTRY
+
+T = TypeVar("T")
+
+TOOL_SECONDS = REGISTRY.histogram(
+    "mcp_tool_seconds", "MCP tool runs, including cache hits, by tool.", ["tool"]
+)
+TOOL_CACHE = REGISTRY.counter(
+    "mcp_tool_cache_total",
+    "MCP tool runs served from the cache (hit) or the backend (miss).",
+    ["tool", "result"],
+)
+TOOL_ERRORS = REGISTRY.counter(
+    "mcp_tool_errors_total", "MCP tool runs that raised, by tool.", ["tool"]
+)
+
+
+@dataclass
+class _Entry:
+    expires_at: float
+    generation: int
+    value: Any
+
+
+class ToolRunner:
+    """
+    Runs the blocking backend calls behind MCP tools, so a slow backend
+    never blocks the event loop or other tools.
+
+    - Calls run in worker threads, at most `limits[backend]` at a time per
+      backend, so one busy backend cannot use up every thread.
+    - Results are cached for `ttl` seconds, keyed on the tool name and its
+      arguments, and dropped as soon as `generation()` changes, e.g. when a
+      sync changes the message index.
+    - Identical calls made while one is running share its result.
+
+        runner = ToolRunner({"index": 8}, generation=index.generation)
+        page = await runner.run("search_emails", "index", search, text="recess")
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, int],
+        ttl: float = 30.0,
+        max_entries: int = 1024,
+        generation: Callable[[], int] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            limits: The maximum concurrent calls, by backend name.
+            ttl: How long results are cached, in seconds. 0 disables caching.
+            max_entries: The most results kept; the least recently used go
+                         first.
+            generation: Returns a number that changes when the backends'
+                        data does. Called in a worker thread on every run,
+                        so it may block, but should be quick.
+            clock: Returns the current time in seconds. For tests.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._limits = dict(limits)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._generation = generation if generation else lambda: 0
+        self._clock = clock
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[Any]] = {}
+
+    async def run(
+        self, tool: str, backend: str, fn: Callable[..., T], /, **kwargs: Any
+    ) -> T:
+        """
+        Returns `fn(**kwargs)`, from the cache if possible.
+
+        Raises:
+            ValueError: If `backend` has no limit.
+            Exception: Whatever `fn` raises. Failures are not cached.
+        """
+        if backend not in self._limits:
+            raise ValueError(f"Unknown backend: {backend}")
+        with TOOL_SECONDS.labels(tool).time():
+            try:
+                return await self._run(tool, backend, fn, kwargs)
+            except Exception:
+                TOOL_ERRORS.labels(tool).inc()
+                raise
+
+    def invalidate(self) -> None:
+        """Drops every cached result."""
+        self._cache.clear()
+
+    async def _run(
+        self, tool: str, backend: str, fn: Callable[..., T], kwargs: dict[str, Any]
+    ) -> T:
+        key = json.dumps([tool, kwargs], sort_keys=True, default=str)
+        generation = await asyncio.to_thread(self._generation)
+        entry = self._cache.get(key)
+        if entry is not None:
+            if entry.generation == generation and entry.expires_at > self._clock():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                TOOL_CACHE.labels(tool, "hit").inc()
+                return entry.value
+            del self._cache[key]
+        self.misses += 1
+        TOOL_CACHE.labels(tool, "miss").inc()
+
+        # Calls started before a change are not shared with calls after it.
+        inflight_key = f"{generation}:{key}"
+        task = self._inflight.get(inflight_key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._call(key, generation, backend, fn, kwargs)
+            )
+            self._inflight[inflight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+        # A caller giving up must not cancel the call for the others.
+        return await asyncio.shield(task)
+
+    async def _call(
+        self,
+        key: str,
+        generation: int,
+        backend: str,
+        fn: Callable[..., T],
+        kwargs: dict[str, Any],
+    ) -> T:
+        semaphore = self._semaphores.get(backend)
+        if semaphore is None:
+            semaphore = self._semaphores[backend] = asyncio.Semaphore(
+                self._limits[backend]
+            )
+        async with semaphore:
+            value = await asyncio.to_thread(fn, **kwargs)
+        if self.ttl > 0:
+            # Tagged with the generation from before the call, so a result
+            # that raced with a change is not served after it.
+            self._cache[key] = _Entry(self._clock() + self.ttl, generation, value)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return value
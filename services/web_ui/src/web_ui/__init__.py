@@ -0,0 +1 @@
+# Python package for "web_ui" module.
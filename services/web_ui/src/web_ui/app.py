@@ -0,0 +1,81 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from common.instrumentation import set_enabled
+from fastapi import FastAPI
+from langchain_core.language_models import BaseChatModel
+
+from . import chat, gmail_push, metrics
+from .chat import ChatStreams, load_chat_model
+from .gmail_push import GmailPushDispatcher, SyncHandler
+from .gmail_sync import GmailSyncRunner
+from .settings import WebUiSettings
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(
+    settings: WebUiSettings | None = None,
+    sync_handler: SyncHandler | None = None,
+    chat_model: BaseChatModel | None = None,
+) -> FastAPI:
+    """
+    Builds the web_ui application. Serve it with
+
+        uvicorn --factory web_ui.app:create_app
+
+    Args:
+        settings: An optional, pre-loaded WebUiSettings instance.
+        sync_handler: Syncs an account after a Gmail push. Defaults to a
+                      GmailSyncRunner configured from `settings`.
+        chat_model: Answers chats. Defaults to settings.CHAT_MODEL.
+    """
+    settings = settings if settings else WebUiSettings()
+    set_enabled(settings.METRICS_ENABLED)
+    if settings.GMAIL_PUSH_TOKEN is None:
+        logger.warning("GMAIL_PUSH_TOKEN is not set; refusing every Gmail push")
+    runner = None
+    if sync_handler is None:
+        sync_handler = runner = GmailSyncRunner(settings)
+
+    dispatcher = GmailPushDispatcher(
+        sync_handler,
+        max_queue_size=settings.GMAIL_PUSH_MAX_QUEUE,
+        workers=settings.GMAIL_PUSH_WORKERS,
+    )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        if runner is None:
+            async with dispatcher:
+                yield
+            return
+        try:
+            async with dispatcher:
+                reconcile = asyncio.create_task(
+                    runner.reconcile_periodically(settings.GMAIL_RECONCILE_INTERVAL)
+                )
+                try:
+                    yield
+                finally:
+                    reconcile.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await reconcile
+        finally:
+            # Once the dispatcher is drained, nothing submits syncs anymore.
+            await asyncio.to_thread(runner.close)
+
+    if chat_model is None and settings.CHAT_MODEL:
+        chat_model = load_chat_model(settings.CHAT_MODEL)
+
+    app = FastAPI(title="Family Attache", lifespan=lifespan)
+    app.state.settings = settings
+    app.state.gmail_push = dispatcher
+    app.state.chat_streams = ChatStreams(chat_model, settings.CHAT_MAX_STREAMS)
+    app.include_router(gmail_push.router)
+    app.include_router(chat.router)
+    app.include_router(metrics.router)
+    return app
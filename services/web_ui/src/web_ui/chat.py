@@ -0,0 +1,179 @@
+import json
+import logging
+from collections.abc import AsyncGenerator, Callable
+from contextlib import aclosing
+from typing import Any, Literal
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages.ai import UsageMetadata, add_usage
+from pydantic import BaseModel, Field
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+_MESSAGE_TYPES: dict[str, type[BaseMessage]] = {
+    "system": SystemMessage,
+    "user": HumanMessage,
+    "assistant": AIMessage,
+}
+
+
+class ChatMessage(BaseModel):
+    role: Literal["system", "user", "assistant"]
+    content: str
+
+
+class ChatRequest(BaseModel):
+    messages: list[ChatMessage] = Field(min_length=1)
+
+    def to_langchain(self) -> list[BaseMessage]:
+        return [_MESSAGE_TYPES[m.role](content=m.content) for m in self.messages]
+
+
+def load_chat_model(name: str) -> BaseChatModel:
+    """
+    Builds a chat model from a "<provider>:<model>" name, e.g.
+    "ollama:llama3.2" or "anthropic:claude-3-5-haiku-latest".
+    """
+    # Imported here, as it loads the provider integrations.
+    from langchain.chat_models import init_chat_model
+
+    return init_chat_model(name)
+
+
+class ChatStreams:
+    """
+    Counts the chat streams open at once. A stream holds a connection and a
+    model call for as long as the model generates, so beyond `max_streams`
+    new ones are refused rather than queued.
+    """
+
+    def __init__(self, model: BaseChatModel | None, max_streams: int = 8):
+        """
+        Args:
+            model: Answers the chats. None refuses every chat.
+            max_streams: The most streams open at once.
+        """
+        self.model = model
+        self.max_streams = max_streams
+        self.active = 0
+
+    def open(self, messages: list[BaseMessage]) -> "EventStreamResponse":
+        """
+        Starts streaming the model's answer to `messages`.
+
+        Raises:
+            HTTPException: 503 if there is no model or too many streams.
+        """
+        if self.model is None:
+            raise HTTPException(status_code=503, detail="No chat model configured")
+        if self.active >= self.max_streams:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many chats in progress",
+                headers={"Retry-After": "5"},
+            )
+        self.active += 1
+        return EventStreamResponse(
+            stream_events(self.model, messages), on_close=self._close
+        )
+
+    def _close(self) -> None:
+        self.active -= 1
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    Sends server-sent events as the body iterator yields them, one at a
+    time: the next event is only pulled once the previous one is handed to
+    the server, so a slow client slows the model stream down instead of
+    filling a buffer.
+
+    When the client disconnects, the body iterator is cancelled at once,
+    whatever ASGI version the server speaks, so a model that is still
+    thinking stops too.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(
+        self, content: AsyncGenerator[str, None], on_close: Callable[[], None]
+    ):
+        super().__init__(
+            content,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        self._events = content
+        self._on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            async with anyio.create_task_group() as task_group:
+
+                async def stream() -> None:
+                    await self.stream_response(send)
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(stream)
+                await self.listen_for_disconnect(receive)
+                logger.info("Chat client disconnected, stopping the stream")
+                task_group.cancel_scope.cancel()
+        finally:
+            # The iterator may be waiting at a `yield`, which cancelling
+            # does not reach; closing it ends the model stream.
+            with anyio.CancelScope(shield=True):
+                await self._events.aclose()
+            self._on_close()
+
+
+async def stream_events(
+    model: BaseChatModel, messages: list[BaseMessage]
+) -> AsyncGenerator[str, None]:
+    """
+    Streams a model's answer as server-sent events: a "token" event per
+    chunk of text, then "done" with the token usage, or "error".
+    """
+    usage: UsageMetadata | None = None
+    try:
+        # Closing the model stream on the way out, also when cancelled,
+        # stops the upstream call.
+        async with aclosing(model.astream(messages)) as chunks:
+            async for chunk in chunks:
+                if chunk.usage_metadata:
+                    usage = add_usage(usage, chunk.usage_metadata)
+                if chunk.text:
+                    yield _event("token", {"text": chunk.text})
+    except Exception:
+        logger.exception("The chat model failed")
+        yield _event("error", {"detail": "The model failed to answer"})
+        return
+    yield _event("done", {"usage": usage})
+
+
+def _event(name: str, data: dict[str, Any]) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+router = APIRouter()
+
+
+@router.post("/chat/stream")
+async def stream_chat(request: Request, chat: ChatRequest) -> StreamingResponse:
+    """
+    Streams the agent's answer to a chat as server-sent events, so text
+    shows up as soon as the model produces it:
+
+        event: token
+        data: {"text": "Picture day is"}
+
+        event: done
+        data: {"usage": {"input_tokens": 12, "output_tokens": 40, ...}}
+
+    Answers 503 when too many chats are in progress.
+    """
+    streams: ChatStreams = request.app.state.chat_streams
+    return streams.open(chat.to_langchain())
@@ -0,0 +1,281 @@
+import asyncio
+import base64
+import binascii
+import enum
+import json
+import logging
+import secrets
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, replace
+from typing import Any
+
+from fastapi import APIRouter, Body, HTTPException, Request, Response
+
+from .settings import WebUiSettings
+
+logger = logging.getLogger(__name__)
+
+SyncHandler = Callable[[str, int], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class PushNotification:
+    """A Gmail change notification, as delivered by Pub/Sub."""
+
+    email_address: str
+    history_id: int
+    message_id: str | None = None
+
+
+def decode_push_envelope(envelope: dict[str, Any]) -> PushNotification:
+    """
+    Decodes a Pub/Sub push request body carrying a Gmail notification.
+
+    Args:
+        envelope: The JSON body, {"message": {"data": ..., "messageId": ...},
+                  "subscription": ...}, where `data` is base64-encoded
+                  {"emailAddress": ..., "historyId": ...}.
+
+    Returns:
+        The notification.
+
+    Raises:
+        ValueError: If the envelope is malformed.
+    """
+    try:
+        message = envelope["message"]
+        data = json.loads(base64.b64decode(message["data"]))
+        return PushNotification(
+            email_address=str(data["emailAddress"]),
+            history_id=int(data["historyId"]),
+            message_id=message.get("messageId"),
+        )
+    except (KeyError, TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Malformed Gmail push envelope: {e}") from e
+
+
+class PushOutcome(enum.Enum):
+    QUEUED = "queued"
+    # Merged into a sync that is already queued or running.
+    COALESCED = "coalesced"
+    # Seen before, or already covered by a completed sync.
+    DUPLICATE = "duplicate"
+    # The queue is full; the push should be redelivered.
+    REJECTED = "rejected"
+
+
+@dataclass
+class PushStats:
+    received: int = 0
+    duplicates: int = 0
+    coalesced: int = 0
+    rejected: int = 0
+    syncs: int = 0
+    failures: int = 0
+
+
+@dataclass
+class _AccountState:
+    # The newest historyId notified, and the newest one a sync covered.
+    history_id: int = 0
+    synced_history_id: int = 0
+    queued: bool = False
+    running: bool = False
+
+
+class GmailPushDispatcher:
+    """
+    Turns a stream of Gmail push notifications into incremental syncs.
+
+    Notifications are deduplicated by (emailAddress, historyId), and a
+    burst of notifications for one account collapses into a single queued
+    sync. A notification arriving while its account is syncing schedules
+    one follow-up sync once the current one finishes. Syncs run on
+    `workers` tasks reading a bounded asyncio queue, which holds at most
+    one entry per account.
+
+        dispatcher = GmailPushDispatcher(sync_handler)
+        async with dispatcher:
+            dispatcher.submit(notification)
+    """
+
+    def __init__(
+        self,
+        sync_handler: SyncHandler,
+        max_queue_size: int = 100,
+        workers: int = 4,
+        dedupe_size: int = 4096,
+    ):
+        """
+        Initializes the dispatcher. Workers start with `start()`.
+
+        Args:
+            sync_handler: Called as `await sync_handler(email_address,
+                          history_id)` to sync an account up to (at least)
+                          `history_id`.
+            max_queue_size: Accounts that can wait for a sync at once.
+            workers: Syncs that can run at once.
+            dedupe_size: How many recent (emailAddress, historyId) pairs
+                         are remembered for deduplication.
+        """
+        self._sync_handler = sync_handler
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queue_size)
+        self._num_workers = workers
+        self._dedupe_size = dedupe_size
+        self._seen: OrderedDict[tuple[str, int], None] = OrderedDict()
+        self._accounts: dict[str, _AccountState] = {}
+        self._workers: list[asyncio.Task[None]] = []
+        self.stats = PushStats()
+
+    def submit(self, notification: PushNotification) -> PushOutcome:
+        """
+        Schedules a sync for the notification's account. Never blocks.
+
+        Returns:
+            What happened to the notification.
+        """
+        self.stats.received += 1
+        key = (notification.email_address, notification.history_id)
+        state = self._accounts.setdefault(notification.email_address, _AccountState())
+        if key in self._seen or notification.history_id <= state.synced_history_id:
+            self.stats.duplicates += 1
+            return PushOutcome.DUPLICATE
+        self._remember(key)
+
+        state.history_id = max(state.history_id, notification.history_id)
+        if state.queued or state.running:
+            # The worker re-queues the account after a running sync.
+            self.stats.coalesced += 1
+            return PushOutcome.COALESCED
+        try:
+            self._queue.put_nowait(notification.email_address)
+        except asyncio.QueueFull:
+            # Forget the push, so its redelivery isn't taken as a duplicate.
+            del self._seen[key]
+            self.stats.rejected += 1
+            return PushOutcome.REJECTED
+        state.queued = True
+        return PushOutcome.QUEUED
+
+    def start(self) -> None:
+        """Starts the sync workers on the running event loop."""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"gmail-sync-worker-{i}")
+            for i in range(self._num_workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stops the workers, cancelling any running syncs."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def join(self) -> None:
+        """Waits until every queued sync, including follow-ups, is done."""
+        await self._queue.join()
+
+    async def __aenter__(self) -> "GmailPushDispatcher":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+    def _remember(self, key: tuple[str, int]) -> None:
+        self._seen[key] = None
+        if len(self._seen) > self._dedupe_size:
+            self._seen.popitem(last=False)
+
+    async def _work(self) -> None:
+        while True:
+            account = await self._queue.get()
+            state = self._accounts[account]
+            state.queued = False
+            state.running = True
+            history_id = state.history_id
+            try:
+                await self._sync_handler(account, history_id)
+            except Exception:
+                # Not retried here: the next notification triggers a sync.
+                self.stats.failures += 1
+                logger.exception("Gmail sync for %s failed", account)
+            else:
+                self.stats.syncs += 1
+                state.synced_history_id = max(state.synced_history_id, history_id)
+            finally:
+                state.running = False
+                if state.history_id > history_id:
+                    # Notified while syncing; follow up before task_done(),
+                    # so join() also waits for it.
+                    self._requeue(account, state)
+                self._queue.task_done()
+
+    def _requeue(self, account: str, state: _AccountState) -> None:
+        try:
+            self._queue.put_nowait(account)
+        except asyncio.QueueFull:
+            logger.warning("Gmail sync queue full, dropping follow-up for %s", account)
+            return
+        state.queued = True
+
+
+def configured_account(settings: WebUiSettings, email_address: str) -> str | None:
+    """
+    Returns the GMAIL_ACCOUNTS entry matching `email_address`, ignoring
+    case, or None if there is none. Accounts are synced under that
+    spelling, so every casing of an address shares one token file.
+    """
+    email_address = email_address.lower()
+    for account in settings.GMAIL_ACCOUNTS:
+        if account.lower() == email_address:
+            return account
+    return None
+
+
+router = APIRouter()
+
+
+@router.post("/gmail/push", status_code=204)
+async def receive_gmail_push(
+    request: Request,
+    envelope: dict[str, Any] = Body(...),
+    token: str | None = None,
+) -> Response:
+    """
+    Receives Gmail notifications from a Pub/Sub push subscription.
+
+    Answers right away; the sync runs later on the dispatcher's workers.
+    Any 2xx acknowledges the message. When the sync queue is full, 429
+    makes Pub/Sub redeliver the message with backoff.
+
+    Pushes must carry the configured GMAIL_PUSH_TOKEN, and are only synced
+    for the addresses in GMAIL_ACCOUNTS.
+    """
+    settings = request.app.state.settings
+    expected_token = settings.GMAIL_PUSH_TOKEN
+    if expected_token is None or not secrets.compare_digest(
+        token or "", expected_token.get_secret_value()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid push token")
+
+    try:
+        notification = decode_push_envelope(envelope)
+    except ValueError:
+        # Redelivering a malformed message can't help; acknowledge it.
+        logger.warning("Dropping malformed Gmail push", exc_info=True)
+        return Response(status_code=204)
+    account = configured_account(settings, notification.email_address)
+    if account is None:
+        # Nor can redelivering a push for an account that isn't synced.
+        logger.warning("Dropping Gmail push for unknown account")
+        return Response(status_code=204)
+    notification = replace(notification, email_address=account)
+
+    dispatcher: GmailPushDispatcher = request.app.state.gmail_push
+    if dispatcher.submit(notification) is PushOutcome.REJECTED:
+        raise HTTPException(status_code=429, detail="Sync queue is full")
+    return Response(status_code=204)
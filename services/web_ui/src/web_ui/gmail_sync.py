@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os.path
+
+from gmail.accounts import AccountSyncOrchestrator
+from gmail.checkpoints import SqliteCheckpointStore
+from gmail.classifier import MessageClassifier
+from gmail.message_index import Categorizer, categorize_by_labels, indexed_accounts
+from gmail.quota import QuotaScheduler
+from gmail.token_store import FileTokenStore
+
+from .gmail_push import configured_account
+from .settings import WebUiSettings
+
+logger = logging.getLogger(__name__)
+
+GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
+
+
+class GmailSyncRunner:
+    """
+    The GmailPushDispatcher sync handler: syncs each account into the
+    local message index, on the AccountSyncOrchestrator's worker threads
+    so syncs never block the event loop.
+    """
+
+    def __init__(self, settings: WebUiSettings):
+        self.settings = settings
+        self.classifier: MessageClassifier | None = None
+        categorize: Categorizer
+        if settings.GMAIL_CLASSIFIER_RULES:
+            classifier = MessageClassifier.from_file(settings.GMAIL_CLASSIFIER_RULES)
+            classifier.start_watching()
+            categorize = self.classifier = classifier
+        else:
+            categorize = categorize_by_labels(settings.GMAIL_CATEGORY_LABELS)
+        self.orchestrator = AccountSyncOrchestrator(
+            token_store=lambda email_address: FileTokenStore(
+                os.path.join(settings.GMAIL_TOKEN_DIR, f"{email_address}.json")
+            ),
+            checkpoint_store=SqliteCheckpointStore(settings.GMAIL_SYNC_DB),
+            index_path=settings.GMAIL_INDEX_DB,
+            credentials_path=settings.GMAIL_CREDENTIALS_PATH,
+            scopes=GMAIL_SCOPES,
+            categorize=categorize,
+            max_workers=settings.GMAIL_PUSH_WORKERS,
+            quota=QuotaScheduler(
+                units_per_second=settings.GMAIL_QUOTA_UNITS_PER_SECOND,
+                max_concurrency=settings.GMAIL_MAX_CONCURRENCY,
+                max_connections=settings.GMAIL_MAX_CONNECTIONS,
+            ),
+        )
+
+    async def __call__(self, email_address: str, history_id: int) -> None:
+        # The address names the account's token file, so never take one
+        # that isn't configured.
+        account = configured_account(self.settings, email_address)
+        if account is None:
+            raise ValueError(f"Not a configured Gmail account: {email_address!r}")
+        email_address = account
+        result = await asyncio.wrap_future(self.orchestrator.submit(email_address))
+        logger.info(
+            "Synced %s to %s: %d added, %d deleted",
+            email_address,
+            result.history_id,
+            len(result.added),
+            len(result.deleted),
+        )
+
+    def close(self) -> None:
+        """
+        Waits for running syncs, drops queued ones, closes the indexes and
+        stops watching the classifier rules.
+        """
+        self.orchestrator.close()
+        if self.classifier is not None:
+            self.classifier.stop_watching()
+
+    async def reconcile(self) -> None:
+        """Corrects drift in the unread counters of every indexed account."""
+        accounts = await asyncio.to_thread(
+            indexed_accounts, self.settings.GMAIL_INDEX_DB
+        )
+        for email_address in accounts:
+            index = self.orchestrator.account(email_address).index
+            await asyncio.to_thread(index.reconcile_unread_counts)
+
+    async def reconcile_periodically(self, interval: float) -> None:
+        """Runs `reconcile()` every `interval` seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Reconciling the unread counters failed")
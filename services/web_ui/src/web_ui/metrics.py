@@ -0,0 +1,13 @@
+from common.instrumentation import PROMETHEUS_CONTENT_TYPE, render_prometheus
+from fastapi import APIRouter, Response
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    """
+    Serves the timings and counts recorded in this process (Gmail API
+    calls, token refreshes, Infisical calls) to Prometheus.
+    """
+    return Response(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,49 @@
+from pydantic import SecretStr
+from pydantic_settings import BaseSettings
+
+
+class WebUiSettings(BaseSettings):
+    # Pub/Sub push requests must carry `?token=<this value>`, as configured
+    # on the push subscription's endpoint URL. Without it, every push is
+    # refused.
+    GMAIL_PUSH_TOKEN: SecretStr | None = None
+    # The Gmail addresses synced. Pushes for any other address are
+    # acknowledged and dropped.
+    GMAIL_ACCOUNTS: list[str] = []
+
+    # Accounts waiting for a sync. Pushes beyond this are refused, so that
+    # Pub/Sub redelivers them later.
+    GMAIL_PUSH_MAX_QUEUE: int = 100
+    # Syncs running at the same time.
+    GMAIL_PUSH_WORKERS: int = 4
+
+    # Gmail OAuth client secrets, and one `<email address>.json` token per
+    # account in GMAIL_TOKEN_DIR.
+    GMAIL_CREDENTIALS_PATH: str = "credentials.json"
+    GMAIL_TOKEN_DIR: str = "."
+    # SQLite database holding the sync checkpoints.
+    GMAIL_SYNC_DB: str = "gmail_sync.db"
+    # SQLite database holding the local message index.
+    GMAIL_INDEX_DB: str = "gmail_index.db"
+    # Gmail label ids counted as a category, e.g. {"Label_12": "school"}.
+    GMAIL_CATEGORY_LABELS: dict[str, str] = {}
+    # Optional: A JSON file of classifier rules (see gmail.classifier), used
+    # instead of GMAIL_CATEGORY_LABELS. Changes are picked up while running.
+    GMAIL_CLASSIFIER_RULES: str | None = None
+    # Seconds between recounts of the unread counters, to correct drift.
+    GMAIL_RECONCILE_INTERVAL: float = 6 * 60 * 60
+    # Gmail quota units each account may use per second (Gmail allows 250),
+    # and the most requests in flight per account.
+    GMAIL_QUOTA_UNITS_PER_SECOND: float = 250.0
+    GMAIL_MAX_CONCURRENCY: int = 8
+    # The most Gmail requests in flight across all accounts.
+    GMAIL_MAX_CONNECTIONS: int = 16
+
+    # Optional: The chat model answering /chat/stream, as
+    # "<provider>:<model>", e.g. "ollama:llama3.2".
+    CHAT_MODEL: str | None = None
+    # Chats streaming at the same time; more are refused with 503.
+    CHAT_MAX_STREAMS: int = 8
+
+    # Record timings and counts for /metrics. Off, they cost next to nothing.
+    METRICS_ENABLED: bool = True
@@ -0,0 +1,240 @@
+import asyncio
+import json
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from web_ui.app import create_app
+from web_ui.settings import WebUiSettings
+
+CHAT = {"messages": [{"role": "user", "content": "When is picture day?"}]}
+
+
+class TokenModel(BaseChatModel):
+    """Streams the given tokens, reporting usage on the last chunk."""
+
+    tokens: list[str]
+
+    @property
+    def _llm_type(self):
+        return "token-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for token in self.tokens:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        usage = {"input_tokens": 5, "output_tokens": 4, "total_tokens": 9}
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="", usage_metadata=usage)
+        )
+
+
+class SlowStreamingModel(BaseChatModel):
+    """Streams numbered tokens forever, recording whether it was stopped."""
+
+    delay: float = 0.01
+    tokens_sent: int = 0
+    closed: bool = False
+    started: asyncio.Event | None = None
+
+    @property
+    def _llm_type(self):
+        return "slow-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        try:
+            while True:
+                if self.started is not None:
+                    self.started.set()
+                await asyncio.sleep(self.delay)
+                self.tokens_sent += 1
+                yield ChatGenerationChunk(
+                    message=AIMessageChunk(content=f"t{self.tokens_sent} ")
+                )
+        finally:
+            self.closed = True
+
+
+def make_app(model, **settings):
+    return create_app(
+        WebUiSettings(**settings), sync_handler=lambda *_: None, chat_model=model
+    )
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+async def post(app, payload):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://web-ui") as c:
+        return await c.post("/chat/stream", json=payload)
+
+
+class AsgiClient:
+    """Calls the app directly, to read events as they are sent and to hang up."""
+
+    def __init__(self, app, buffered=0):
+        self.app = app
+        # With `buffered` set, sends block once that many are unread, like
+        # a full socket buffer.
+        self.messages = asyncio.Queue(maxsize=buffered)
+        self.hang_up = asyncio.Event()
+
+    async def stream(self, payload):
+        body = json.dumps(payload).encode()
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await self.hang_up.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.4"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/chat/stream",
+            "raw_path": b"/chat/stream",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"content-type", b"application/json")],
+            "server": ("web-ui", 80),
+            "client": ("127.0.0.1", 1234),
+        }
+        await self.app(scope, receive, self.messages.put)
+
+    async def next_body(self):
+        while True:
+            message = await self.messages.get()
+            if message["type"] == "http.response.body":
+                return message["body"].decode()
+
+
+def test_streams_tokens_as_events():
+    model = TokenModel(tokens=["Picture", " day", " is", " Friday"])
+
+    response = asyncio.run(post(make_app(model), CHAT))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert tokens == ["Picture", " day", " is", " Friday"]
+    assert events[-1] == (
+        "done",
+        {"usage": {"input_tokens": 5, "output_tokens": 4, "total_tokens": 9}},
+    )
+
+
+def test_disconnect_stops_the_model():
+    model = SlowStreamingModel()
+    app = make_app(model)
+
+    async def main():
+        client = AsgiClient(app)
+        request = asyncio.create_task(client.stream(CHAT))
+        start = await client.messages.get()
+        assert start["status"] == 200
+        assert (await client.next_body()).startswith("event: token")
+        assert app.state.chat_streams.active == 1
+
+        client.hang_up.set()
+        await asyncio.wait_for(request, 1)
+
+        assert model.closed
+        sent = model.tokens_sent
+        await asyncio.sleep(0.05)
+        assert model.tokens_sent == sent
+        assert app.state.chat_streams.active == 0
+
+    asyncio.run(main())
+
+
+def test_slow_clients_slow_the_model_down():
+    model = SlowStreamingModel(delay=0.001)
+    app = make_app(model)
+
+    async def main():
+        client = AsgiClient(app, buffered=2)
+        request = asyncio.create_task(client.stream(CHAT))
+        await asyncio.sleep(0.1)
+
+        # Only what fits the buffer, and one event waiting to be sent.
+        assert model.tokens_sent <= 3
+        client.hang_up.set()
+        await asyncio.wait_for(request, 1)
+        assert model.closed
+
+    asyncio.run(main())
+
+
+def test_disconnect_while_the_model_is_thinking():
+    model = SlowStreamingModel(delay=60, started=asyncio.Event())
+    app = make_app(model)
+
+    async def main():
+        client = AsgiClient(app)
+        request = asyncio.create_task(client.stream(CHAT))
+        await model.started.wait()
+
+        client.hang_up.set()
+        await asyncio.wait_for(request, 1)
+
+        assert model.closed
+        assert model.tokens_sent == 0
+
+    asyncio.run(main())
+
+
+def test_concurrent_streams_are_bounded():
+    app = make_app(SlowStreamingModel(), CHAT_MAX_STREAMS=1)
+
+    async def main():
+        client = AsgiClient(app)
+        request = asyncio.create_task(client.stream(CHAT))
+        await client.next_body()
+
+        refused = await post(app, CHAT)
+        assert refused.status_code == 503
+        assert refused.headers["retry-after"] == "5"
+
+        client.hang_up.set()
+        await request
+        # The slot is free again.
+        assert app.state.chat_streams.active == 0
+
+    asyncio.run(main())
+
+
+def test_model_errors_end_the_stream():
+    model = GenericFakeChatModel(messages=iter([]))
+
+    response = asyncio.run(post(make_app(model), CHAT))
+
+    assert parse_events(response.text) == [
+        ("error", {"detail": "The model failed to answer"})
+    ]
+
+
+def test_requests_without_a_model_are_refused():
+    response = asyncio.run(post(make_app(None), CHAT))
+
+    assert response.status_code == 503
+    assert asyncio.run(post(make_app(None), {"messages": []})).status_code == 422
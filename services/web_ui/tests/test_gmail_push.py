@@ -0,0 +1,231 @@
+import asyncio
+import base64
+import itertools
+import json
+
+import httpx
+import pytest
+from pydantic import SecretStr
+from web_ui.app import create_app
+from web_ui.gmail_push import (
+    GmailPushDispatcher,
+    PushNotification,
+    PushOutcome,
+    decode_push_envelope,
+)
+from web_ui.settings import WebUiSettings
+
+ALICE = "alice@example.com"
+BOB = "bob@example.com"
+CAROL = "carol@example.com"
+TOKEN = "s3cret"
+
+
+def push_settings(**kwargs):
+    return WebUiSettings(
+        GMAIL_PUSH_TOKEN=SecretStr(TOKEN), GMAIL_ACCOUNTS=[ALICE, BOB, CAROL], **kwargs
+    )
+
+
+class FakePubSub:
+    """Posts Gmail notifications the way a Pub/Sub push subscription does."""
+
+    def __init__(
+        self, client: httpx.AsyncClient, path: str = f"/gmail/push?token={TOKEN}"
+    ):
+        self._client = client
+        self._path = path
+        self._message_ids = itertools.count(1)
+
+    async def push(self, email_address: str, history_id: int) -> httpx.Response:
+        data = json.dumps({"emailAddress": email_address, "historyId": history_id})
+        envelope = {
+            "message": {
+                "data": base64.b64encode(data.encode()).decode(),
+                "messageId": str(next(self._message_ids)),
+                "publishTime": "2026-01-01T00:00:00Z",
+            },
+            "subscription": "projects/family/subscriptions/gmail-push",
+        }
+        return await self._client.post(self._path, json=envelope)
+
+
+class RecordingSyncHandler:
+    """Records syncs; each one waits for `release` when it is set up to."""
+
+    def __init__(self, fail_for: set[str] | None = None):
+        self.calls: list[tuple[str, int]] = []
+        self.started = asyncio.Event()
+        self.release: asyncio.Event | None = None
+        self._fail_for = fail_for or set()
+
+    async def __call__(self, email_address: str, history_id: int) -> None:
+        self.calls.append((email_address, history_id))
+        self.started.set()
+        if self.release is not None:
+            await self.release.wait()
+        if email_address in self._fail_for:
+            raise RuntimeError("sync failed")
+
+
+def run_with_app(test, settings=None, handler=None):
+    """Runs `test(pubsub, dispatcher, handler)` against a running app."""
+    handler = handler if handler else RecordingSyncHandler()
+    app = create_app(
+        settings if settings else push_settings(GMAIL_PUSH_WORKERS=2),
+        sync_handler=handler,
+    )
+    dispatcher = app.state.gmail_push
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with (
+            dispatcher,
+            httpx.AsyncClient(transport=transport, base_url="http://web-ui") as client,
+        ):
+            await test(FakePubSub(client), dispatcher, handler)
+
+    asyncio.run(main())
+
+
+def test_push_is_acknowledged_and_synced():
+    async def test(pubsub, dispatcher, handler):
+        response = await pubsub.push(ALICE, 100)
+        assert response.status_code == 204
+
+        await dispatcher.join()
+        assert handler.calls == [(ALICE, 100)]
+
+    run_with_app(test)
+
+
+def test_redelivered_push_is_deduplicated():
+    async def test(pubsub, dispatcher, handler):
+        await pubsub.push(ALICE, 100)
+        await dispatcher.join()
+        assert (await pubsub.push(ALICE, 100)).status_code == 204
+        await pubsub.push(ALICE, 99)
+        await dispatcher.join()
+
+        assert handler.calls == [(ALICE, 100)]
+        assert dispatcher.stats.duplicates == 2
+
+    run_with_app(test)
+
+
+def test_burst_is_coalesced():
+    async def test(pubsub, dispatcher, handler):
+        handler.release = asyncio.Event()
+        await pubsub.push(ALICE, 100)
+        await handler.started.wait()
+
+        # Arrive while the first sync is running.
+        for history_id in range(101, 106):
+            await pubsub.push(ALICE, history_id)
+        await pubsub.push(BOB, 7)
+        handler.release.set()
+        await dispatcher.join()
+
+        assert sorted(handler.calls) == [(ALICE, 100), (ALICE, 105), (BOB, 7)]
+        # All five merged into one follow-up sync.
+        assert dispatcher.stats.coalesced == 5
+
+    run_with_app(test)
+
+
+def test_full_queue_asks_pubsub_to_redeliver():
+    async def test(pubsub, dispatcher, handler):
+        handler.release = asyncio.Event()
+        await pubsub.push(ALICE, 1)
+        await handler.started.wait()
+
+        assert (await pubsub.push(BOB, 1)).status_code == 204
+        assert (await pubsub.push(CAROL, 1)).status_code == 429
+
+        handler.release.set()
+        await dispatcher.join()
+        # The redelivery is not mistaken for a duplicate.
+        assert (await pubsub.push(CAROL, 1)).status_code == 204
+        await dispatcher.join()
+        assert len(handler.calls) == 3
+
+    settings = push_settings(GMAIL_PUSH_WORKERS=1, GMAIL_PUSH_MAX_QUEUE=1)
+    run_with_app(test, settings)
+
+
+def test_failed_sync_does_not_stop_workers():
+    async def test(pubsub, dispatcher, handler):
+        await pubsub.push(ALICE, 1)
+        await dispatcher.join()
+        await pubsub.push(BOB, 1)
+        await dispatcher.join()
+
+        assert handler.calls == [(ALICE, 1), (BOB, 1)]
+        assert dispatcher.stats.failures == 1
+        assert dispatcher.stats.syncs == 1
+
+    run_with_app(test, handler=RecordingSyncHandler(fail_for={ALICE}))
+
+
+def test_push_token_is_checked():
+    async def test(pubsub, dispatcher, handler):
+        pubsub._path = "/gmail/push?token=wrong"
+        assert (await pubsub.push(ALICE, 1)).status_code == 403
+        pubsub._path = "/gmail/push"
+        assert (await pubsub.push(ALICE, 1)).status_code == 403
+        assert dispatcher.stats.received == 0
+
+    run_with_app(test)
+
+
+def test_pushes_are_refused_without_a_token():
+    async def test(pubsub, dispatcher, handler):
+        assert (await pubsub.push(ALICE, 1)).status_code == 403
+        pubsub._path = "/gmail/push?token="
+        assert (await pubsub.push(ALICE, 1)).status_code == 403
+
+    run_with_app(test, WebUiSettings(GMAIL_ACCOUNTS=[ALICE]))
+
+
+def test_pushes_for_unknown_accounts_are_dropped():
+    async def test(pubsub, dispatcher, handler):
+        assert (await pubsub.push("../../etc/passwd", 1)).status_code == 204
+        assert (await pubsub.push("mallory@example.com", 1)).status_code == 204
+        assert (await pubsub.push(ALICE.upper(), 1)).status_code == 204
+        await dispatcher.join()
+
+        assert dispatcher.stats.received == 1
+        assert handler.calls == [(ALICE, 1)]
+
+    run_with_app(test)
+
+
+def test_malformed_push_is_acknowledged():
+    async def test(pubsub, dispatcher, handler):
+        response = await pubsub._client.post(
+            pubsub._path, json={"message": {"data": "not base64!"}}
+        )
+        assert response.status_code == 204
+        assert dispatcher.stats.received == 0
+
+    run_with_app(test)
+
+
+def test_decode_push_envelope():
+    data = base64.b64encode(b'{"emailAddress": "a@b.c", "historyId": "42"}')
+    envelope = {"message": {"data": data.decode(), "messageId": "m1"}}
+
+    assert decode_push_envelope(envelope) == PushNotification("a@b.c", 42, "m1")
+    with pytest.raises(ValueError, match="Malformed"):
+        decode_push_envelope({"message": {}})
+
+
+def test_dispatcher_outcomes():
+    async def main():
+        dispatcher = GmailPushDispatcher(RecordingSyncHandler(), max_queue_size=1)
+        assert dispatcher.submit(PushNotification(ALICE, 1)) is PushOutcome.QUEUED
+        assert dispatcher.submit(PushNotification(ALICE, 1)) is PushOutcome.DUPLICATE
+        assert dispatcher.submit(PushNotification(ALICE, 2)) is PushOutcome.COALESCED
+        assert dispatcher.submit(PushNotification(BOB, 1)) is PushOutcome.REJECTED
+
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import pytest
+from gmail.message_index import IndexedMessage, MessageIndex
+from gmail.sync import SyncResult
+from web_ui.app import create_app
+from web_ui.gmail_sync import GmailSyncRunner
+from web_ui.settings import WebUiSettings
+
+
+def test_reconcile_corrects_every_account(tmp_path):
+    settings = WebUiSettings(
+        GMAIL_SYNC_DB=str(tmp_path / "sync.db"),
+        GMAIL_INDEX_DB=str(tmp_path / "index.db"),
+        GMAIL_CATEGORY_LABELS={"Label_1": "school"},
+    )
+    for account in ["alice@example.com", "bob@example.com"]:
+        index = MessageIndex(settings.GMAIL_INDEX_DB, account=account)
+        index.apply_sync(SyncResult(account, "1", full_sync=False), [])
+        # Indexed before "Label_1" counted as school.
+        index.upsert([IndexedMessage("m1", labels=frozenset({"UNREAD", "Label_1"}))])
+        assert index.unread_count("school").unread == 0
+        index.close()
+
+    runner = GmailSyncRunner(settings)
+    asyncio.run(runner.reconcile())
+
+    for account in ["alice@example.com", "bob@example.com"]:
+        index = runner.orchestrator.account(account).index
+        assert index.unread_count("school").unread == 1
+
+
+def test_classifier_rules(tmp_path):
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"school": {"sender_domains": ["school.example"]}}))
+    settings = WebUiSettings(
+        GMAIL_SYNC_DB=str(tmp_path / "sync.db"),
+        GMAIL_INDEX_DB=str(tmp_path / "index.db"),
+        GMAIL_CLASSIFIER_RULES=str(rules),
+    )
+
+    runner = GmailSyncRunner(settings)
+    index = runner.orchestrator.account("alice@example.com").index
+    index.upsert(
+        [
+            IndexedMessage(
+                "m1", sender="office@school.example", labels=frozenset({"UNREAD"})
+            )
+        ]
+    )
+
+    assert index.unread_count("school").unread == 1
+    runner.close()
+
+
+def test_unknown_accounts_are_not_synced(tmp_path):
+    settings = WebUiSettings(
+        GMAIL_SYNC_DB=str(tmp_path / "sync.db"),
+        GMAIL_INDEX_DB=str(tmp_path / "index.db"),
+        GMAIL_ACCOUNTS=["alice@example.com"],
+    )
+    runner = GmailSyncRunner(settings)
+
+    with pytest.raises(ValueError):
+        asyncio.run(runner("../alice@example.com", 1))
+
+    assert runner.orchestrator.accounts() == []
+
+
+def test_accounts_are_synced_under_their_configured_spelling(tmp_path):
+    settings = WebUiSettings(
+        GMAIL_SYNC_DB=str(tmp_path / "sync.db"),
+        GMAIL_INDEX_DB=str(tmp_path / "index.db"),
+        GMAIL_TOKEN_DIR=str(tmp_path),
+        GMAIL_ACCOUNTS=["alice@example.com"],
+    )
+    runner = GmailSyncRunner(settings)
+
+    # There is no token to sync with, but the account is set up.
+    with pytest.raises(Exception):
+        asyncio.run(runner("Alice@Example.com", 1))
+
+    assert runner.orchestrator.accounts() == ["alice@example.com"]
+
+
+def test_app_closes_the_runner_on_shutdown(tmp_path):
+    rules = tmp_path / "rules.json"
+    rules.write_text(json.dumps({"school": {"keywords": ["homework"]}}))
+    app = create_app(
+        WebUiSettings(
+            GMAIL_SYNC_DB=str(tmp_path / "sync.db"),
+            GMAIL_INDEX_DB=str(tmp_path / "index.db"),
+            GMAIL_CLASSIFIER_RULES=str(rules),
+        )
+    )
+    runner = app.state.gmail_push._sync_handler
+    assert runner.classifier._watch_stop is not None
+
+    async def serve():
+        async with app.router.lifespan_context(app):
+            pass
+
+    asyncio.run(serve())
+
+    assert runner.classifier._watch_stop is None
+    with pytest.raises(RuntimeError):
+        runner.orchestrator.submit("alice@example.com")
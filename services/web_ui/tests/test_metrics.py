@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+from common.instrumentation import set_enabled
+from gmail.service import GMAIL_API_SECONDS, timed_call
+from web_ui.app import create_app
+from web_ui.settings import WebUiSettings
+
+
+async def scrape(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://web-ui") as c:
+        return await c.get("/metrics")
+
+
+def test_metrics_endpoint():
+    app = create_app(WebUiSettings(), sync_handler=lambda *_: None)
+    with timed_call("history.list"):
+        pass
+
+    response = asyncio.run(scrape(app))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE gmail_api_call_seconds histogram" in response.text
+    assert 'gmail_api_call_seconds_count{method="history.list"}' in response.text
+
+
+def test_metrics_can_be_disabled():
+    history_list = GMAIL_API_SECONDS.labels("history.list")
+    create_app(WebUiSettings(METRICS_ENABLED=False), sync_handler=lambda *_: None)
+    try:
+        before = history_list.count
+        with timed_call("history.list"):
+            pass
+        assert history_list.count == before
+    finally:
+        set_enabled(True)
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark for NamespaceWrapper attribute access and call overhead.
+
+Compares the current wrapper, which compiles each method wrapper once per
+instance, against the previous implementation, which rebuilt the wrapper
+on every attribute access.
+
+Run from shared/infisical:
+
+    PYTHONPATH=src python benchmarks/bench_namespace_wrapper.py
+"""
+
+import argparse
+import functools
+import inspect
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from common import instrumentation
+from common.client_utils import NamespaceWrapper
+
+
+class FakeSecrets:
+    def get_secret_by_name(
+        self,
+        secret_name: str,
+        environment_slug: str,
+        secret_path: str,
+        project_id: str | None = None,
+        project_slug: str | None = None,
+    ) -> str:
+        return secret_name
+
+
+INJECTED = frozenset(
+    {("project_id", "123"), ("environment_slug", "prod"), ("secret_path", "/")}
+)
+
+
+@functools.cache
+def _legacy_get_valid_params(target_callable: Callable) -> set[str]:
+    try:
+        return set(inspect.signature(target_callable).parameters.keys())
+    except (ValueError, TypeError):
+        return set()
+
+
+class LegacyNamespaceWrapper:
+    """The wrapper as it was before per-instance method caching."""
+
+    def __init__(self, wrapped_namespace: object, kwargs_to_inject: frozenset):
+        self._wrapped_namespace = wrapped_namespace
+        self._injected_kwargs = kwargs_to_inject
+
+    def __getattr__(self, name: str) -> Any:
+        target_attr = getattr(self._wrapped_namespace, name)
+        if not callable(target_attr):
+            return target_attr
+        valid_params = _legacy_get_valid_params(target_attr)
+        kwargs_to_inject = {
+            key: value for key, value in self._injected_kwargs if key in valid_params
+        }
+
+        @functools.wraps(target_attr)
+        def method_wrapper(*args, **call_kwargs):
+            return target_attr(*args, **{**kwargs_to_inject, **call_kwargs})
+
+        return method_wrapper
+
+
+def _time(stmt: Callable[[], Any], number: int, repeat: int) -> float:
+    """Best-of-`repeat` time per call, in nanoseconds."""
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    legacy = LegacyNamespaceWrapper(FakeSecrets(), INJECTED)
+    current = NamespaceWrapper(FakeSecrets(), INJECTED)
+    direct = FakeSecrets()
+
+    cases = {
+        "attribute access": {
+            "legacy": lambda: legacy.get_secret_by_name,
+            "current": lambda: current.get_secret_by_name,
+        },
+        "access + call": {
+            "direct (no wrapper)": lambda: direct.get_secret_by_name(
+                secret_name="DB_PASS",
+                project_id="123",
+                environment_slug="prod",
+                secret_path="/",
+            ),
+            "legacy": lambda: legacy.get_secret_by_name(secret_name="DB_PASS"),
+            "current": lambda: current.get_secret_by_name(secret_name="DB_PASS"),
+            "current, no metrics": lambda: current.get_secret_by_name(
+                secret_name="DB_PASS"
+            ),
+        },
+    }
+
+    for case, variants in cases.items():
+        print(f"{case}:")
+        for variant, stmt in variants.items():
+            instrumentation.set_enabled(not variant.endswith("no metrics"))
+            ns = _time(stmt, args.number, args.repeat)
+            print(f"  {variant:<20} {ns:8.1f} ns/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # common.client_utils module
 
+from .file_lock import atomic_write, file_lock
 from .wrapper import NamespaceWrapper
 
-__all__ = ["NamespaceWrapper"]
+__all__ = ["NamespaceWrapper", "atomic_write", "file_lock"]
@@ -0,0 +1,54 @@
+import contextlib
+import fcntl
+import os
+import tempfile
+from collections.abc import Iterator
+
+
+@contextlib.contextmanager
+def file_lock(path: str | os.PathLike[str]) -> Iterator[None]:
+    """
+    Holds an exclusive, cross-process advisory lock for the duration of
+    the `with` block.
+
+    The lock is taken on a sidecar file (`<path>.lock`) rather than on
+    `path` itself, so `path` can be atomically replaced while locked.
+
+    Args:
+        path: The file whose access should be serialized.
+    """
+    lock_path = f"{os.fspath(path)}.lock"
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock.
+        os.close(fd)
+
+
+def atomic_write(path: str | os.PathLike[str], data: str, mode: int = 0o600) -> None:
+    """
+    Writes `data` to `path` so readers see either the old or the new
+    contents, never a partial file.
+
+    Args:
+        path: The destination file.
+        data: The text to write.
+        mode: Permission bits for a newly created file.
+    """
+    path = os.fspath(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}."
+    )
+    try:
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "w") as tmp:
+            tmp.write(data)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
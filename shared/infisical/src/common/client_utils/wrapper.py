@@ -1,19 +1,27 @@
 import functools
 import inspect
 import logging
+import time
 from collections.abc import Callable
 from typing import Any
 
+from common.instrumentation import REGISTRY, is_enabled
+
 logger = logging.getLogger(__name__)
 
+_CALL_SECONDS = REGISTRY.histogram(
+    "namespace_wrapper_call_seconds",
+    "Calls through NamespaceWrapper, e.g. to the Infisical SDK.",
+    ["namespace", "method"],
+)
+
 
-@functools.cache
 def _get_valid_params(target_callable: Callable) -> set[str]:
     """
     Inspects a callable and returns a set of its parameter names.
 
-    Results are cached indefinitely so `inspect.signature` is only
-    called once per method.
+    Not cached globally: NamespaceWrapper calls this once per method name
+    and keeps the result with the wrapper, so nothing outlives it.
     """
     try:
         sig = inspect.signature(target_callable)
@@ -38,6 +46,11 @@ class NamespaceWrapper:
     - Arguments are only injected if the original method's
       signature actually accepts them.
     - Non-callable attributes (properties) are returned directly.
+
+    Method wrappers are built once per name, on first access, and stored
+    on the instance, so later accesses are plain attribute lookups that
+    never reach `__getattr__`. The cache is bounded by the namespace's
+    method names and is released together with the wrapper.
     """
 
     def __init__(
@@ -57,7 +70,8 @@ class NamespaceWrapper:
 
     def __getattr__(self, name: str) -> Any:
         """
-        Called when an attribute is accessed (e.g., .read_secret).
+        Called when an attribute is accessed (e.g., .read_secret) that
+        has not been wrapped yet.
 
         This is the core of the delegation and injection logic.
         """
@@ -80,6 +94,9 @@ class NamespaceWrapper:
             key: value for key, value in self._injected_kwargs if key in valid_params
         }
 
+        call = self._call
+        seconds = _CALL_SECONDS.labels(type(self._wrapped_namespace).__name__, name)
+
         # Return the wrapper function
         @functools.wraps(target_attr)
         def method_wrapper(*args, **call_kwargs):
@@ -96,7 +113,39 @@ class NamespaceWrapper:
             # with the user-provided arguments.
             final_kwargs = {**kwargs_to_inject, **call_kwargs}
 
-            # Call the original method with the final, merged args
-            return target_attr(*args, **final_kwargs)
-
+            # Call the original method with the final, merged args, timed
+            # inline: this is the hot path of every secret read.
+            if not is_enabled():
+                return call(name, target_attr, args, final_kwargs)
+            start = time.perf_counter()
+            try:
+                return call(name, target_attr, args, final_kwargs)
+            finally:
+                seconds.observe(time.perf_counter() - start)
+
+        # Cache the compiled wrapper on the instance: normal attribute lookup
+        # finds it from now on, skipping the signature and kwargs work above.
+        self.__dict__[name] = method_wrapper
         return method_wrapper
+
+    def _call(
+        self,
+        name: str,
+        target: Callable,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> Any:
+        """
+        Invokes a wrapped method with the final, merged arguments.
+
+        Subclasses override this hook to add behaviour around specific
+        methods (e.g., caching reads) without re-implementing the
+        injection logic.
+
+        Args:
+            name: The attribute name the method was accessed by.
+            target: The real method on the wrapped namespace.
+            args: Positional arguments from the caller.
+            kwargs: Injected defaults merged with the caller's kwargs.
+        """
+        return target(*args, **kwargs)
@@ -1,7 +1,20 @@
 # Python package for common.infisical_client
 
 from .api_settings import ApiSettings
+from .async_client import AsyncInfisicalClient
 from .client import ClientSettings, InfisicalClient
+from .pool import InfisicalClientPool
+from .secret_cache import CacheStats, SecretCache
+from .snapshot import SecretSnapshot
 
 # Controls what `from X import *` imports
-__all__ = ["InfisicalClient", "ApiSettings", "ClientSettings"]
+__all__ = [
+    "InfisicalClient",
+    "AsyncInfisicalClient",
+    "InfisicalClientPool",
+    "ApiSettings",
+    "ClientSettings",
+    "SecretCache",
+    "CacheStats",
+    "SecretSnapshot",
+]
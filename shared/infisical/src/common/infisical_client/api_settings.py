@@ -9,3 +9,7 @@ class ApiSettings(BaseSettings):
     # Auth Method: Universal Auth
     INFISICAL_CLIENT_ID: str
     INFISICAL_CLIENT_SECRET: SecretStr
+
+    # Optional: Share the access token between processes on this host
+    # through a locked file, so a pre-fork worker pool logs in only once.
+    INFISICAL_TOKEN_CACHE_FILE: str | None = None
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import time
+from collections.abc import Iterable
+from typing import Any
+
+import httpx
+from common.client_utils import NamespaceWrapper
+from infisical_sdk.api_types import (
+    BaseSecret,
+    ListSecretsResponse,
+    MachineIdentityLoginResponse,
+    SingleSecretResponse,
+)
+from infisical_sdk.infisical_requests import APIError, InfisicalError
+
+from .api_settings import ApiSettings
+from .client import ClientSettings
+
+logger = logging.getLogger(__name__)
+
+# Renew the access token this long before the server says it expires, or
+# halfway through its lifetime if it is issued for less than twice that.
+_TOKEN_EXPIRY_MARGIN_SECONDS = 30.0
+
+
+class AsyncSecrets:
+    """
+    An asyncio counterpart of the SDK's `secrets` namespace.
+
+    Method names and parameters mirror `infisical_sdk`'s V3RawSecrets so
+    NamespaceWrapper injects ClientSettings into them the same way.
+    """
+
+    def __init__(self, client: "AsyncInfisicalClient"):
+        self._client = client
+
+    async def list_secrets(
+        self,
+        environment_slug: str,
+        secret_path: str,
+        project_id: str | None = None,
+        project_slug: str | None = None,
+        expand_secret_references: bool = True,
+        view_secret_value: bool = True,
+        recursive: bool = False,
+        include_imports: bool = True,
+        tag_filters: list[str] | None = None,
+    ) -> ListSecretsResponse:
+        """Lists every secret under `secret_path` in one request."""
+        if project_slug is None and project_id is None:
+            raise ValueError("project_slug or project_id must be provided")
+
+        params = {
+            "workspaceId": project_id,
+            "workspaceSlug": project_slug,
+            "environment": environment_slug,
+            "secretPath": secret_path,
+            "viewSecretValue": str(view_secret_value).lower(),
+            "expandSecretReferences": str(expand_secret_references).lower(),
+            "recursive": str(recursive).lower(),
+            "include_imports": str(include_imports).lower(),
+        }
+        if tag_filters:
+            params["tagSlugs"] = ",".join(tag_filters)
+
+        data = await self._client._request("GET", "/api/v3/secrets/raw", params=params)
+        return ListSecretsResponse.from_dict(data)
+
+    async def get_secret_by_name(
+        self,
+        secret_name: str,
+        environment_slug: str,
+        secret_path: str,
+        project_id: str | None = None,
+        project_slug: str | None = None,
+        expand_secret_references: bool = True,
+        include_imports: bool = True,
+        view_secret_value: bool = True,
+        version: str | None = None,
+    ) -> BaseSecret:
+        """Fetches a single secret by name."""
+        if project_slug is None and project_id is None:
+            raise ValueError("project_slug or project_id must be provided")
+
+        params = {
+            "workspaceId": project_id,
+            "workspaceSlug": project_slug,
+            "environment": environment_slug,
+            "secretPath": secret_path,
+            "viewSecretValue": str(view_secret_value).lower(),
+            "expandSecretReferences": str(expand_secret_references).lower(),
+            "include_imports": str(include_imports).lower(),
+            "version": version,
+        }
+
+        data = await self._client._request(
+            "GET", f"/api/v3/secrets/raw/{secret_name}", params=params
+        )
+        return SingleSecretResponse.from_dict(data).secret
+
+
+class AsyncInfisicalClient:
+    """
+    An asyncio-native Infisical client.
+
+    Uses the same ClientSettings / ApiSettings as InfisicalClient and the
+    same NamespaceWrapper injection, so `await client.secrets
+    .get_secret_by_name(secret_name=...)` behaves like the blocking
+    client, without stalling the event loop.
+
+    All requests share one pooled, keep-alive `httpx.AsyncClient`. Login
+    happens lazily on the first request and is repeated shortly before
+    the access token expires.
+    """
+
+    api_settings: ApiSettings
+    settings: ClientSettings
+
+    def __init__(
+        self,
+        settings: ClientSettings | None = None,
+        api_settings: ApiSettings | None = None,
+        max_concurrency: int = 10,
+        http_client: httpx.AsyncClient | None = None,
+    ):
+        """
+        Initializes the client. No network calls are made here.
+
+        Args:
+            settings: Project, environment and path to inject into calls.
+            api_settings: Host and universal auth credentials. Loaded from
+                          the environment when omitted.
+            max_concurrency: Upper bound on in-flight requests made by
+                             `get_many`; also sizes the connection pool.
+            http_client: An optional pre-built httpx.AsyncClient. Primarily
+                         used for testing.
+        """
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive.")
+
+        self.api_settings = api_settings if api_settings else ApiSettings()
+        self.settings = settings if settings else ClientSettings()
+        self.max_concurrency = max_concurrency
+
+        self._http = http_client or httpx.AsyncClient(
+            base_url=str(self.api_settings.INFISICAL_HOST),
+            headers={"Accept": "application/json"},
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            timeout=httpx.Timeout(10.0),
+        )
+        self._access_token: str | None = None
+        self._token_expires_at = 0.0
+        self._login_lock = asyncio.Lock()
+        self._secrets = NamespaceWrapper(
+            wrapped_namespace=AsyncSecrets(self),
+            kwargs_to_inject=self.settings.injected_kwargs(),
+        )
+
+    @property
+    def secrets(self) -> NamespaceWrapper:
+        """The `secrets` namespace, with ClientSettings injected."""
+        return self._secrets
+
+    async def get_many(
+        self, names: Iterable[str], **kwargs: Any
+    ) -> dict[str, BaseSecret]:
+        """
+        Fetches several secrets concurrently.
+
+        At most `max_concurrency` requests are in flight at once. Extra
+        keyword arguments are passed to every `get_secret_by_name` call
+        and override the injected settings.
+
+        Args:
+            names: The secret names to fetch.
+
+        Returns:
+            A dict of secret name to secret, in the order of `names`.
+
+        Raises:
+            APIError: If any secret cannot be fetched.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(name: str) -> BaseSecret:
+            async with semaphore:
+                return await self.secrets.get_secret_by_name(secret_name=name, **kwargs)
+
+        unique_names = list(dict.fromkeys(names))
+        secrets = await asyncio.gather(*(fetch(name) for name in unique_names))
+        return dict(zip(unique_names, secrets))
+
+    async def aclose(self) -> None:
+        """Closes the pooled HTTP connections."""
+        await self._http.aclose()
+
+    async def __aenter__(self) -> "AsyncInfisicalClient":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def _ensure_token(self) -> str:
+        if self._access_token and time.monotonic() < self._token_expires_at:
+            return self._access_token
+        async with self._login_lock:
+            # Another task may have logged in while we waited for the lock.
+            if self._access_token and time.monotonic() < self._token_expires_at:
+                return self._access_token
+            response = await self._http.post(
+                "/api/v1/auth/universal-auth/login",
+                json={
+                    "clientId": self.api_settings.INFISICAL_CLIENT_ID,
+                    "clientSecret": (
+                        self.api_settings.INFISICAL_CLIENT_SECRET.get_secret_value()
+                    ),
+                },
+            )
+            login = MachineIdentityLoginResponse.from_dict(
+                self._handle_response(response)
+            )
+            self._access_token = login.accessToken
+            margin = min(_TOKEN_EXPIRY_MARGIN_SECONDS, login.expiresIn / 2)
+            self._token_expires_at = time.monotonic() + login.expiresIn - margin
+            return self._access_token
+
+    async def _request(
+        self, method: str, path: str, params: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        token = await self._ensure_token()
+        response = await self._http.request(
+            method,
+            path,
+            params={k: v for k, v in (params or {}).items() if v is not None},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        return self._handle_response(response)
+
+    @staticmethod
+    def _handle_response(response: httpx.Response) -> dict[str, Any]:
+        """Mirrors the SDK's error handling so callers can catch APIError."""
+        if response.is_error:
+            try:
+                error_data = response.json()
+            except ValueError:
+                error_data = {"message": response.text}
+            raise APIError(
+                message=error_data.get("message", "Unknown error"),
+                status_code=response.status_code,
+                response=error_data,
+            )
+        try:
+            return response.json()
+        except ValueError:
+            raise InfisicalError("Invalid JSON response")
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from dataclasses import asdict, dataclass
+
+from common.client_utils import atomic_write, file_lock
+from infisical_sdk import InfisicalSDKClient
+
+from .api_settings import ApiSettings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AccessToken:
+    """An Infisical access token and the wall-clock time it expires at."""
+
+    value: str
+    expires_at: float
+    # Seconds the token was issued for; None if unknown.
+    lifetime: float | None = None
+
+    def expires_within(self, seconds: float) -> bool:
+        return time.time() + seconds >= self.expires_at
+
+    def needs_renewal(self, margin: float) -> bool:
+        """
+        Whether the token expires within `margin` seconds. Short-lived
+        tokens are only renewed once half their lifetime is up, so that a
+        token issued for less than the margin is still used.
+        """
+        if self.lifetime is not None:
+            margin = min(margin, self.lifetime / 2)
+        return self.expires_within(margin)
+
+
+class TokenFileCache:
+    """
+    Shares an access token between processes on the same host.
+
+    The token is kept in a JSON file readable only by the current user,
+    and every read-login-write cycle holds a cross-process file lock, so a
+    pre-fork worker pool logs in once instead of once per worker.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], identity: str):
+        """
+        Initializes the cache.
+
+        Args:
+            path: The token file. Created on first login.
+            identity: Identifies who the token belongs to (host and client
+                      id). A token stored for another identity is ignored.
+        """
+        self.path = os.fspath(path)
+        # Stored hashed, so the file doesn't reveal which identity it is for.
+        self._identity = hashlib.sha256(identity.encode()).hexdigest()
+
+    def lock(self):
+        """Holds the cross-process lock guarding the token file."""
+        return file_lock(self.path)
+
+    def load(self) -> AccessToken | None:
+        """Returns the stored token, or None if absent or unusable."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.pop("identity", None) != self._identity:
+                return None
+            return AccessToken(**data)
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError):
+            logger.warning("Ignoring unreadable token file %s", self.path)
+            return None
+
+    def store(self, token: AccessToken) -> None:
+        """Atomically replaces the stored token."""
+        atomic_write(
+            self.path, json.dumps({"identity": self._identity, **asdict(token)})
+        )
+
+
+class UniversalAuthSession:
+    """
+    Logs an InfisicalSDKClient in with universal auth, lazily.
+
+    Nothing happens until `ensure_logged_in()` is first called. The
+    resulting token is renewed in the background `renew_margin_seconds`
+    before it expires, and can optionally be shared with other processes
+    through a TokenFileCache.
+    """
+
+    def __init__(
+        self,
+        sdk_client: InfisicalSDKClient,
+        api_settings: ApiSettings,
+        token_file: TokenFileCache | None = None,
+        renew_margin_seconds: float = 60.0,
+    ):
+        """
+        Initializes the session. No network calls are made here.
+
+        Args:
+            sdk_client: The SDK client to set the access token on.
+            api_settings: Universal auth credentials.
+            token_file: An optional cache to share the token through.
+            renew_margin_seconds: How long before expiry to renew.
+        """
+        self._sdk_client = sdk_client
+        self._api_settings = api_settings
+        self._token_file = token_file
+        self._renew_margin_seconds = renew_margin_seconds
+        self._token: AccessToken | None = None
+        self._lock = threading.Lock()
+        self._renew_timer: threading.Timer | None = None
+
+    @classmethod
+    def from_api_settings(
+        cls, sdk_client: InfisicalSDKClient, api_settings: ApiSettings
+    ) -> "UniversalAuthSession":
+        """
+        Builds a session for `api_settings`, sharing the token through
+        INFISICAL_TOKEN_CACHE_FILE when it is set.
+        """
+        token_file = None
+        if api_settings.INFISICAL_TOKEN_CACHE_FILE:
+            token_file = TokenFileCache(
+                api_settings.INFISICAL_TOKEN_CACHE_FILE,
+                identity=(
+                    f"{api_settings.INFISICAL_HOST}|{api_settings.INFISICAL_CLIENT_ID}"
+                ),
+            )
+        return cls(sdk_client, api_settings, token_file=token_file)
+
+    @property
+    def token(self) -> AccessToken | None:
+        """The current access token, or None before the first login."""
+        return self._token
+
+    def ensure_logged_in(self) -> AccessToken:
+        """
+        Returns a token valid for at least the renewal margin, logging in
+        first if needed. Safe to call on every request: the common case is
+        a single attribute check.
+        """
+        token = self._token
+        if token is not None and not token.needs_renewal(self._renew_margin_seconds):
+            return token
+        with self._lock:
+            token = self._token
+            if token is None or token.needs_renewal(self._renew_margin_seconds):
+                token = self._login()
+            return token
+
+    def close(self) -> None:
+        """Cancels the background renewal."""
+        with self._lock:
+            if self._renew_timer is not None:
+                self._renew_timer.cancel()
+                self._renew_timer = None
+
+    def _login(self) -> AccessToken:
+        # Must be called with self._lock held.
+        if self._token_file is None:
+            token = self._login_remote()
+        else:
+            with self._token_file.lock():
+                token = self._token_file.load()
+                if token is None or token.needs_renewal(self._renew_margin_seconds):
+                    token = self._login_remote()
+                    self._token_file.store(token)
+                else:
+                    logger.debug("Reusing shared token from %s", self._token_file.path)
+
+        self._sdk_client.set_token(token.value)
+        self._token = token
+        self._schedule_renewal(token)
+        return token
+
+    def _login_remote(self) -> AccessToken:
+        response = self._sdk_client.auth.universal_auth.login(
+            self._api_settings.INFISICAL_CLIENT_ID,
+            self._api_settings.INFISICAL_CLIENT_SECRET.get_secret_value(),
+        )
+        lifetime = float(response.expiresIn)
+        return AccessToken(
+            value=response.accessToken,
+            expires_at=time.time() + lifetime,
+            lifetime=lifetime,
+        )
+
+    def _schedule_renewal(self, token: AccessToken) -> None:
+        # Must be called with self._lock held.
+        if self._renew_timer is not None:
+            self._renew_timer.cancel()
+        lifetime = token.expires_at - time.time()
+        # Renew ahead of expiry, but never spin on very short-lived tokens.
+        delay = max(lifetime - self._renew_margin_seconds, lifetime / 2, 1.0)
+        # Only hold a weak reference, so a pending renewal never keeps an
+        # otherwise unused session (and its SDK client) alive.
+        self._renew_timer = threading.Timer(
+            delay, UniversalAuthSession._renew, args=(weakref.ref(self),)
+        )
+        self._renew_timer.daemon = True
+        self._renew_timer.start()
+
+    @staticmethod
+    def _renew(session_ref: "weakref.ref[UniversalAuthSession]") -> None:
+        session = session_ref()
+        if session is None:
+            return
+        try:
+            with session._lock:
+                session._login()
+        except Exception:
+            # The next ensure_logged_in() retries in the foreground.
+            logger.warning("Background token renewal failed", exc_info=True)
@@ -1,12 +1,19 @@
-import functools
 import logging
+import threading
+from typing import Any, ClassVar
 
 from common.client_utils import NamespaceWrapper
 from infisical_sdk import InfisicalSDKClient
+from infisical_sdk.resources.secrets import V3RawSecrets
+from infisical_sdk.util.secrets_cache import SecretsCache
 from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from .api_settings import ApiSettings
+from .auth import UniversalAuthSession
+from .secret_cache import SecretCache
+from .secrets_wrapper import SecretsNamespaceWrapper
+from .snapshot import SecretSnapshot
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +38,29 @@ class ClientSettings(BaseSettings):
     environment_slug: str = "dev"
     secret_path: str = "/"
 
+    # Prefetch every secret under (environment_slug, secret_path) with one
+    # list call at startup and answer reads from that snapshot.
+    prefetch: bool = False
+    # When prefetching, re-list the path this often. None disables it.
+    prefetch_refresh_seconds: float | None = None
+
+    # Only these fields are injected into SDK method calls.
+    INJECTED_FIELDS: ClassVar[frozenset[str]] = frozenset(
+        {"project_id", "project_slug", "environment_slug", "secret_path"}
+    )
+
+    def injected_kwargs(self) -> frozenset[tuple[str, Any]]:
+        """The explicitly set scope fields, as kwargs to inject."""
+        return frozenset(
+            self.model_dump(
+                include=set(self.INJECTED_FIELDS), exclude_unset=True
+            ).items()
+        )
+
+    def scope(self) -> dict[str, Any]:
+        """All scope fields, including defaults, used to list a whole path."""
+        return self.model_dump(include=set(self.INJECTED_FIELDS))
+
 
 class InfisicalClient:
     """
@@ -43,6 +73,18 @@ class InfisicalClient:
     (e.g., `get_secret`, `create_secret`) to the underlying
     InfisicalSDKClient instance. It fills in project_id / project_slug,
     environment_slug, and secret_path from ClientSettings automatically.
+
+    Login is lazy: it happens on first namespace access (or prefetch), and
+    the access token is renewed in the background before it expires. Set
+    INFISICAL_TOKEN_CACHE_FILE to share the token between processes.
+
+    Secret reads can optionally be served from an in-process SecretCache,
+    which is invalidated by any write made through `client.secrets`.
+
+    With `ClientSettings.prefetch`, every secret under the configured path
+    is loaded with a single list call at startup and later reads are
+    answered from that immutable snapshot. `refresh()` (called manually,
+    periodically, or after a write) swaps in a new snapshot atomically.
     """
 
     _client: InfisicalSDKClient
@@ -53,6 +95,7 @@ class InfisicalClient:
         self,
         settings: ClientSettings | None = None,
         api_settings: ApiSettings | None = None,
+        cache: SecretCache | None = None,
     ):
         """
         Initializes the client.
@@ -63,21 +106,38 @@ class InfisicalClient:
         Args:
             api_settings: An optional, pre-loaded InfisicalSettings instance.
                       Primarily used for testing.
+            cache: An optional SecretCache for `secrets.get_secret_by_name`.
+                   Caching is disabled when omitted.
 
         Raises:
             RuntimeError: If settings cannot be loaded or are invalid.
         """
         self.api_settings = api_settings if api_settings else ApiSettings()
         self.settings = settings if settings else ClientSettings()
+        self._cache = cache
+        # Per-instance, so wrappers (and this client) are freed together.
+        self._ns_wrappers: dict[str, NamespaceWrapper] = {}
 
-        # Initialize the REAL Infisical client
-        self._client = InfisicalSDKClient(host=str(self.api_settings.INFISICAL_HOST))
+        # Initialize the REAL Infisical client. When we cache ourselves, turn
+        # the SDK's own cache off so background refreshes see fresh values.
+        sdk_kwargs = {"cache_ttl": None} if cache is not None else {}
+        self._client = InfisicalSDKClient(
+            host=str(self.api_settings.INFISICAL_HOST), **sdk_kwargs
+        )
 
-        self._client.auth.universal_auth.login(
-            self.api_settings.INFISICAL_CLIENT_ID,
-            self.api_settings.INFISICAL_CLIENT_SECRET.get_secret_value(),
+        self._auth = UniversalAuthSession.from_api_settings(
+            self._client, self.api_settings
         )
 
+        self._snapshot: SecretSnapshot | None = None
+        self._refresh_lock = threading.Lock()
+        self._stop_refresh = threading.Event()
+        self._refresh_thread: threading.Thread | None = None
+        if self.settings.prefetch:
+            self.refresh()
+            if self.settings.prefetch_refresh_seconds:
+                self._start_periodic_refresh(self.settings.prefetch_refresh_seconds)
+
     # Whitelist of attributes to delegate to the underlying client
     _ALLOWED_NAMESPACES = {"secrets"}
 
@@ -91,16 +151,118 @@ class InfisicalClient:
         """
         if name not in self._ALLOWED_NAMESPACES or not hasattr(self._client, name):
             raise AttributeError(f"'InfisicalClient' object has no attribute '{name}'")
+        self._auth.ensure_logged_in()
         return self._get_ns_wrapper(name)
 
-    @functools.cache
     def _get_ns_wrapper(self, name: str) -> NamespaceWrapper:
+        wrapper = self._ns_wrappers.get(name)
+        if wrapper is None:
+            wrapper = self._ns_wrappers.setdefault(name, self._build_ns_wrapper(name))
+        return wrapper
+
+    def _build_ns_wrapper(self, name: str) -> NamespaceWrapper:
+        kwargs_to_inject = self.settings.injected_kwargs()
+        if name == "secrets":
+            return SecretsNamespaceWrapper(
+                wrapped_namespace=getattr(self._client, name),
+                kwargs_to_inject=kwargs_to_inject,
+                cache=self._cache,
+                snapshot_source=lambda: self._snapshot,
+                on_write=self._after_write if self.settings.prefetch else None,
+            )
         return NamespaceWrapper(
             wrapped_namespace=getattr(self._client, name),
-            kwargs_to_inject=frozenset(
-                self.settings.model_dump(exclude_unset=True).items()
-            ),
+            kwargs_to_inject=kwargs_to_inject,
+        )
+
+    @property
+    def uncached_secrets(self) -> NamespaceWrapper:
+        """
+        Like `secrets`, but every read goes to the API, past the prefetch
+        snapshot, the SecretCache and the SDK's own cache. For secrets that
+        other processes write, e.g. an OAuth token shared by replicas.
+        Write through `secrets`, so the caches are invalidated.
+        """
+        self._auth.ensure_logged_in()
+        wrapper = self._ns_wrappers.get("uncached_secrets")
+        if wrapper is None:
+            # Shares the SDK client's requests session, and so its token.
+            secrets = V3RawSecrets(self._client.api, SecretsCache(None))
+            wrapper = self._ns_wrappers.setdefault(
+                "uncached_secrets",
+                NamespaceWrapper(
+                    wrapped_namespace=secrets,
+                    kwargs_to_inject=self.settings.injected_kwargs(),
+                ),
+            )
+        return wrapper
+
+    @property
+    def secret_cache(self) -> SecretCache | None:
+        """
+        The SecretCache backing `secrets` reads, if caching is enabled.
+        Its `stats` expose hit/miss counters.
+        """
+        return self._cache
+
+    @property
+    def snapshot(self) -> SecretSnapshot | None:
+        """The current prefetch snapshot, or None when not prefetching."""
+        return self._snapshot
+
+    def refresh(self) -> SecretSnapshot:
+        """
+        Re-lists every secret under the configured path and atomically
+        replaces the prefetch snapshot.
+
+        Readers never observe a partially built snapshot: they either see
+        the previous one or the new one.
+
+        Returns:
+            The newly installed snapshot.
+        """
+        scope = self.settings.scope()
+        self._auth.ensure_logged_in()
+        with self._refresh_lock:
+            response = self._client.secrets.list_secrets(**scope)
+            snapshot = SecretSnapshot.from_list_response(scope, response)
+            self._snapshot = snapshot
+        logger.debug("Prefetched %d secrets from %s", len(snapshot), scope)
+        return snapshot
+
+    def close(self) -> None:
+        """Stops background refreshes and releases SDK resources."""
+        self._auth.close()
+        self._stop_refresh.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
+        if self._cache is not None:
+            self._cache.close()
+        self._client.close()
+
+    def _after_write(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            # Never serve a snapshot the write just made stale; fall back to
+            # reading from the API until the next successful refresh.
+            logger.warning("Snapshot refresh after write failed", exc_info=True)
+            self._snapshot = None
+
+    def _start_periodic_refresh(self, interval: float) -> None:
+        def run() -> None:
+            while not self._stop_refresh.wait(interval):
+                try:
+                    self.refresh()
+                except Exception:
+                    # Keep serving the last good snapshot.
+                    logger.warning("Periodic snapshot refresh failed", exc_info=True)
+
+        self._refresh_thread = threading.Thread(
+            target=run, name="infisical-snapshot-refresh", daemon=True
         )
+        self._refresh_thread.start()
 
     @property
     def raw_client(self) -> InfisicalSDKClient:
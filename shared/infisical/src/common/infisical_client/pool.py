@@ -0,0 +1,120 @@
+import logging
+import threading
+from typing import Any
+
+from common.client_utils import NamespaceWrapper
+from infisical_sdk import InfisicalSDKClient
+
+from .api_settings import ApiSettings
+from .auth import UniversalAuthSession
+from .client import ClientSettings
+from .secret_cache import SecretCache
+from .secrets_wrapper import SecretsNamespaceWrapper
+
+logger = logging.getLogger(__name__)
+
+
+class InfisicalClientPool:
+    """
+    Many (project, environment, secret_path) views over one authenticated
+    Infisical connection.
+
+    A single InfisicalSDKClient (one HTTP session, one login) backs every
+    view. Views are SecretsNamespaceWrappers that only differ in the
+    ClientSettings they inject; they are created on first use and reused
+    for the same scope.
+
+        pool = InfisicalClientPool(ClientSettings(project_slug="family"))
+        terraform = pool.secrets(secret_path="/terraform")
+        gcloud = pool.secrets(ClientSettings(project_slug="gcloud"))
+    """
+
+    _client: InfisicalSDKClient
+    api_settings: ApiSettings
+    settings: ClientSettings
+
+    def __init__(
+        self,
+        settings: ClientSettings | None = None,
+        api_settings: ApiSettings | None = None,
+        cache: SecretCache | None = None,
+    ):
+        """
+        Initializes the pool. No network calls are made here.
+
+        Args:
+            settings: The default scope that `secrets()` overrides apply to.
+            api_settings: An optional, pre-loaded ApiSettings instance.
+            cache: An optional SecretCache shared by every view. Cache keys
+                   include the scope, so views never see each other's values.
+        """
+        self.api_settings = api_settings if api_settings else ApiSettings()
+        self.settings = settings if settings else ClientSettings()
+        self._cache = cache
+
+        sdk_kwargs = {"cache_ttl": None} if cache is not None else {}
+        self._client = InfisicalSDKClient(
+            host=str(self.api_settings.INFISICAL_HOST), **sdk_kwargs
+        )
+        self._auth = UniversalAuthSession.from_api_settings(
+            self._client, self.api_settings
+        )
+        self._views: dict[frozenset[tuple[str, Any]], NamespaceWrapper] = {}
+        self._views_lock = threading.Lock()
+
+    def secrets(
+        self, settings: ClientSettings | None = None, **overrides: Any
+    ) -> NamespaceWrapper:
+        """
+        Returns the `secrets` view for a scope.
+
+        Args:
+            settings: The scope to bind. Defaults to the pool's settings.
+            **overrides: ClientSettings fields to change on top of
+                         `settings`, e.g. `secret_path="/terraform"`.
+
+        Returns:
+            A NamespaceWrapper injecting that scope, shared by every caller
+            asking for the same scope.
+        """
+        settings = settings if settings else self.settings
+        if overrides:
+            settings = ClientSettings(
+                **{**settings.model_dump(exclude_unset=True), **overrides}
+            )
+        key = settings.injected_kwargs()
+
+        self._auth.ensure_logged_in()
+        view = self._views.get(key)
+        if view is None:
+            with self._views_lock:
+                view = self._views.get(key)
+                if view is None:
+                    view = SecretsNamespaceWrapper(
+                        wrapped_namespace=self._client.secrets,
+                        kwargs_to_inject=key,
+                        cache=self._cache,
+                    )
+                    self._views[key] = view
+        return view
+
+    def __len__(self) -> int:
+        """The number of distinct scopes handed out so far."""
+        return len(self._views)
+
+    @property
+    def secret_cache(self) -> SecretCache | None:
+        """The SecretCache shared by every view, if caching is enabled."""
+        return self._cache
+
+    def close(self) -> None:
+        """Stops token renewal and releases SDK resources."""
+        self._auth.close()
+        if self._cache is not None:
+            self._cache.close()
+        self._client.close()
+
+    @property
+    def raw_client(self) -> InfisicalSDKClient:
+        """The shared InfisicalSDKClient behind every view."""
+        return self._client
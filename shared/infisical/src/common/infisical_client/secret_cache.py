@@ -0,0 +1,187 @@
+import dataclasses
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how a SecretCache has been used."""
+
+    hits: int = 0
+    misses: int = 0
+    stale_hits: int = 0
+    refreshes: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+
+
+class SecretCache:
+    """
+    An in-process, thread-safe TTL + LRU cache for secret reads.
+
+    Entries younger than `ttl_seconds` are served directly. Entries that
+    are older, but still within `ttl_seconds + stale_seconds`, are served
+    stale while a single background refresh reloads them
+    (stale-while-revalidate). Anything older is treated as a miss and
+    loaded on the caller's thread.
+
+    The cache holds at most `max_entries` values; the least recently
+    used entry is evicted first.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 60.0,
+        max_entries: int = 256,
+        stale_seconds: float = 0.0,
+        max_refresh_workers: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initializes the cache.
+
+        Args:
+            ttl_seconds: How long a loaded value is considered fresh.
+            max_entries: Upper bound on the number of cached values.
+            stale_seconds: How long past its TTL a value may still be
+                           served while it is refreshed in the background.
+                           0 disables stale-while-revalidate.
+            max_refresh_workers: Size of the background refresh pool.
+            clock: Monotonic time source. Primarily used for testing.
+        """
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive.")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive.")
+        if stale_seconds < 0:
+            raise ValueError("stale_seconds must not be negative.")
+
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self._max_refresh_workers = max_refresh_workers
+        self._clock = clock
+
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._refreshing: set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+        # Bumped on every invalidation so in-flight refreshes started
+        # before a write never re-insert a value the write made obsolete.
+        self._generation = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def stats(self) -> CacheStats:
+        """A snapshot of the hit/miss counters."""
+        with self._lock:
+            return dataclasses.replace(self._stats)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for `key`, loading it on a miss.
+
+        Args:
+            key: A hashable cache key.
+            loader: Called without arguments to fetch the value. It is
+                    invoked on the caller's thread on a miss and on a
+                    background thread for stale refreshes.
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                if age < self.ttl_seconds:
+                    self._stats.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry.value
+                if age < self.ttl_seconds + self.stale_seconds:
+                    self._stats.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    self._schedule_refresh(key, loader)
+                    return entry.value
+            self._stats.misses += 1
+            generation = self._generation
+
+        value = loader()
+        self._store(key, value, generation)
+        return value
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """
+        Drops a single entry, or every entry when `key` is None.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._generation += 1
+            self._stats.invalidations += 1
+
+    def close(self) -> None:
+        """Waits for running refreshes and stops the background refresh pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _store(self, key: Hashable, value: Any, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return  # Invalidated while loading; don't resurrect it.
+            self._entries[key] = _Entry(value=value, fetched_at=self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    def _schedule_refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        # Must be called with self._lock held.
+        if key in self._refreshing:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_refresh_workers,
+                thread_name_prefix="secret-cache-refresh",
+            )
+        self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, loader, self._generation)
+
+    def _refresh(
+        self, key: Hashable, loader: Callable[[], Any], generation: int
+    ) -> None:
+        try:
+            value = loader()
+        except Exception:
+            # Keep serving the stale value; the next access past the
+            # stale window falls back to a foreground load.
+            logger.warning("Background refresh failed for %r", key, exc_info=True)
+        else:
+            self._store(key, value, generation)
+            with self._lock:
+                self._stats.refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -0,0 +1,118 @@
+import logging
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from common.client_utils import NamespaceWrapper
+
+from .secret_cache import SecretCache
+from .snapshot import SecretSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class SecretsNamespaceWrapper(NamespaceWrapper):
+    """
+    A NamespaceWrapper for the SDK's `secrets` namespace.
+
+    Single-secret reads are answered, in order, from the current prefetch
+    snapshot (if any), then from the SecretCache (if any), and only then
+    from the API. Writes through this wrapper invalidate the cache and
+    notify `on_write`. Without a snapshot source or a cache it behaves
+    exactly like NamespaceWrapper.
+    """
+
+    _READ_METHODS = frozenset({"get_secret_by_name"})
+    _WRITE_METHODS = frozenset(
+        {"create_secret_by_name", "update_secret_by_name", "delete_secret_by_name"}
+    )
+
+    def __init__(
+        self,
+        wrapped_namespace: object,
+        kwargs_to_inject: frozenset[tuple[str, Any]],
+        cache: SecretCache | None = None,
+        snapshot_source: Callable[[], SecretSnapshot | None] | None = None,
+        on_write: Callable[[], None] | None = None,
+    ):
+        """
+        Initializes the wrapper.
+
+        Args:
+            wrapped_namespace: The SDK's secrets namespace.
+            kwargs_to_inject: The default keyword arguments to inject.
+            cache: An optional cache for secret reads.
+            snapshot_source: Returns the current prefetch snapshot, if any.
+            on_write: Called after every write made through this wrapper.
+        """
+        super().__init__(wrapped_namespace, kwargs_to_inject)
+        self._cache = cache
+        self._snapshot_source = snapshot_source
+        self._on_write = on_write
+
+    def _call(
+        self,
+        name: str,
+        target: Callable,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> Any:
+        if name in self._READ_METHODS:
+            secret = self._lookup_snapshot(args, kwargs)
+            if secret is not None:
+                return secret
+            if self._cache is not None:
+                key = self._cache_key(name, args, kwargs)
+                if key is not None:
+                    return self._cache.get_or_load(key, lambda: target(*args, **kwargs))
+
+        if name in self._WRITE_METHODS:
+            # Invalidate everything rather than a single key: other secrets
+            # may reference the one being written and expand to new values.
+            try:
+                return target(*args, **kwargs)
+            finally:
+                if self._cache is not None:
+                    self._cache.invalidate()
+                if self._on_write is not None:
+                    self._on_write()
+
+        return target(*args, **kwargs)
+
+    def _lookup_snapshot(
+        self, args: tuple[Any, ...], kwargs: dict[str, Any]
+    ) -> Any | None:
+        if self._snapshot_source is None:
+            return None
+        snapshot = self._snapshot_source()
+        if snapshot is None:
+            return None
+        if args:
+            # Only the secret name may be passed positionally.
+            if len(args) != 1 or "secret_name" in kwargs:
+                return None
+            secret_name, lookup_kwargs = args[0], kwargs
+        else:
+            lookup_kwargs = dict(kwargs)
+            secret_name = lookup_kwargs.pop("secret_name", None)
+        if secret_name is None:
+            return None
+        return snapshot.lookup(secret_name, lookup_kwargs)
+
+    @staticmethod
+    def _cache_key(
+        name: str, args: tuple[Any, ...], kwargs: dict[str, Any]
+    ) -> Hashable | None:
+        """
+        Builds a key from the method name and the final call arguments.
+
+        The merged kwargs already contain the injected project,
+        environment_slug and secret_path, so reads from different scopes
+        never collide. Returns None for unhashable arguments, which
+        bypasses the cache.
+        """
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
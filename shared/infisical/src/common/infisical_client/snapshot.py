@@ -0,0 +1,74 @@
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any
+
+from infisical_sdk.api_types import BaseSecret, ListSecretsResponse
+
+# Arguments of `get_secret_by_name` that a snapshot can answer for, with
+# the values a snapshot is built with. Any other value (e.g., a pinned
+# `version`) is answered by the API instead.
+_SNAPSHOT_READ_DEFAULTS: Mapping[str, Any] = MappingProxyType(
+    {
+        "expand_secret_references": True,
+        "include_imports": True,
+        "view_secret_value": True,
+        "version": None,
+    }
+)
+
+
+@dataclass(frozen=True)
+class SecretSnapshot:
+    """
+    An immutable view of every secret under one (project, environment,
+    secret_path) scope, as returned by a single `list_secrets` call.
+
+    Snapshots are never mutated; a refresh builds a new one and swaps it in.
+    """
+
+    scope: Mapping[str, Any]
+    secrets: Mapping[str, BaseSecret]
+    fetched_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_list_response(
+        cls, scope: Mapping[str, Any], response: ListSecretsResponse
+    ) -> "SecretSnapshot":
+        """
+        Builds a snapshot from a `list_secrets` response.
+
+        Secrets defined directly under the path take precedence over
+        imported secrets with the same key, matching the API's behaviour.
+        """
+        secrets: dict[str, BaseSecret] = {}
+        for imported in response.imports:
+            for secret in imported.secrets:
+                if isinstance(secret, dict):
+                    secret = BaseSecret.from_dict(secret)
+                secrets.setdefault(secret.secretKey, secret)
+        for secret in response.secrets:
+            secrets[secret.secretKey] = secret
+        return cls(
+            scope=MappingProxyType(dict(scope)),
+            secrets=MappingProxyType(secrets),
+        )
+
+    def lookup(self, secret_name: str, kwargs: Mapping[str, Any]) -> BaseSecret | None:
+        """
+        Returns the named secret if this snapshot can answer a
+        `get_secret_by_name` call made with `kwargs`, else None.
+        """
+        for key, value in kwargs.items():
+            if key in self.scope:
+                if self.scope[key] != value:
+                    return None
+            elif key not in _SNAPSHOT_READ_DEFAULTS:
+                return None
+            elif _SNAPSHOT_READ_DEFAULTS[key] != value:
+                return None
+        return self.secrets.get(secret_name)
+
+    def __len__(self) -> int:
+        return len(self.secrets)
@@ -0,0 +1,32 @@
+# common.instrumentation module
+
+from .metrics import (
+    DEFAULT_BUCKETS,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    Metric,
+    MetricsRegistry,
+    is_enabled,
+    render_prometheus,
+    set_enabled,
+    timed,
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "PROMETHEUS_CONTENT_TYPE",
+    "REGISTRY",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Metric",
+    "MetricsRegistry",
+    "is_enabled",
+    "render_prometheus",
+    "set_enabled",
+    "timed",
+]
@@ -0,0 +1,354 @@
+import asyncio
+import bisect
+import functools
+import itertools
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any, Generic, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Latency buckets in seconds, from a cache hit to a slow API call.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# Checked first by every update, so disabled metrics cost one lookup.
+#
+# Updates take no locks, which would cost more than the update itself. The
+# GIL keeps them consistent, but under heavy thread contention an update
+# can rarely be lost, which is fine for monitoring.
+_enabled = True
+
+
+def set_enabled(enabled: bool) -> None:
+    """
+    Turns recording on or off for every metric. While off, updates return
+    at once and timers do not read the clock; recorded values are kept.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: "Histogram"):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Counter:
+    """A value that only goes up, e.g. calls or errors."""
+
+    __slots__ = ("_value",)
+
+    def __init__(self) -> None:
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if _enabled:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """A value that goes up and down, e.g. open connections."""
+
+    __slots__ = ("_value",)
+
+    def __init__(self) -> None:
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if _enabled:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        if _enabled:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        if _enabled:
+            self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram:
+    """Counts observations, e.g. latencies, into buckets."""
+
+    __slots__ = ("buckets", "_counts", "_sum")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One count per bucket, and one for observations above them all.
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        if _enabled:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def time(self) -> "_Timer | _NullTimer":
+        """
+        Times a block, in seconds:
+
+            with GMAIL_CALLS.labels("history.list").time():
+                page = request.execute()
+        """
+        return _Timer(self) if _enabled else _NULL_TIMER
+
+    def snapshot(self) -> tuple[list[int], float]:
+        """Returns the cumulative count per bucket (and +Inf), and the sum."""
+        counts, total = list(self._counts), self._sum
+        return list(itertools.accumulate(counts)), total
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+
+_Child = TypeVar("_Child", Counter, Gauge, Histogram)
+
+
+class Metric(Generic[_Child]):
+    """
+    A named metric, with one child per combination of label values. Look
+    children up once, outside hot paths:
+
+        _GET_SECRET = INFISICAL_CALLS.labels("get_secret_by_name")
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        factory: Callable[[], _Child],
+    ):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: dict[tuple[str, ...], _Child] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> _Child:
+        """
+        Raises:
+            ValueError: If the number of values does not match the labels.
+        """
+        child = self._children.get(values)
+        if child is not None:
+            return child
+        if len(values) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {values}"
+            )
+        with self._lock:
+            return self._children.setdefault(
+                tuple(str(v) for v in values), self._factory()
+            )
+
+    def children(self) -> Iterator[tuple[tuple[str, ...], _Child]]:
+        with self._lock:
+            items = list(self._children.items())
+        yield from sorted(items)
+
+
+class MetricsRegistry:
+    """
+    Holds metrics by name. Asking for an existing name returns the same
+    metric, so modules can declare the metrics they use at import time.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric[Any]] = {}
+        self._lock = threading.Lock()
+
+    def counter(
+        self, name: str, help: str, labelnames: Sequence[str] = ()
+    ) -> Metric[Counter]:
+        return self._get("counter", name, help, labelnames, Counter)
+
+    def gauge(
+        self, name: str, help: str, labelnames: Sequence[str] = ()
+    ) -> Metric[Gauge]:
+        return self._get("gauge", name, help, labelnames, Gauge)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Metric[Histogram]:
+        return self._get(
+            "histogram", name, help, labelnames, lambda: Histogram(buckets)
+        )
+
+    def metrics(self) -> list[Metric[Any]]:
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: m.name)
+
+    def _get(
+        self,
+        kind: str,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        factory: Callable[[], Any],
+    ) -> Metric[Any]:
+        """
+        Raises:
+            ValueError: If `name` is taken by a metric of another kind or
+                        with other labels.
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric(
+                    kind, name, help, labelnames, factory
+                )
+            elif metric.kind != kind or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already exists as a {metric.kind}")
+            return metric
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(histogram: Histogram) -> Callable[[F], F]:
+    """
+    Times every call of a function, sync or async, into `histogram`:
+
+        @timed(TOOL_SECONDS.labels("search_emails"))
+        async def search_emails(...): ...
+    """
+
+    def decorate(fn: F) -> F:
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def render_prometheus(registry: MetricsRegistry = REGISTRY) -> str:
+    """Writes every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry.metrics():
+        lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for values, child in metric.children():
+            labels = list(zip(metric.labelnames, values))
+            if isinstance(child, Histogram):
+                counts, total = child.snapshot()
+                for bound, count in zip([*child.buckets, math.inf], counts):
+                    le = _format_value(bound)
+                    lines.append(
+                        f"{metric.name}_bucket{_labels([*labels, ('le', le)])} {count}"
+                    )
+                lines.append(
+                    f"{metric.name}_sum{_labels(labels)} {_format_value(total)}"
+                )
+                lines.append(f"{metric.name}_count{_labels(labels)} {counts[-1]}")
+            else:
+                lines.append(
+                    f"{metric.name}{_labels(labels)} {_format_value(child.value)}"
+                )
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _labels(labels: Sequence[tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels)
+    return f"{{{pairs}}}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
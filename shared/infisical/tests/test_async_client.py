@@ -0,0 +1,161 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from common.infisical_client import (
+    ApiSettings,
+    AsyncInfisicalClient,
+    ClientSettings,
+)
+from infisical_sdk.infisical_requests import APIError
+from pydantic import SecretStr
+
+VALID_API_SETTINGS = ApiSettings(
+    INFISICAL_HOST="http://mock-host.com",
+    INFISICAL_CLIENT_ID="id",
+    INFISICAL_CLIENT_SECRET=SecretStr("secret"),
+)
+
+
+def secret_payload(name: str) -> dict:
+    return {
+        "secret": {
+            "id": f"id-{name}",
+            "_id": f"id-{name}",
+            "workspace": "123",
+            "environment": "prod",
+            "version": 1,
+            "type": "shared",
+            "secretKey": name,
+            "secretValue": f"value-of-{name}",
+            "secretComment": "",
+            "createdAt": "2025-01-01T00:00:00Z",
+            "updatedAt": "2025-01-01T00:00:00Z",
+        }
+    }
+
+
+class FakeInfisicalApi:
+    """An httpx transport handler standing in for the Infisical API."""
+
+    def __init__(self, delay: float = 0.0, expires_in: int = 3600):
+        self.delay = delay
+        self.expires_in = expires_in
+        self.requests: list[httpx.Request] = []
+        self.logins = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/api/v1/auth/universal-auth/login":
+            self.logins += 1
+            assert json.loads(request.content) == {
+                "clientId": "id",
+                "clientSecret": "secret",
+            }
+            return httpx.Response(
+                200,
+                json={
+                    "accessToken": "token",
+                    "expiresIn": self.expires_in,
+                    "accessTokenMaxTTL": self.expires_in,
+                    "tokenType": "Bearer",
+                },
+            )
+
+        assert request.headers["Authorization"] == "Bearer token"
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        name = request.url.path.rsplit("/", 1)[-1]
+        if name == "MISSING":
+            return httpx.Response(404, json={"message": "Secret not found"})
+        return httpx.Response(200, json=secret_payload(name))
+
+
+def build_client(api: FakeInfisicalApi, **kwargs) -> AsyncInfisicalClient:
+    return AsyncInfisicalClient(
+        settings=ClientSettings(
+            project_id="123", environment_slug="prod", secret_path="/app"
+        ),
+        api_settings=VALID_API_SETTINGS,
+        http_client=httpx.AsyncClient(
+            base_url="http://mock-host.com", transport=httpx.MockTransport(api)
+        ),
+        **kwargs,
+    )
+
+
+def test_async_client_does_not_login_on_init():
+    api = FakeInfisicalApi()
+
+    build_client(api)
+
+    assert api.logins == 0
+
+
+def test_async_client_injects_settings_into_reads():
+    api = FakeInfisicalApi()
+
+    async def run():
+        async with build_client(api) as client:
+            return await client.secrets.get_secret_by_name(secret_name="DB_PASS")
+
+    secret = asyncio.run(run())
+
+    assert secret.secretValue == "value-of-DB_PASS"
+    params = api.requests[-1].url.params
+    assert params["workspaceId"] == "123"
+    assert params["environment"] == "prod"
+    assert params["secretPath"] == "/app"
+    assert "version" not in params
+
+
+def test_get_many_fetches_concurrently_within_limit():
+    api = FakeInfisicalApi(delay=0.01)
+    names = [f"SECRET_{i}" for i in range(20)]
+
+    async def run():
+        async with build_client(api, max_concurrency=4) as client:
+            return await client.get_many(names)
+
+    secrets = asyncio.run(run())
+
+    assert list(secrets) == names
+    assert secrets["SECRET_7"].secretValue == "value-of-SECRET_7"
+    assert api.logins == 1
+    assert 1 < api.max_in_flight <= 4
+
+
+def test_short_lived_tokens_are_reused():
+    api = FakeInfisicalApi(expires_in=20)
+
+    async def run():
+        async with build_client(api) as client:
+            await client.get_many(["A", "B", "C"])
+
+    asyncio.run(run())
+
+    assert api.logins == 1
+
+
+def test_get_many_raises_api_errors():
+    api = FakeInfisicalApi()
+
+    async def run():
+        async with build_client(api) as client:
+            await client.get_many(["DB_PASS", "MISSING"])
+
+    with pytest.raises(APIError, match="Secret not found"):
+        asyncio.run(run())
+
+
+def test_async_client_rejects_invalid_concurrency():
+    with pytest.raises(ValueError):
+        build_client(FakeInfisicalApi(), max_concurrency=0)
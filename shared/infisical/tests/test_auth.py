@@ -0,0 +1,162 @@
+import json
+import multiprocessing
+import os
+import time
+from unittest.mock import MagicMock
+
+from common.infisical_client import ApiSettings
+from common.infisical_client.auth import (
+    AccessToken,
+    TokenFileCache,
+    UniversalAuthSession,
+)
+from infisical_sdk.api_types import MachineIdentityLoginResponse
+from pydantic import SecretStr
+
+VALID_API_SETTINGS = ApiSettings(
+    INFISICAL_HOST="http://mock-host.com",
+    INFISICAL_CLIENT_ID="id",
+    INFISICAL_CLIENT_SECRET=SecretStr("secret"),
+)
+
+
+def build_sdk_client(expires_in: int = 3600) -> MagicMock:
+    sdk_client = MagicMock()
+    sdk_client.auth.universal_auth.login.return_value = MachineIdentityLoginResponse(
+        accessToken="fresh-token",
+        expiresIn=expires_in,
+        accessTokenMaxTTL=expires_in,
+        tokenType="Bearer",
+    )
+    return sdk_client
+
+
+def test_session_logs_in_lazily_and_once():
+    sdk_client = build_sdk_client()
+    session = UniversalAuthSession(sdk_client, VALID_API_SETTINGS)
+
+    sdk_client.auth.universal_auth.login.assert_not_called()
+    session.ensure_logged_in()
+    token = session.ensure_logged_in()
+    session.close()
+
+    sdk_client.auth.universal_auth.login.assert_called_once_with("id", "secret")
+    sdk_client.set_token.assert_called_once_with("fresh-token")
+    assert token.value == "fresh-token"
+    assert not token.expires_within(3000)
+
+
+def test_session_logs_in_again_when_token_nears_expiry():
+    sdk_client = build_sdk_client()
+    session = UniversalAuthSession(
+        sdk_client, VALID_API_SETTINGS, renew_margin_seconds=60
+    )
+
+    session.ensure_logged_in()
+    session._token = AccessToken("old-token", time.time() + 30, lifetime=3600)
+    token = session.ensure_logged_in()
+    session.close()
+
+    assert sdk_client.auth.universal_auth.login.call_count == 2
+    assert token.value == "fresh-token"
+
+
+def test_session_uses_tokens_shorter_lived_than_the_margin():
+    sdk_client = build_sdk_client(expires_in=30)
+    session = UniversalAuthSession(
+        sdk_client, VALID_API_SETTINGS, renew_margin_seconds=60
+    )
+
+    session.ensure_logged_in()
+    session.ensure_logged_in()
+    session.close()
+
+    assert sdk_client.auth.universal_auth.login.call_count == 1
+    # Renewed once half its lifetime is up.
+    assert not AccessToken("t", time.time() + 16, lifetime=30).needs_renewal(60)
+    assert AccessToken("t", time.time() + 14, lifetime=30).needs_renewal(60)
+
+
+def test_session_renews_in_background():
+    sdk_client = build_sdk_client(expires_in=2)
+    session = UniversalAuthSession(
+        sdk_client, VALID_API_SETTINGS, renew_margin_seconds=1
+    )
+
+    session.ensure_logged_in()
+    deadline = time.monotonic() + 5
+    while sdk_client.auth.universal_auth.login.call_count < 2:
+        assert time.monotonic() < deadline, "token was not renewed"
+        time.sleep(0.05)
+    session.close()
+
+
+def test_session_reuses_token_shared_through_file(tmp_path):
+    token_file = TokenFileCache(tmp_path / "token.json", identity="host|id")
+    token_file.store(AccessToken(value="shared-token", expires_at=time.time() + 600))
+    sdk_client = build_sdk_client()
+    session = UniversalAuthSession(sdk_client, VALID_API_SETTINGS, token_file)
+
+    token = session.ensure_logged_in()
+    session.close()
+
+    assert token.value == "shared-token"
+    sdk_client.auth.universal_auth.login.assert_not_called()
+    sdk_client.set_token.assert_called_once_with("shared-token")
+
+
+def test_session_stores_new_token_in_file(tmp_path):
+    path = tmp_path / "token.json"
+    sdk_client = build_sdk_client()
+    session = UniversalAuthSession(
+        sdk_client, VALID_API_SETTINGS, TokenFileCache(path, identity="host|id")
+    )
+
+    session.ensure_logged_in()
+    session.close()
+
+    assert json.loads(path.read_text())["value"] == "fresh-token"
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_token_file_ignores_tokens_for_other_identities(tmp_path):
+    path = tmp_path / "token.json"
+    TokenFileCache(path, identity="host|other").store(
+        AccessToken(value="other-token", expires_at=time.time() + 600)
+    )
+
+    assert TokenFileCache(path, identity="host|id").load() is None
+
+
+def test_token_file_ignores_corrupt_contents(tmp_path):
+    path = tmp_path / "token.json"
+    path.write_text("not json")
+
+    assert TokenFileCache(path, identity="host|id").load() is None
+
+
+def _login_in_worker(path: str, results: "multiprocessing.Queue[int]") -> None:
+    sdk_client = build_sdk_client()
+    session = UniversalAuthSession(
+        sdk_client, VALID_API_SETTINGS, TokenFileCache(path, identity="host|id")
+    )
+    session.ensure_logged_in()
+    session.close()
+    results.put(sdk_client.auth.universal_auth.login.call_count)
+
+
+def test_worker_processes_log_in_only_once(tmp_path):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=_login_in_worker, args=(str(tmp_path / "token.json"), results)
+        )
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=10)
+
+    assert sum(results.get(timeout=1) for _ in workers) == 1
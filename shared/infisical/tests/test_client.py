@@ -2,7 +2,13 @@ from unittest import mock
 from unittest.mock import MagicMock, patch
 
 import pytest
-from common.infisical_client import ApiSettings, ClientSettings, InfisicalClient
+from common.infisical_client import (
+    ApiSettings,
+    ClientSettings,
+    InfisicalClient,
+    SecretCache,
+)
+from infisical_sdk.api_types import MachineIdentityLoginResponse
 from pydantic import SecretStr, ValidationError
 
 # We patch 'infisical_sdk.InfisicalSDKClient'
@@ -15,6 +21,13 @@ VALID_API_SETTINGS = ApiSettings(
     INFISICAL_CLIENT_SECRET=SecretStr("secret"),
 )
 
+LOGIN_RESPONSE = MachineIdentityLoginResponse(
+    accessToken="access-token",
+    expiresIn=3600,
+    accessTokenMaxTTL=3600,
+    tokenType="Bearer",
+)
+
 # --- Tests for ClientSettings ---
 
 
@@ -55,10 +68,12 @@ def test_client_settings_validator_passes_with_slug_only():
 @patch(SDK_CLIENT_PATH)
 def test_infisical_client_init_with_universal_auth(MockInfisicalSdkClient):
     """
-    Tests that the client initializes correctly using Token authentication.
+    Tests that the client initializes correctly and logs in lazily using
+    universal auth.
     """
     ### Arrange ###
     mock_client = MagicMock()
+    mock_client.auth.universal_auth.login.return_value = LOGIN_RESPONSE
     MockInfisicalSdkClient.return_value = mock_client
 
     api_settings = ApiSettings(
@@ -72,9 +87,15 @@ def test_infisical_client_init_with_universal_auth(MockInfisicalSdkClient):
 
     ### Assert ###
 
-    # Check the real SDK constructor was used & login called correctly
+    # Check the real SDK constructor was used & login is deferred
     MockInfisicalSdkClient.assert_called_once_with(host="http://mock-host.com/")
+    mock_client.auth.universal_auth.login.assert_not_called()
+
+    # Login happens on first namespace access, and only once
+    client.secrets
+    client.secrets
     mock_client.auth.universal_auth.login.assert_called_once_with("id", "secret")
+    mock_client.set_token.assert_called_once_with(LOGIN_RESPONSE.accessToken)
 
     # Check that the internal properties are set
     assert client.raw_client == mock_client
@@ -158,3 +179,36 @@ def test_getattr_ignores_other_calls(MockInfisicalSdkClient: MagicMock):
 
     ### Assert ###
     mock_other.get_secret_by_name.assert_not_called()
+
+
+@patch(SDK_CLIENT_PATH)
+def test_uncached_secrets_always_read_from_the_api(MockInfisicalSdkClient: MagicMock):
+    """
+    Tests that `uncached_secrets` reads go to the API every time, even
+    with a SecretCache, and never through the SDK's cached namespace.
+    """
+    mock_client = MagicMock()
+    mock_client.auth.universal_auth.login.return_value = LOGIN_RESPONSE
+    mock_client.api.get.return_value = MagicMock(data=MagicMock(secret="payload"))
+    MockInfisicalSdkClient.return_value = mock_client
+    client = InfisicalClient(
+        api_settings=VALID_API_SETTINGS,
+        settings=ClientSettings(
+            project_id="123", environment_slug="prod", secret_path="/"
+        ),
+        cache=SecretCache(),
+    )
+
+    results = [
+        client.uncached_secrets.get_secret_by_name(secret_name="TOKEN")
+        for _ in range(2)
+    ]
+
+    assert results == ["payload", "payload"]
+    assert mock_client.api.get.call_count == 2
+    path = mock_client.api.get.call_args.kwargs["path"]
+    params = mock_client.api.get.call_args.kwargs["params"]
+    assert path == "/api/v3/secrets/raw/TOKEN"
+    assert params["workspaceId"] == "123"
+    assert params["environment"] == "prod"
+    mock_client.secrets.get_secret_by_name.assert_not_called()
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from common.client_utils import NamespaceWrapper
+from common.instrumentation import (
+    REGISTRY,
+    MetricsRegistry,
+    render_prometheus,
+    set_enabled,
+    timed,
+)
+
+
+@pytest.fixture
+def registry():
+    yield MetricsRegistry()
+    set_enabled(True)
+
+
+def test_counters_and_gauges(registry):
+    calls = registry.counter("calls_total", "Calls.", ["method"])
+    open_ = registry.gauge("open", "Open things.").labels()
+
+    calls.labels("get").inc()
+    calls.labels("get").inc(2)
+    open_.inc()
+    open_.inc()
+    open_.dec()
+
+    assert calls.labels("get").value == 3
+    assert open_.value == 1
+    assert registry.counter("calls_total", "Calls.", ["method"]) is calls
+
+
+def test_histogram_buckets_and_timers(registry):
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=[0.1, 1])
+    child = latency.labels()
+
+    child.observe(0.05)
+    child.observe(0.1)
+    child.observe(5)
+    with child.time():
+        pass
+
+    counts, total = child.snapshot()
+    assert counts == [3, 3, 4]
+    assert total == pytest.approx(5.15, abs=0.01)
+    assert child.count == 4
+
+
+def test_timed_sync_and_async_functions(registry):
+    seconds = registry.histogram("fn_seconds", "Fn.", ["fn"])
+
+    @timed(seconds.labels("sync"))
+    def sync_fn(x):
+        return x * 2
+
+    @timed(seconds.labels("async"))
+    async def async_fn(x):
+        await asyncio.sleep(0)
+        return x * 3
+
+    @timed(seconds.labels("failing"))
+    def failing():
+        raise KeyError("x")
+
+    assert sync_fn(2) == 4
+    assert asyncio.run(async_fn(2)) == 6
+    with pytest.raises(KeyError):
+        failing()
+    assert [seconds.labels(fn).count for fn in ["sync", "async", "failing"]] == [
+        1,
+        1,
+        1,
+    ]
+
+
+def test_disabled_metrics_record_nothing(registry):
+    calls = registry.counter("calls_total", "Calls.").labels()
+    latency = registry.histogram("latency_seconds", "Latency.").labels()
+    fn = timed(latency)(lambda: "result")
+    calls.inc()
+
+    set_enabled(False)
+    calls.inc()
+    latency.observe(1)
+    with latency.time():
+        pass
+
+    assert fn() == "result"
+    assert calls.value == 1
+    assert latency.count == 0
+
+
+def test_conflicting_metrics_and_labels(registry):
+    registry.counter("calls_total", "Calls.", ["method"])
+
+    with pytest.raises(ValueError, match="already exists"):
+        registry.histogram("calls_total", "Calls.", ["method"])
+    with pytest.raises(ValueError, match="already exists"):
+        registry.counter("calls_total", "Calls.", ["other"])
+    with pytest.raises(ValueError, match="takes labels"):
+        registry.counter("calls_total", "Calls.", ["method"]).labels("a", "b")
+
+
+def test_prometheus_text_format(registry):
+    registry.counter("calls_total", "Calls, by method.", ["method"]).labels(
+        'say "hi"\n'
+    ).inc(2)
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=[0.5])
+    latency.labels().observe(0.25)
+    registry.gauge("unused", "Never set.", ["x"])
+
+    assert render_prometheus(registry) == (
+        "# HELP calls_total Calls, by method.\n"
+        "# TYPE calls_total counter\n"
+        'calls_total{method="say \\"hi\\"\\n"} 2\n'
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.5"} 1\n'
+        'latency_seconds_bucket{le="+Inf"} 1\n'
+        "latency_seconds_sum 0.25\n"
+        "latency_seconds_count 1\n"
+        "# HELP unused Never set.\n"
+        "# TYPE unused gauge\n"
+    )
+    assert render_prometheus(MetricsRegistry()) == ""
+
+
+def test_namespace_wrapper_calls_are_timed():
+    class Secrets:
+        def get_secret(self, name):
+            return name
+
+    seconds = REGISTRY.histogram(
+        "namespace_wrapper_call_seconds", "", ["namespace", "method"]
+    ).labels("Secrets", "get_secret")
+    before = seconds.count
+
+    wrapper = NamespaceWrapper(Secrets(), frozenset())
+    wrapper.get_secret("A")
+    wrapper.get_secret("B")
+
+    assert seconds.count == before + 2
@@ -0,0 +1,120 @@
+from unittest import mock
+from unittest.mock import MagicMock, patch
+
+import pytest
+from common.infisical_client import (
+    ApiSettings,
+    ClientSettings,
+    InfisicalClientPool,
+    SecretCache,
+)
+from infisical_sdk.api_types import MachineIdentityLoginResponse
+from pydantic import SecretStr, ValidationError
+
+SDK_CLIENT_PATH = "common.infisical_client.pool.InfisicalSDKClient"
+
+VALID_API_SETTINGS = ApiSettings(
+    INFISICAL_HOST="http://mock-host.com",
+    INFISICAL_CLIENT_ID="id",
+    INFISICAL_CLIENT_SECRET=SecretStr("secret"),
+)
+
+
+def build_pool(MockInfisicalSdkClient, cache=None):
+    def get_secret_by_name(
+        secret_name: str,
+        environment_slug: str,
+        secret_path: str,
+        project_id: str = None,
+        project_slug: str = None,
+    ):
+        pass
+
+    mock_client = MagicMock()
+    mock_client.auth.universal_auth.login.return_value = MachineIdentityLoginResponse(
+        accessToken="token", expiresIn=3600, accessTokenMaxTTL=3600, tokenType="Bearer"
+    )
+    mock_client.secrets.get_secret_by_name = mock.create_autospec(get_secret_by_name)
+    MockInfisicalSdkClient.return_value = mock_client
+
+    pool = InfisicalClientPool(
+        settings=ClientSettings(project_slug="family", environment_slug="prod"),
+        api_settings=VALID_API_SETTINGS,
+        cache=cache,
+    )
+    return pool, mock_client
+
+
+@patch(SDK_CLIENT_PATH)
+def test_pool_shares_one_sdk_client_and_login(MockInfisicalSdkClient):
+    pool, mock_client = build_pool(MockInfisicalSdkClient)
+
+    pool.secrets(secret_path="/terraform").get_secret_by_name(secret_name="A")
+    pool.secrets(secret_path="/gcloud").get_secret_by_name(secret_name="B")
+
+    MockInfisicalSdkClient.assert_called_once()
+    mock_client.auth.universal_auth.login.assert_called_once()
+    assert mock_client.secrets.get_secret_by_name.call_args_list == [
+        mock.call(
+            secret_name="A",
+            project_slug="family",
+            environment_slug="prod",
+            secret_path="/terraform",
+        ),
+        mock.call(
+            secret_name="B",
+            project_slug="family",
+            environment_slug="prod",
+            secret_path="/gcloud",
+        ),
+    ]
+
+
+@patch(SDK_CLIENT_PATH)
+def test_pool_caches_views_per_scope(MockInfisicalSdkClient):
+    pool, _ = build_pool(MockInfisicalSdkClient)
+
+    first = pool.secrets(secret_path="/terraform")
+    same = pool.secrets(
+        ClientSettings(
+            project_slug="family", environment_slug="prod", secret_path="/terraform"
+        )
+    )
+    other = pool.secrets(environment_slug="dev", secret_path="/terraform")
+
+    assert first is same
+    assert first is not other
+    assert len(pool) == 2
+
+
+@patch(SDK_CLIENT_PATH)
+def test_pool_defaults_to_its_own_settings(MockInfisicalSdkClient):
+    pool, mock_client = build_pool(MockInfisicalSdkClient)
+
+    pool.secrets().get_secret_by_name(secret_name="A", secret_path="/")
+
+    mock_client.secrets.get_secret_by_name.assert_called_once_with(
+        secret_name="A", project_slug="family", environment_slug="prod", secret_path="/"
+    )
+
+
+@patch(SDK_CLIENT_PATH)
+def test_pool_views_share_cache_without_collisions(MockInfisicalSdkClient):
+    pool, mock_client = build_pool(MockInfisicalSdkClient, cache=SecretCache())
+    mock_client.secrets.get_secret_by_name.side_effect = lambda **kw: kw["secret_path"]
+
+    terraform = pool.secrets(secret_path="/terraform")
+    gcloud = pool.secrets(secret_path="/gcloud")
+
+    assert terraform.get_secret_by_name(secret_name="A") == "/terraform"
+    assert gcloud.get_secret_by_name(secret_name="A") == "/gcloud"
+    assert terraform.get_secret_by_name(secret_name="A") == "/terraform"
+    assert pool.secret_cache.stats.hits == 1
+
+
+@patch(SDK_CLIENT_PATH)
+def test_pool_rejects_ambiguous_overrides(MockInfisicalSdkClient):
+    pool, _ = build_pool(MockInfisicalSdkClient)
+
+    with pytest.raises(ValidationError, match="Ambiguous project identification"):
+        pool.secrets(project_id="123")
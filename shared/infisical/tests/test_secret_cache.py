@@ -0,0 +1,210 @@
+import threading
+from unittest import mock
+from unittest.mock import MagicMock, patch
+
+import pytest
+from common.infisical_client import (
+    ApiSettings,
+    ClientSettings,
+    InfisicalClient,
+    SecretCache,
+)
+from pydantic import SecretStr
+
+SDK_CLIENT_PATH = "common.infisical_client.client.InfisicalSDKClient"
+
+VALID_API_SETTINGS = ApiSettings(
+    INFISICAL_HOST="http://mock-host.com",
+    INFISICAL_CLIENT_ID="id",
+    INFISICAL_CLIENT_SECRET=SecretStr("secret"),
+)
+
+
+class FakeClock:
+    """A manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# --- Tests for SecretCache ---
+
+
+def test_cache_serves_fresh_entries_without_reloading():
+    clock = FakeClock()
+    cache = SecretCache(ttl_seconds=10, clock=clock)
+    loader = MagicMock(return_value="value")
+
+    assert cache.get_or_load("key", loader) == "value"
+    clock.now = 9
+    assert cache.get_or_load("key", loader) == "value"
+
+    loader.assert_called_once()
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_cache_reloads_after_ttl_without_stale_window():
+    clock = FakeClock()
+    cache = SecretCache(ttl_seconds=10, clock=clock)
+    loader = MagicMock(side_effect=["old", "new"])
+
+    assert cache.get_or_load("key", loader) == "old"
+    clock.now = 10
+    assert cache.get_or_load("key", loader) == "new"
+
+    assert loader.call_count == 2
+    assert cache.stats.misses == 2
+
+
+def test_cache_serves_stale_value_and_refreshes_in_background():
+    clock = FakeClock()
+    cache = SecretCache(ttl_seconds=10, stale_seconds=30, clock=clock)
+    refreshed = threading.Event()
+
+    def reload():
+        refreshed.set()
+        return "new"
+
+    cache.get_or_load("key", lambda: "old")
+    clock.now = 15
+
+    # Stale value is returned immediately; the refresh happens elsewhere.
+    assert cache.get_or_load("key", reload) == "old"
+    assert refreshed.wait(timeout=5)
+    cache.close()
+
+    clock.now = 16
+    assert cache.get_or_load("key", MagicMock()) == "new"
+    assert cache.stats.stale_hits == 1
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache = SecretCache(ttl_seconds=10, max_entries=2, clock=FakeClock())
+
+    cache.get_or_load("a", lambda: 1)
+    cache.get_or_load("b", lambda: 2)
+    cache.get_or_load("a", lambda: 1)  # "a" is now the most recently used
+    cache.get_or_load("c", lambda: 3)
+
+    loader = MagicMock(return_value=2)
+    cache.get_or_load("b", loader)
+
+    loader.assert_called_once()
+    assert cache.stats.evictions == 2
+
+
+def test_cache_invalidate_drops_entries():
+    cache = SecretCache(ttl_seconds=10, clock=FakeClock())
+    cache.get_or_load("key", lambda: "old")
+
+    cache.invalidate()
+
+    assert len(cache) == 0
+    assert cache.get_or_load("key", lambda: "new") == "new"
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"ttl_seconds": 0}, {"max_entries": 0}, {"stale_seconds": -1}]
+)
+def test_cache_rejects_invalid_bounds(kwargs):
+    with pytest.raises(ValueError):
+        SecretCache(**kwargs)
+
+
+# --- Tests for InfisicalClient with a cache ---
+
+
+def build_client_with_mock_secrets(MockInfisicalSdkClient, cache):
+    def get_secret_by_name(
+        secret_name: str, environment_slug: str, secret_path: str, project_id: str
+    ):
+        pass
+
+    def update_secret_by_name(
+        current_secret_name: str,
+        environment_slug: str,
+        secret_path: str,
+        project_id: str,
+        secret_value: str,
+    ):
+        pass
+
+    mock_client = MagicMock()
+    MockInfisicalSdkClient.return_value = mock_client
+    mock_client.secrets.get_secret_by_name = mock.create_autospec(get_secret_by_name)
+    mock_client.secrets.update_secret_by_name = mock.create_autospec(
+        update_secret_by_name
+    )
+
+    client = InfisicalClient(
+        api_settings=VALID_API_SETTINGS,
+        settings=ClientSettings(
+            project_id="123", environment_slug="prod", secret_path="/"
+        ),
+        cache=cache,
+    )
+    return client, mock_client.secrets
+
+
+@patch(SDK_CLIENT_PATH)
+def test_client_caches_secret_reads(MockInfisicalSdkClient):
+    cache = SecretCache(ttl_seconds=60)
+    client, mock_secrets = build_client_with_mock_secrets(MockInfisicalSdkClient, cache)
+    mock_secrets.get_secret_by_name.return_value = "secret-payload"
+
+    first = client.secrets.get_secret_by_name(secret_name="DB_PASS")
+    second = client.secrets.get_secret_by_name(secret_name="DB_PASS")
+
+    assert first == second == "secret-payload"
+    mock_secrets.get_secret_by_name.assert_called_once_with(
+        secret_name="DB_PASS",
+        project_id="123",
+        environment_slug="prod",
+        secret_path="/",
+    )
+    assert client.secret_cache.stats.hits == 1
+    # The SDK's own cache is turned off in favour of ours
+    MockInfisicalSdkClient.assert_called_once_with(
+        host="http://mock-host.com/", cache_ttl=None
+    )
+
+
+@patch(SDK_CLIENT_PATH)
+def test_client_cache_is_keyed_on_scope(MockInfisicalSdkClient):
+    cache = SecretCache(ttl_seconds=60)
+    client, mock_secrets = build_client_with_mock_secrets(MockInfisicalSdkClient, cache)
+
+    client.secrets.get_secret_by_name(secret_name="DB_PASS")
+    client.secrets.get_secret_by_name(secret_name="DB_PASS", secret_path="/other")
+
+    assert mock_secrets.get_secret_by_name.call_count == 2
+
+
+@patch(SDK_CLIENT_PATH)
+def test_client_write_invalidates_cache(MockInfisicalSdkClient):
+    cache = SecretCache(ttl_seconds=60)
+    client, mock_secrets = build_client_with_mock_secrets(MockInfisicalSdkClient, cache)
+    mock_secrets.get_secret_by_name.side_effect = ["old", "new"]
+
+    assert client.secrets.get_secret_by_name(secret_name="DB_PASS") == "old"
+    client.secrets.update_secret_by_name(
+        current_secret_name="DB_PASS", secret_value="new"
+    )
+
+    assert client.secrets.get_secret_by_name(secret_name="DB_PASS") == "new"
+    assert cache.stats.invalidations == 1
+
+
+@patch(SDK_CLIENT_PATH)
+def test_client_without_cache_always_delegates(MockInfisicalSdkClient):
+    client, mock_secrets = build_client_with_mock_secrets(MockInfisicalSdkClient, None)
+
+    client.secrets.get_secret_by_name(secret_name="DB_PASS")
+    client.secrets.get_secret_by_name(secret_name="DB_PASS")
+
+    assert mock_secrets.get_secret_by_name.call_count == 2
+    assert client.secret_cache is None
@@ -0,0 +1,203 @@
+from unittest import mock
+from unittest.mock import MagicMock, patch
+
+from common.infisical_client import (
+    ApiSettings,
+    ClientSettings,
+    InfisicalClient,
+    SecretSnapshot,
+)
+from infisical_sdk.api_types import BaseSecret, Import, ListSecretsResponse
+from pydantic import SecretStr
+
+SDK_CLIENT_PATH = "common.infisical_client.client.InfisicalSDKClient"
+
+VALID_API_SETTINGS = ApiSettings(
+    INFISICAL_HOST="http://mock-host.com",
+    INFISICAL_CLIENT_ID="id",
+    INFISICAL_CLIENT_SECRET=SecretStr("secret"),
+)
+
+SCOPE = {
+    "project_id": "123",
+    "project_slug": None,
+    "environment_slug": "prod",
+    "secret_path": "/app",
+}
+
+
+def build_secret(key: str, value: str) -> BaseSecret:
+    return BaseSecret(
+        id=f"id-{key}",
+        _id=f"id-{key}",
+        workspace="123",
+        environment="prod",
+        version=1,
+        type="shared",
+        secretKey=key,
+        secretValue=value,
+        secretComment="",
+        createdAt="2025-01-01T00:00:00Z",
+        updatedAt="2025-01-01T00:00:00Z",
+    )
+
+
+def build_list_response(**values: str) -> ListSecretsResponse:
+    return ListSecretsResponse(
+        secrets=[build_secret(key, value) for key, value in values.items()]
+    )
+
+
+# --- Tests for SecretSnapshot ---
+
+
+def test_snapshot_answers_reads_in_its_scope():
+    snapshot = SecretSnapshot.from_list_response(
+        SCOPE, build_list_response(DB_PASS="hunter2")
+    )
+
+    secret = snapshot.lookup(
+        "DB_PASS",
+        {"project_id": "123", "environment_slug": "prod", "secret_path": "/app"},
+    )
+
+    assert secret.secretValue == "hunter2"
+
+
+def test_snapshot_declines_reads_outside_its_scope():
+    snapshot = SecretSnapshot.from_list_response(
+        SCOPE, build_list_response(DB_PASS="hunter2")
+    )
+
+    assert snapshot.lookup("DB_PASS", {"secret_path": "/other"}) is None
+    assert snapshot.lookup("DB_PASS", {"version": "3"}) is None
+    assert snapshot.lookup("MISSING", {"secret_path": "/app"}) is None
+
+
+def test_snapshot_prefers_direct_secrets_over_imports():
+    response = build_list_response(DB_PASS="direct")
+    response.imports = [
+        Import(
+            secretPath="/shared",
+            environment="prod",
+            secrets=[build_secret("DB_PASS", "imported"), build_secret("KEY", "k")],
+        )
+    ]
+
+    snapshot = SecretSnapshot.from_list_response(SCOPE, response)
+
+    assert snapshot.secrets["DB_PASS"].secretValue == "direct"
+    assert snapshot.secrets["KEY"].secretValue == "k"
+
+
+# --- Tests for InfisicalClient prefetch ---
+
+
+def build_prefetching_client(MockInfisicalSdkClient, **values):
+    def get_secret_by_name(
+        secret_name: str, environment_slug: str, secret_path: str, project_id: str
+    ):
+        pass
+
+    def update_secret_by_name(
+        current_secret_name: str,
+        environment_slug: str,
+        secret_path: str,
+        project_id: str,
+        secret_value: str,
+    ):
+        pass
+
+    mock_client = MagicMock()
+    MockInfisicalSdkClient.return_value = mock_client
+    mock_client.secrets.get_secret_by_name = mock.create_autospec(get_secret_by_name)
+    mock_client.secrets.update_secret_by_name = mock.create_autospec(
+        update_secret_by_name
+    )
+    mock_client.secrets.list_secrets.return_value = build_list_response(**values)
+
+    client = InfisicalClient(
+        api_settings=VALID_API_SETTINGS,
+        settings=ClientSettings(
+            project_id="123",
+            environment_slug="prod",
+            secret_path="/app",
+            prefetch=True,
+        ),
+    )
+    return client, mock_client.secrets
+
+
+@patch(SDK_CLIENT_PATH)
+def test_prefetch_lists_path_once_at_startup(MockInfisicalSdkClient):
+    client, mock_secrets = build_prefetching_client(
+        MockInfisicalSdkClient, DB_PASS="hunter2", API_KEY="abc"
+    )
+
+    mock_secrets.list_secrets.assert_called_once_with(**SCOPE)
+    assert len(client.snapshot) == 2
+
+
+@patch(SDK_CLIENT_PATH)
+def test_prefetch_answers_reads_from_snapshot(MockInfisicalSdkClient):
+    client, mock_secrets = build_prefetching_client(
+        MockInfisicalSdkClient, DB_PASS="hunter2"
+    )
+
+    by_kwarg = client.secrets.get_secret_by_name(secret_name="DB_PASS")
+    by_position = client.secrets.get_secret_by_name("DB_PASS")
+
+    assert by_kwarg.secretValue == by_position.secretValue == "hunter2"
+    mock_secrets.get_secret_by_name.assert_not_called()
+
+
+@patch(SDK_CLIENT_PATH)
+def test_prefetch_falls_back_to_api_for_unknown_secrets(MockInfisicalSdkClient):
+    client, mock_secrets = build_prefetching_client(
+        MockInfisicalSdkClient, DB_PASS="hunter2"
+    )
+
+    client.secrets.get_secret_by_name(secret_name="OTHER")
+
+    mock_secrets.get_secret_by_name.assert_called_once_with(
+        secret_name="OTHER",
+        project_id="123",
+        environment_slug="prod",
+        secret_path="/app",
+    )
+
+
+@patch(SDK_CLIENT_PATH)
+def test_refresh_swaps_snapshot(MockInfisicalSdkClient):
+    client, mock_secrets = build_prefetching_client(
+        MockInfisicalSdkClient, DB_PASS="old"
+    )
+    old_snapshot = client.snapshot
+    mock_secrets.list_secrets.return_value = build_list_response(DB_PASS="new")
+
+    new_snapshot = client.refresh()
+
+    assert client.snapshot is new_snapshot
+    assert old_snapshot.secrets["DB_PASS"].secretValue == "old"
+    assert client.secrets.get_secret_by_name("DB_PASS").secretValue == "new"
+
+
+@patch(SDK_CLIENT_PATH)
+def test_write_refreshes_snapshot(MockInfisicalSdkClient):
+    client, mock_secrets = build_prefetching_client(
+        MockInfisicalSdkClient, DB_PASS="old"
+    )
+    mock_secrets.list_secrets.return_value = build_list_response(DB_PASS="new")
+
+    client.secrets.update_secret_by_name(
+        current_secret_name="DB_PASS", secret_value="new"
+    )
+
+    assert mock_secrets.list_secrets.call_count == 2
+    assert client.secrets.get_secret_by_name("DB_PASS").secretValue == "new"
+
+
+def test_settings_prefetch_fields_are_not_injected():
+    settings = ClientSettings(project_id="123", prefetch=True)
+
+    assert dict(settings.injected_kwargs()) == {"project_id": "123"}
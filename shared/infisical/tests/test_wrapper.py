@@ -0,0 +1,85 @@
+import gc
+import weakref
+from unittest.mock import MagicMock, patch
+
+from common.client_utils import NamespaceWrapper
+from common.infisical_client import ApiSettings, ClientSettings, InfisicalClient
+from pydantic import SecretStr
+
+SDK_CLIENT_PATH = "common.infisical_client.client.InfisicalSDKClient"
+
+
+class FakeNamespace:
+    """A namespace that counts how often its method is looked up."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.version = 1
+
+    def __getattribute__(self, name):
+        if name == "read":
+            object.__getattribute__(self, "__dict__")["lookups"] += 1
+        return object.__getattribute__(self, name)
+
+    def read(self, name: str, secret_path: str = "/"):
+        return (name, secret_path)
+
+
+def test_wrapper_injects_only_accepted_kwargs():
+    wrapper = NamespaceWrapper(
+        FakeNamespace(), frozenset({("secret_path", "/app"), ("other", "x")})
+    )
+
+    assert wrapper.read("KEY") == ("KEY", "/app")
+    assert wrapper.read("KEY", secret_path="/override") == ("KEY", "/override")
+
+
+def test_wrapper_builds_each_method_once():
+    namespace = FakeNamespace()
+    wrapper = NamespaceWrapper(namespace, frozenset({("secret_path", "/app")}))
+
+    first = wrapper.read
+    second = wrapper.read
+
+    assert first is second
+    assert namespace.lookups == 1
+
+
+def test_wrapper_does_not_cache_non_callable_attributes():
+    namespace = FakeNamespace()
+    wrapper = NamespaceWrapper(namespace, frozenset())
+
+    assert wrapper.version == 1
+    namespace.version = 2
+    assert wrapper.version == 2
+
+
+def test_wrapper_and_namespace_are_freed_after_use():
+    namespace = FakeNamespace()
+    wrapper = NamespaceWrapper(namespace, frozenset({("secret_path", "/app")}))
+    wrapper.read("KEY")
+    wrapper_ref, namespace_ref = weakref.ref(wrapper), weakref.ref(namespace)
+
+    del wrapper, namespace
+    gc.collect()
+
+    assert wrapper_ref() is None
+    assert namespace_ref() is None
+
+
+@patch(SDK_CLIENT_PATH)
+def test_client_namespace_wrapper_does_not_pin_client(MockInfisicalSdkClient):
+    MockInfisicalSdkClient.return_value = MagicMock()
+    client = InfisicalClient(
+        settings=ClientSettings(project_id="123"),
+        api_settings=ApiSettings(
+            INFISICAL_CLIENT_ID="id", INFISICAL_CLIENT_SECRET=SecretStr("secret")
+        ),
+    )
+    assert client.secrets is client.secrets
+    client_ref = weakref.ref(client)
+
+    del client
+    gc.collect()
+
+    assert client_ref() is None